@@ -0,0 +1,332 @@
+"""クライアントの CPU ホットパスのマイクロベンチマーク
+
+ネットワークには出ない (サーバ応答は httpx.MockTransport)。各ケースの
+ops/sec (5 回計測の最良値) と 1 回分のピークメモリ (tracemalloc) を表示し、
+baseline.json と比べる。
+
+    python benchmarks/bench_hotpaths.py               # 計測してベースラインと比較
+    python benchmarks/bench_hotpaths.py -k extract    # 名前に extract を含むケースだけ
+    python benchmarks/bench_hotpaths.py --check       # ピークメモリの退行で終了コード 1
+    python benchmarks/bench_hotpaths.py --save        # baseline.json を更新
+
+ops/sec はマシンや負荷で数十 % 揺れるので、差分は表示するだけで --check の
+判定には使わない。速度の比較は同じマシンで前後を計測して行い、ベースラインの
+更新はその差分をレビューで確認してからにする。ピークメモリはマシンに
+依存しにくく、こちらの退行は環境が違っても意味があるので --check で落とす。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from iikanji import KakeiboClient, llm  # noqa: E402
+from iikanji.models import (  # noqa: E402
+    DraftListItem,
+    JournalCreateRequest,
+    JournalDetail,
+    JournalLine,
+)
+
+BASELINE = Path(__file__).with_name("baseline.json")
+
+# 1 回の計測に最低これだけの時間をかける (ループ回数を自動で決める)
+_MIN_SECONDS = 0.2
+_REPEATS = 5
+
+
+@dataclass
+class BenchResult:
+    name: str
+    ops_per_sec: float
+    peak_bytes: int
+
+
+# --- 入力データ ---
+
+def _journal(i: int) -> dict[str, Any]:
+    return {
+        "id": i,
+        "date": "2026-02-15",
+        "entry_number": i,
+        "description": f"スーパーで食材購入 #{i}",
+        "source": "api",
+        "lines": [
+            {"account_code": "7010", "debit": 3000, "credit": 0,
+             "description": "食材"},
+            {"account_code": "7020", "debit": 500, "credit": 0,
+             "description": "日用品"},
+            {"account_code": "1010", "debit": 0, "credit": 3500,
+             "description": ""},
+        ],
+    }
+
+
+def _draft(i: int) -> dict[str, Any]:
+    return {
+        "id": i,
+        "status": "pending",
+        "comment": "コンビニ",
+        "created_at": "2026-02-15T12:34:56+09:00",
+        "summary": {
+            "title": "食材購入", "date": "2026-02-15",
+            "description": "スーパー", "amount": 3500, "suggestion_count": 3,
+        },
+    }
+
+
+_JOURNAL_PAGE = [_journal(i) for i in range(100)]
+_DRAFT_PAGE = [_draft(i) for i in range(100)]
+_ACCOUNT_CODES = {str(4000 + i) for i in range(500)}
+
+
+def _suggestions(n: int) -> dict[str, Any]:
+    codes = sorted(_ACCOUNT_CODES)
+    return {"suggestions": [
+        {
+            "title": f"仕訳案 {i}",
+            "description": "レシートの内容から推定",
+            "date": "2026-02-15",
+            "entry_description": "スーパーで食材購入",
+            "lines": [
+                {"account_code": codes[i % len(codes)], "account_name": "食費",
+                 "debit_amount": 3000, "credit_amount": 0},
+                # 存在しない科目は捨てられる
+                {"account_code": "9999", "account_name": "不明",
+                 "debit_amount": 0, "credit_amount": 3000},
+                {"account_code": codes[(i + 1) % len(codes)],
+                 "account_name": "現金", "debit_amount": "0",
+                 "credit_amount": "3000"},
+            ],
+        }
+        for i in range(n)
+    ]}
+
+
+_SUGGESTIONS = _suggestions(200)
+_SUGGESTIONS_JSON = json.dumps(_SUGGESTIONS, ensure_ascii=False)
+_FENCED_OUTPUT = (
+    "以下が仕訳案です。\n\n```json\n" + _SUGGESTIONS_JSON
+    + "\n```\n\n補足: 金額は {税込} で計算しています。"
+)
+# コードブロックなし、前後に説明文が付いたインデント付きの出力
+_MESSY_OUTPUT = (
+    "承知しました。レシートを解析した結果です。\n"
+    + json.dumps(_SUGGESTIONS, ensure_ascii=False, indent=2)
+    + "\n以上です。ご確認ください。"
+)
+
+_PROMPT_CONTEXT = {
+    "account_list_text": "\n".join(
+        f"{code}: 勘定科目 {code} (費用の説明文がここに入る)"
+        for code in sorted(_ACCOUNT_CODES)
+    ),
+    "round2_prompt_template_with_ledger": (
+        "R2WL 勘定科目:\n__ACCOUNT_LIST_TEXT__\n元帳:\n__LEDGER_TEXT__\n" * 2
+    ),
+    "round2_prompt_template_no_ledger": "R2NL 勘定科目:\n__ACCOUNT_LIST_TEXT__\n",
+}
+_LEDGER_TEXT = "\n".join(
+    f"2026-01-{1 + i % 28:02d} 7010 食費 {1000 + i} スーパー" for i in range(2000)
+)
+
+_IMAGE_10MB = bytes(range(256)) * (10 * 1024 * 1024 // 256)
+_PREPARED_10MB = llm.PreparedImage.from_bytes(_IMAGE_10MB)
+
+_CREATE_REQUEST = JournalCreateRequest(
+    date="2026-02-15",
+    description="月次の経費まとめ",
+    lines=[JournalLine(str(4000 + i), debit=100 + i) for i in range(49)]
+    + [JournalLine("1010", credit=sum(100 + i for i in range(49)))],
+)
+
+
+def _list_client() -> KakeiboClient:
+    body = json.dumps({
+        "journals": _JOURNAL_PAGE, "total": 10_000, "page": 1, "per_page": 100,
+    }).encode()
+    return KakeiboClient(
+        "https://bench.example.com", "ik_bench",
+        http_client=httpx.Client(
+            transport=httpx.MockTransport(
+                lambda request: httpx.Response(
+                    200, content=body,
+                    headers={"Content-Type": "application/json"},
+                ),
+            ),
+            base_url="https://bench.example.com",
+        ),
+        retry_policy=None,
+    )
+
+
+_CLIENT = _list_client()
+
+
+# --- ケース ---
+
+def _provider_payload(provider: str) -> Callable[[], object]:
+    build = llm._REQUEST_BUILDERS[provider]
+
+    def run() -> object:
+        return build(
+            api_key="k", model="m", image_bytes=_PREPARED_10MB,
+            mime_type="image/jpeg", prompt="R2NL 勘定科目", max_tokens=2000,
+        ).content()
+
+    return run
+
+
+CASES: dict[str, Callable[[], object]] = {
+    "journal_detail_from_dict_x100": lambda: [
+        JournalDetail.from_dict(j) for j in _JOURNAL_PAGE
+    ],
+    "draft_list_item_from_dict_x100": lambda: [
+        DraftListItem.from_dict(d) for d in _DRAFT_PAGE
+    ],
+    "list_journals_page100_mock_transport": lambda: _CLIENT.list_journals(
+        per_page=100,
+    ),
+    "journal_create_request_to_dict_50_lines": _CREATE_REQUEST.to_dict,
+    "extract_json_fenced_200_suggestions": lambda: llm.extract_json(
+        _FENCED_OUTPUT,
+    ),
+    "extract_json_messy_200_suggestions": lambda: llm.extract_json(
+        _MESSY_OUTPUT,
+    ),
+    "validate_suggestions_200": lambda: llm.validate_suggestions(
+        _SUGGESTIONS, _ACCOUNT_CODES,
+    ),
+    "build_round2_prompt_500_accounts_2000_ledger": lambda: llm.build_round2_prompt(
+        prompt_context=_PROMPT_CONTEXT, needs_ledger=True,
+        ledger_text=_LEDGER_TEXT,
+    ),
+    "prepare_image_base64_10mb": lambda: llm.PreparedImage.from_bytes(_IMAGE_10MB),
+    "openai_payload_10mb": _provider_payload("openai"),
+    "anthropic_payload_10mb": _provider_payload("anthropic"),
+    "google_payload_10mb": _provider_payload("google"),
+}
+
+
+# --- 計測 ---
+
+def _ops_per_sec(fn: Callable[[], object]) -> float:
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= _MIN_SECONDS:
+            break
+        loops *= 2 if elapsed <= 0 else max(2, int(_MIN_SECONDS / elapsed) + 1)
+    best = elapsed
+    for _ in range(_REPEATS - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        best = min(best, time.perf_counter() - started)
+    return loops / best
+
+
+def _peak_bytes(fn: Callable[[], object]) -> int:
+    tracemalloc.start()
+    try:
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak
+
+
+def run(name: str) -> BenchResult:
+    fn = CASES[name]
+    fn()  # ウォームアップ (キャッシュ・遅延 import)
+    return BenchResult(name, _ops_per_sec(fn), _peak_bytes(fn))
+
+
+def _format_bytes(n: float) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if abs(n) < 1024:
+            return f"{n:.0f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GiB"
+
+
+def _change(current: float, base: float | None) -> str:
+    if not base:
+        return ""
+    return f"{(current / base - 1) * 100:+.0f}%"
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-k", dest="filter", default="",
+                        help="名前にこの文字列を含むケースだけ実行する")
+    parser.add_argument("--save", action="store_true",
+                        help="結果を baseline.json に保存する")
+    parser.add_argument("--check", action="store_true",
+                        help="ピークメモリの退行があれば終了コード 1 を返す")
+    parser.add_argument("--tolerance", type=float, default=0.3,
+                        help="退行とみなす悪化率 (既定 0.3 = 30%%)")
+    args = parser.parse_args(argv)
+
+    baseline: dict[str, dict[str, Any]] = {}
+    if BASELINE.exists():
+        baseline = json.loads(BASELINE.read_text())["results"]
+
+    names = [name for name in CASES if args.filter in name]
+    results: list[BenchResult] = []
+    regressions: list[str] = []
+    slower: list[str] = []
+    print(f"{'case':<46} {'ops/sec':>12} {'Δ':>6} {'peak':>10} {'Δ':>6}")
+    for name in names:
+        result = run(name)
+        results.append(result)
+        base = baseline.get(name, {})
+        print(
+            f"{name:<46} {result.ops_per_sec:>12,.1f} "
+            f"{_change(result.ops_per_sec, base.get('ops_per_sec')):>6} "
+            f"{_format_bytes(result.peak_bytes):>10} "
+            f"{_change(result.peak_bytes, base.get('peak_bytes')):>6}"
+        )
+        if not base:
+            continue
+        if result.peak_bytes > base["peak_bytes"] * (1 + args.tolerance):
+            regressions.append(name)
+        if result.ops_per_sec < base["ops_per_sec"] * (1 - args.tolerance):
+            slower.append(name)
+
+    if args.save:
+        saved = dict(baseline)
+        saved.update({r.name: asdict(r) for r in results})
+        BASELINE.write_text(json.dumps({
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": {name: saved[name] for name in CASES if name in saved},
+        }, indent=2, ensure_ascii=False) + "\n")
+        print(f"saved {BASELINE}")
+    if slower:
+        # 別マシン・別負荷の ops/sec との比較は参考値で、--check では落とさない
+        print("slower than baseline (not checked): " + ", ".join(slower))
+    if regressions:
+        print("peak memory regressed: " + ", ".join(regressions))
+        return 1 if args.check else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
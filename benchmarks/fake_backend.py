@@ -0,0 +1,424 @@
+"""負荷試験用のローカル偽サーバ (いいかんじ家計簿 API + LLM provider)
+
+1 つの ThreadingHTTPServer で、クライアントが使うサーバ API
+(/api/v1/journals, /api/v1/ai/*) と OpenAI / Anthropic / Google の画像
+LLM エンドポイントを真似る。応答の遅延・5xx・429 (Retry-After 付き) の
+割合は FakeConfig で決める。データはメモリ上に持つだけで、プロセスを
+止めれば消える。標準ライブラリだけで動く。
+
+    with FakeBackend(FakeConfig(llm_latency=0.5, llm_throttle_rate=0.05)) as fake:
+        client = KakeiboClient(fake.url, "ik_load", openai_api_key="sk-fake",
+                               llm_http_client=fake.llm_http_client())
+
+LLM provider の URL は llm.py の定数で固定なので、llm_http_client() が
+返すクライアントは送信先のホストだけをこの偽サーバに付け替える。
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+
+# プロンプトの目印。画像の base64 に現れない文字 (<>) で囲む
+_ROUND1 = "<<ROUND1>>"
+_R2_NO_LEDGER = "<<R2NL>>"
+_R2_WITH_LEDGER = "<<R2WL>>"
+
+_ACCOUNTS = [
+    ("1010", "現金"), ("1020", "普通預金"), ("5010", "食費"),
+    ("5020", "日用品"), ("5030", "交通費"), ("5040", "通信費"),
+]
+
+PROMPT_CONTEXT: dict[str, Any] = {
+    "ok": True,
+    "round1_prompt": f"{_ROUND1} 証憑を読み取り JSON で返してください。",
+    "compliance_prompt": "",
+    "compliance_check_enabled": False,
+    "round2_prompt_template_no_ledger":
+        f"{_R2_NO_LEDGER} 勘定科目:\n__ACCOUNT_LIST_TEXT__",
+    "round2_prompt_template_with_ledger":
+        f"{_R2_WITH_LEDGER} 勘定科目:\n__ACCOUNT_LIST_TEXT__\n元帳:\n__LEDGER_TEXT__",
+    "account_list_text": "\n".join(f"{code} {name}" for code, name in _ACCOUNTS),
+    "custom_prompt": "",
+    "default_model_by_provider": {
+        "openai": "fake-gpt",
+        "anthropic": "fake-claude",
+        "google": "fake-gemini",
+    },
+}
+_PROMPT_CONTEXT_ETAG = '"fake-v1"'
+
+_ID_PATH = re.compile(r"^(/api/v1/(?:journals|ai/drafts))/(\d+)(/suggestions)?$")
+
+
+@dataclass
+class FakeConfig:
+    """偽サーバの振る舞い
+
+    server_latency / llm_latency: 応答までの平均秒数
+    provider_latency: provider 名 → llm_latency の上書き
+    jitter: 遅延のばらつき (平均 × (1 ± jitter) の一様分布)
+    server_error_rate: サーバ API が 503 を返す割合
+    llm_error_rate: LLM が 500 を返す割合
+    llm_throttle_rate: LLM が 429 (Retry-After: retry_after) を返す割合
+    needs_ledger_rate: Round 1 が元帳を要求する割合
+    seed: 乱数の種 (None なら毎回変わる)
+    """
+
+    server_latency: float = 0.01
+    llm_latency: float = 0.3
+    provider_latency: dict[str, float] = field(default_factory=dict)
+    jitter: float = 0.5
+    server_error_rate: float = 0.0
+    llm_error_rate: float = 0.0
+    llm_throttle_rate: float = 0.0
+    retry_after: float = 0.2
+    needs_ledger_rate: float = 0.3
+    seed: int | None = None
+
+
+class _State:
+    """偽サーバのデータと受信件数 (スレッドセーフ)。"""
+
+    def __init__(self, config: FakeConfig) -> None:
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.journals: dict[int, dict[str, Any]] = {}
+        self.drafts: dict[int, dict[str, Any]] = {}
+        self.next_id = 1
+        self.hits: Counter[str] = Counter()
+
+    def hit(self, endpoint: str) -> None:
+        with self.lock:
+            self.hits[endpoint] += 1
+
+    def roll(self, rate: float) -> bool:
+        with self.lock:
+            return self.random.random() < rate
+
+    def delay(self, mean: float) -> None:
+        if mean <= 0:
+            return
+        jitter = self.config.jitter
+        with self.lock:
+            factor = self.random.uniform(1 - jitter, 1 + jitter)
+        time.sleep(max(0.0, mean * factor))
+
+    def new_id(self) -> int:
+        with self.lock:
+            new_id = self.next_id
+            self.next_id += 1
+            return new_id
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: _Server
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass  # 1 リクエストごとのアクセスログは出さない
+
+    def do_GET(self) -> None:
+        self._dispatch()
+
+    def do_POST(self) -> None:
+        self._dispatch()
+
+    def do_PATCH(self) -> None:
+        self._dispatch()
+
+    def do_DELETE(self) -> None:
+        self._dispatch()
+
+    # --- 共通 ---
+
+    def _dispatch(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        url = urlsplit(self.path)
+        state = self.server.state
+        provider = _llm_provider(url.path)
+        if provider is not None:
+            state.hit(f"llm:{provider}")
+            self._llm(provider, body)
+            return
+        route = _ID_PATH.sub(
+            lambda m: f"{m.group(1)}/{{id}}{m.group(3) or ''}", url.path,
+        )
+        state.hit(f"{self.command} {route}")
+        state.delay(state.config.server_latency)
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            self._json(401, {"error": "API キーが必要です"})
+            return
+        if state.roll(state.config.server_error_rate):
+            self._json(503, {"error": "fake outage"})
+            return
+        self._api(url.path, parse_qs(url.query), body)
+
+    def _json(
+        self, status: int, data: Any, headers: dict[str, str] | None = None,
+    ) -> None:
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    # --- サーバ API ---
+
+    def _api(self, path: str, query: dict[str, list[str]], body: bytes) -> None:
+        state = self.server.state
+        method = self.command
+        if path == "/api/v1/journals":
+            if method == "POST":
+                data = json.loads(body)
+                journal_id = state.new_id()
+                with state.lock:
+                    state.journals[journal_id] = {
+                        "id": journal_id, "entry_number": journal_id,
+                        "date": data["date"],
+                        "description": data["description"],
+                        "source": data.get("source", "api"),
+                        "lines": data["lines"],
+                    }
+                self._json(201, {
+                    "ok": True, "id": journal_id, "entry_number": journal_id,
+                })
+                return
+            if method == "GET":
+                with state.lock:
+                    journals = list(state.journals.values())
+                self._json(200, _page(journals, query, "journals"))
+                return
+        if path == "/api/v1/ai/uploads" and method == "POST":
+            draft_id = state.new_id()
+            with state.lock:
+                state.drafts[draft_id] = {
+                    "id": draft_id, "status": "pending", "comment": "",
+                    "created_at": "2026-01-01T00:00:00+09:00",
+                    "suggestions": [], "image_bytes": len(body),
+                }
+            self._json(201, {"ok": True, "draft_id": draft_id, "status": "pending"})
+            return
+        if path == "/api/v1/ai/prompt-context" and method == "GET":
+            if self.headers.get("If-None-Match") == _PROMPT_CONTEXT_ETAG:
+                self.send_response(304)
+                self.send_header("ETag", _PROMPT_CONTEXT_ETAG)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self._json(200, PROMPT_CONTEXT, {"ETag": _PROMPT_CONTEXT_ETAG})
+            return
+        if path == "/api/v1/ai/ledger-context" and method == "POST":
+            names = json.loads(body).get("account_names", [])
+            ledger = "\n".join(
+                f"2026-01-{day:02d} {name} {1000 * day}"
+                for name in names for day in range(1, 11)
+            )
+            self._json(200, {"ok": True, "ledger_text": ledger})
+            return
+        if path == "/api/v1/ai/drafts" and method == "GET":
+            with state.lock:
+                drafts = [_draft_item(d) for d in state.drafts.values()]
+            self._json(200, _page(drafts, query, "drafts"))
+            return
+        m = _ID_PATH.match(path)
+        if m is not None:
+            self._item(m.group(1), int(m.group(2)), bool(m.group(3)), body)
+            return
+        self._json(404, {"error": f"not found: {method} {path}"})
+
+    def _item(self, base: str, item_id: int, suggestions: bool, body: bytes) -> None:
+        state = self.server.state
+        store = state.journals if base == "/api/v1/journals" else state.drafts
+        with state.lock:
+            item = store.get(item_id)
+            if item is not None and self.command == "DELETE":
+                del store[item_id]
+            elif item is not None and suggestions and self.command == "PATCH":
+                item["suggestions"] = json.loads(body)["suggestions"]
+                item["status"] = "analyzed"
+        if item is None:
+            self._json(404, {"error": "見つかりません"})
+        elif self.command == "GET" and base == "/api/v1/journals":
+            self._json(200, {"ok": True, "journal": item})
+        elif self.command == "GET":
+            self._json(200, {"ok": True, "draft": {
+                **_draft_item(item), "suggestions": item["suggestions"],
+            }})
+        else:
+            self._json(200, {"ok": True})
+
+    # --- LLM provider ---
+
+    def _llm(self, provider: str, body: bytes) -> None:
+        state = self.server.state
+        config = state.config
+        state.delay(config.provider_latency.get(provider, config.llm_latency))
+        if state.roll(config.llm_throttle_rate):
+            self._json(
+                429, {"error": {"message": "rate limited"}},
+                {"Retry-After": str(config.retry_after)},
+            )
+            return
+        if state.roll(config.llm_error_rate):
+            self._json(500, {"error": {"message": "overloaded"}})
+            return
+        if _ROUND1.encode() in body:
+            needs_ledger = state.roll(config.needs_ledger_rate)
+            content: dict[str, Any] = {
+                "date": "2026-01-15", "description": "スーパー",
+                "amount": 3240, "document_type": "receipt",
+                "needs_ledger": needs_ledger,
+                "requested_accounts": ["食費"] if needs_ledger else [],
+            }
+        else:
+            content = {"suggestions": [{
+                "title": "食材購入", "date": "2026-01-15",
+                "entry_description": "スーパー",
+                "lines": [
+                    {"account_code": "5010", "account_name": "食費",
+                     "debit_amount": 3240, "credit_amount": 0},
+                    {"account_code": "1010", "account_name": "現金",
+                     "debit_amount": 0, "credit_amount": 3240},
+                ],
+            }]}
+        text = json.dumps(content, ensure_ascii=False)
+        input_tokens = len(body) // 4
+        if provider == "openai":
+            self._json(200, {
+                "choices": [{"message": {"content": text}}],
+                "usage": {"prompt_tokens": input_tokens, "completion_tokens": 80},
+            })
+        elif provider == "anthropic":
+            self._json(200, {
+                "content": [{"type": "text", "text": text}],
+                "usage": {"input_tokens": input_tokens, "output_tokens": 80},
+            })
+        else:
+            self._json(200, {
+                "candidates": [{"content": {"parts": [{"text": text}]}}],
+                "usageMetadata": {
+                    "promptTokenCount": input_tokens, "candidatesTokenCount": 80,
+                },
+            })
+
+
+def _llm_provider(path: str) -> str | None:
+    if path == "/v1/chat/completions":
+        return "openai"
+    if path == "/v1/messages":
+        return "anthropic"
+    if path.startswith("/v1beta/models/") and path.endswith(":generateContent"):
+        return "google"
+    return None
+
+
+def _page(items: list[dict[str, Any]], query: dict[str, list[str]], key: str) -> dict[str, Any]:
+    page = int(query.get("page", ["1"])[0])
+    per_page = int(query.get("per_page", ["20"])[0])
+    start = (page - 1) * per_page
+    return {
+        "ok": True, key: items[start:start + per_page],
+        "total": len(items), "page": page, "per_page": per_page,
+    }
+
+
+def _draft_item(draft: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "id": draft["id"], "status": draft["status"],
+        "comment": draft["comment"], "created_at": draft["created_at"],
+        "summary": None,
+    }
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # 同時接続数の多い負荷試験で listen キューが溢れないように
+    request_queue_size = 1024
+
+    def __init__(self, state: _State) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.state = state
+
+
+class _RedirectTransport(httpx.BaseTransport):
+    """送信先のホストだけを偽サーバに付け替える (パス・クエリはそのまま)。"""
+
+    def __init__(self, url: str, limits: httpx.Limits) -> None:
+        target = httpx.URL(url)
+        self._scheme = target.scheme
+        self._host = target.host
+        self._port = target.port
+        self._inner = httpx.HTTPTransport(limits=limits)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.url = request.url.copy_with(
+            scheme=self._scheme, host=self._host, port=self._port,
+        )
+        request.headers["Host"] = f"{self._host}:{self._port}"
+        return self._inner.handle_request(request)
+
+    def close(self) -> None:
+        self._inner.close()
+
+
+class FakeBackend:
+    """バックグラウンドのスレッドで偽サーバを動かす。
+
+    with 文で起動・停止する。url をクライアントの base_url に、
+    llm_http_client() を llm_http_client に渡す。
+    """
+
+    def __init__(self, config: FakeConfig | None = None) -> None:
+        self.config = config or FakeConfig()
+        self._state = _State(self.config)
+        self._server = _Server(self._state)
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="fake-backend", daemon=True,
+        )
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def llm_http_client(self, limits: httpx.Limits | None = None) -> httpx.Client:
+        """LLM provider への送信を偽サーバに向ける httpx.Client。"""
+        return httpx.Client(transport=_RedirectTransport(
+            self.url, limits or httpx.Limits(max_connections=100),
+        ))
+
+    def hits(self) -> dict[str, int]:
+        """エンドポイント → 受信件数。"""
+        with self._state.lock:
+            return dict(self._state.hits)
+
+    def start(self) -> FakeBackend:
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self) -> FakeBackend:
+        return self.start()
+
+    def __exit__(self, *exc: object) -> None:
+        self.stop()
@@ -0,0 +1,222 @@
+"""ローカルの偽サーバに対する KakeiboClient の負荷試験
+
+fake_backend.FakeBackend を起動し、指定の並列度でワークロードを流して
+スループットとレイテンシの分位点を表示する。ワーカープールの大きさや
+レート制限の設定を決めるのと、スループットの退行を見つけるのに使う。
+
+    python benchmarks/loadtest.py analyze -n 200 -c 16 --llm-latency 0.5
+    python benchmarks/loadtest.py analyze_many -n 500 -c 32 --llm-throttle-rate 0.05
+    python benchmarks/loadtest.py create_journal -n 2000 -c 32 --server-error-rate 0.01
+
+ワークロード:
+    analyze         1 件ずつ analyze() (c 並列のスレッドから)
+    analyze_many    analyze_many(concurrency=c) 1 回で n 枚
+    create_journal  create_journal() を c 並列
+    list_journals   list_journals(per_page=100) を c 並列 (事前に 500 件起票)
+
+レイテンシは 1 操作 (analyze_many は 1 枚) の完了までの時間。エンドポイント
+ごとの内訳はクライアントの InMemoryMetrics から出す。
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import sys
+import time
+from collections import Counter
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from fake_backend import FakeBackend, FakeConfig  # noqa: E402
+
+from iikanji import (  # noqa: E402
+    InMemoryMetrics,
+    JournalLine,
+    KakeiboClient,
+    RetryPolicy,
+)
+
+_LINES = [JournalLine("5010", debit=3240), JournalLine("1010", credit=3240)]
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    """最近傍順位法の q 分位 (0〜1)。"""
+    if not sorted_values:
+        return math.nan
+    rank = max(1, math.ceil(q * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _client(fake: FakeBackend, args: argparse.Namespace, metrics: InMemoryMetrics) -> KakeiboClient:
+    return KakeiboClient(
+        fake.url, "ik_load",
+        openai_api_key="sk-fake",
+        anthropic_api_key="sk-ant-fake",
+        google_api_key="fake",
+        timeout=30.0,
+        llm_http_client=fake.llm_http_client(),
+        speculative_round2=args.speculative_round2,
+        retry_policy=None if args.no_retry else RetryPolicy(max_retry_after=5.0),
+        metrics=metrics,
+    )
+
+
+def _run_each(
+    op: Callable[[], object], n: int, concurrency: int,
+) -> tuple[list[float], Counter[str]]:
+    latencies: list[float] = []
+    errors: Counter[str] = Counter()
+
+    def timed() -> None:
+        started = time.perf_counter()
+        try:
+            op()
+        except Exception as e:
+            errors[type(e).__name__] += 1
+        else:
+            latencies.append(time.perf_counter() - started)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(timed) for _ in range(n)]:
+            future.result()
+    return latencies, errors
+
+
+def _run_analyze_many(
+    client: KakeiboClient, image: bytes, args: argparse.Namespace,
+) -> tuple[list[float], Counter[str]]:
+    latencies: list[float] = []
+    errors: Counter[str] = Counter()
+    started = time.perf_counter()
+    for item in client.analyze_many(
+        (image for _ in range(args.requests)),
+        provider=args.provider,
+        concurrency=args.concurrency,
+        server_concurrency=args.concurrency,
+        llm_concurrency=args.concurrency,
+    ):
+        if item.ok:
+            # 完了順に返るので、開始からの経過時間の分布になる
+            latencies.append(time.perf_counter() - started)
+        else:
+            errors[type(item.error).__name__] += 1
+    return latencies, errors
+
+
+def _report(
+    args: argparse.Namespace,
+    elapsed: float,
+    latencies: list[float],
+    errors: Counter[str],
+    metrics: InMemoryMetrics,
+    client: KakeiboClient,
+    fake: FakeBackend,
+) -> None:
+    latencies.sort()
+    done = len(latencies)
+    print(f"workload={args.workload} requests={args.requests} "
+          f"concurrency={args.concurrency} elapsed={elapsed:.2f}s")
+    print(f"throughput: {done / elapsed:.1f} ok/s  "
+          f"(ok={done}, failed={sum(errors.values())})")
+    if latencies:
+        print("latency:    " + "  ".join(
+            f"{label}={_percentile(latencies, q) * 1000:.0f}ms"
+            for label, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0))
+        ))
+    for name, count in errors.most_common():
+        print(f"  error {name}: {count}")
+
+    print(f"\n{'endpoint':<52} {'calls':>6} {'p50':>8} {'p99':>8}  statuses")
+    for key, stats in sorted(metrics.snapshot().items()):
+        statuses = " ".join(f"{s}:{n}" for s, n in sorted(stats.statuses.items()))
+        print(
+            f"{key:<52} {stats.count:>6} "
+            f"{stats.quantile(0.5) * 1000:>6.0f}ms {stats.quantile(0.99) * 1000:>6.0f}ms"
+            f"  {statuses}"
+        )
+    retries = client.retry_stats()
+    print("\nretries: " + "  ".join(
+        f"{kind}={s.retries} (gave_up={s.gave_up}, waited={s.backoff_seconds:.1f}s)"
+        for kind, s in retries.items()
+    ))
+    if args.verbose:
+        print("\nfake backend hits:")
+        for endpoint, count in sorted(fake.hits().items()):
+            print(f"  {endpoint}: {count}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("workload", choices=(
+        "analyze", "analyze_many", "create_journal", "list_journals",
+    ))
+    parser.add_argument("-n", "--requests", type=int, default=100)
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    parser.add_argument("--provider", default="openai",
+                        choices=("openai", "anthropic", "google"))
+    parser.add_argument("--image-kb", type=int, default=200,
+                        help="analyze で送る画像の大きさ (KiB)")
+    parser.add_argument("--server-latency", type=float, default=0.01)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--jitter", type=float, default=0.5)
+    parser.add_argument("--server-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=0.2)
+    parser.add_argument("--needs-ledger-rate", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--speculative-round2", action="store_true")
+    parser.add_argument("--no-retry", action="store_true")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="偽サーバ側の受信件数も表示する")
+    args = parser.parse_args(argv)
+
+    config = FakeConfig(
+        server_latency=args.server_latency,
+        llm_latency=args.llm_latency,
+        jitter=args.jitter,
+        server_error_rate=args.server_error_rate,
+        llm_error_rate=args.llm_error_rate,
+        llm_throttle_rate=args.llm_throttle_rate,
+        retry_after=args.retry_after,
+        needs_ledger_rate=args.needs_ledger_rate,
+        seed=args.seed,
+    )
+    image = b"\xff\xd8\xff\xe0" + bytes(range(256)) * (args.image_kb * 4)
+    metrics = InMemoryMetrics()
+    with FakeBackend(config) as fake, _client(fake, args, metrics) as client:
+        if args.workload == "list_journals":
+            for _ in range(500):
+                client.create_journal(
+                    date="2026-01-15", description="seed", lines=_LINES,
+                )
+            metrics.reset()
+
+        started = time.perf_counter()
+        if args.workload == "analyze_many":
+            latencies, errors = _run_analyze_many(client, image, args)
+        else:
+            ops: dict[str, Callable[[], object]] = {
+                "analyze": lambda: client.analyze(image, provider=args.provider),
+                "create_journal": lambda: client.create_journal(
+                    date="2026-01-15", description="負荷試験", lines=_LINES,
+                ),
+                "list_journals": lambda: client.list_journals(per_page=100),
+            }
+            latencies, errors = _run_each(
+                ops[args.workload], args.requests, args.concurrency,
+            )
+        elapsed = time.perf_counter() - started
+        _report(args, elapsed, latencies, errors, metrics, client, fake)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
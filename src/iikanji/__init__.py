@@ -1,30 +1,80 @@
 """いいかんじ家計簿 Python クライアント"""
 
+from .async_client import AsyncKakeiboClient
+from .circuit import CircuitBreakerPolicy, CircuitState
 from .client import KakeiboClient
-from .exceptions import AuthenticationError, KakeiboAPIError
+from .exceptions import (
+    AuthenticationError,
+    CircuitOpenError,
+    DeadlineExceededError,
+    KakeiboAPIError,
+    LLMAPIError,
+    PendingSaveError,
+)
+from .image import ImageOptions
+from .llm import TokenUsage
+from .metrics import EndpointMetrics, InMemoryMetrics, MetricsSink
 from .models import (
+    AnalyzeBatchItem,
+    AnalyzeCheckpoint,
     AnalyzeResponse,
+    AnalyzeTrace,
+    BulkDeleteResult,
+    BulkProgress,
     DraftDetail,
     DraftListItem,
     DraftListResponse,
     DraftSummary,
+    JournalCreateRequest,
     JournalCreateResponse,
     JournalDetail,
     JournalLine,
     JournalListResponse,
+    PhaseTrace,
+    SpeculationStats,
 )
+from .ratelimit import RateLimiter, RateLimitStats
+from .retry import DEFAULT_RETRY_POLICY, RetryPolicy, RetryStats
+from .usage import ModelPrice, UsageStats
 
 __all__ = [
     "KakeiboClient",
+    "AsyncKakeiboClient",
     "JournalLine",
+    "JournalCreateRequest",
     "JournalCreateResponse",
     "JournalDetail",
     "JournalListResponse",
+    "BulkProgress",
+    "BulkDeleteResult",
     "AnalyzeResponse",
+    "AnalyzeBatchItem",
+    "AnalyzeCheckpoint",
+    "AnalyzeTrace",
+    "PhaseTrace",
+    "SpeculationStats",
+    "TokenUsage",
+    "ModelPrice",
+    "UsageStats",
+    "RetryPolicy",
+    "RetryStats",
+    "DEFAULT_RETRY_POLICY",
+    "RateLimiter",
+    "RateLimitStats",
+    "CircuitBreakerPolicy",
+    "CircuitState",
+    "MetricsSink",
+    "InMemoryMetrics",
+    "EndpointMetrics",
+    "ImageOptions",
     "DraftDetail",
     "DraftListItem",
     "DraftListResponse",
     "DraftSummary",
     "KakeiboAPIError",
     "AuthenticationError",
+    "PendingSaveError",
+    "LLMAPIError",
+    "CircuitOpenError",
+    "DeadlineExceededError",
 ]
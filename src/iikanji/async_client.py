@@ -0,0 +1,867 @@
+"""いいかんじ家計簿 API 非同期クライアント"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable, Mapping
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, TypeVar
+
+import httpx
+
+from . import llm
+from .circuit import CircuitBreakerPolicy
+from .client import (
+    DEFAULT_LLM_POOL_LIMITS,
+    _LLM_TIMEOUT,
+    _MAX_PER_PAGE,
+    _P,
+    _AnalyzeFlow,
+    _BaseClient,
+    _BulkTracker,
+    _Deadline,
+    _Request,
+    _Shard,
+    _llm_api_key_for,
+)
+from .exceptions import (
+    AuthenticationError,
+    DeadlineExceededError,
+    LLMAPIError,
+)
+from .image import ImageOptions, preprocess_image
+from .models import (
+    AnalyzeBatchItem,
+    AnalyzeCheckpoint,
+    AnalyzeResponse,
+    AnalyzeTrace,
+    BulkDeleteResult,
+    BulkProgress,
+    DraftDetail,
+    DraftListItem,
+    DraftListResponse,
+    JournalCreateRequest,
+    JournalCreateResponse,
+    JournalDetail,
+    JournalLine,
+    JournalListResponse,
+)
+from .metrics import MetricsSink
+from .ratelimit import RateLimiter
+from .usage import ModelPrice
+from .retry import DEFAULT_RETRY_POLICY, RetryPolicy
+
+if TYPE_CHECKING:
+    from types import TracebackType
+
+_T = TypeVar("_T")
+_R = TypeVar("_R")
+
+
+async def _gather(aws: Iterable[Awaitable[_T]]) -> list[_T]:
+    """asyncio.gather と同じだが、1 件でも失敗したら残りをキャンセルする。"""
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+def _discard(task: asyncio.Future[Any]) -> bool:
+    """結果を使わない task を取り消す。取り消せたら True。
+
+    完了済みなら例外を読み捨てる (未取得の例外として警告されないように)。
+    """
+    if task.cancel():
+        return True
+    if not task.cancelled():
+        task.exception()
+    return False
+
+
+async def _aacquire_limit(
+    limiter: RateLimiter, tokens: int, deadline: _Deadline | None, phase: str,
+) -> None:
+    """client._acquire_limit の非同期版。"""
+    if deadline is None:
+        await limiter.aacquire(tokens)
+    elif not await limiter.aacquire(tokens, timeout=deadline.remaining(phase)):
+        raise DeadlineExceededError(phase, deadline.budget)
+
+
+@asynccontextmanager
+async def _ahold(
+    gate: asyncio.Semaphore | None, deadline: _Deadline | None, phase: str,
+) -> AsyncIterator[None]:
+    """client._hold の非同期版。"""
+    if gate is None:
+        yield
+        return
+    if deadline is None:
+        await gate.acquire()
+    else:
+        timeout = deadline.remaining(phase)
+        try:
+            await asyncio.wait_for(gate.acquire(), timeout)
+        except TimeoutError:
+            raise DeadlineExceededError(phase, deadline.budget) from None
+    try:
+        yield
+    finally:
+        gate.release()
+
+
+class AsyncKakeiboClient(_BaseClient):
+    """いいかんじ家計簿 API 非同期クライアント
+
+    KakeiboClient と同じメソッドを ``httpx.AsyncClient`` 上の coroutine
+    として提供する。リクエスト組立と応答解析は KakeiboClient と共通。
+
+    Usage::
+
+        async with AsyncKakeiboClient("https://example.com", "ik_abc...") as client:
+            result = await client.create_journal(
+                date="2026-02-15",
+                description="食材購入",
+                lines=[
+                    JournalLine(account_code="7010", debit=3000),
+                    JournalLine(account_code="1010", credit=3000),
+                ],
+            )
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        *,
+        openai_api_key: str | None = None,
+        anthropic_api_key: str | None = None,
+        google_api_key: str | None = None,
+        timeout: float = 30.0,
+        http_client: httpx.AsyncClient | None = None,
+        llm_http_client: httpx.AsyncClient | None = None,
+        prompt_context_ttl: float | None = 300.0,
+        ledger_cache_ttl: float | None = 30.0,
+        llm_pool_limits: httpx.Limits | None = None,
+        image_options: ImageOptions | None = None,
+        speculative_round2: bool = False,
+        write_behind: bool = False,
+        retry_policy: RetryPolicy | None = DEFAULT_RETRY_POLICY,
+        server_rate_limit: RateLimiter | None = None,
+        llm_rate_limits: Mapping[str, RateLimiter] | None = None,
+        circuit_breaker: CircuitBreakerPolicy | None = None,
+        on_trace: Callable[[AnalyzeTrace], None] | None = None,
+        metrics: MetricsSink | None = None,
+        model_prices: Mapping[str, ModelPrice] | None = None,
+    ) -> None:
+        """引数は KakeiboClient と同じ (http_client / llm_http_client は
+        ``httpx.AsyncClient``)。レート制限に達した呼出はブロックせず await で待つ。"""
+        super().__init__(
+            base_url,
+            api_key,
+            openai_api_key=openai_api_key,
+            anthropic_api_key=anthropic_api_key,
+            google_api_key=google_api_key,
+            prompt_context_ttl=prompt_context_ttl,
+            ledger_cache_ttl=ledger_cache_ttl,
+            image_options=image_options,
+            speculative_round2=speculative_round2,
+            write_behind=write_behind,
+            retry_policy=retry_policy,
+            server_rate_limit=server_rate_limit,
+            llm_rate_limits=llm_rate_limits,
+            circuit_breaker=circuit_breaker,
+            on_trace=on_trace,
+            metrics=metrics,
+            model_prices=model_prices,
+        )
+        self._llm_http_client = llm_http_client
+        self._llm_pool_limits = llm_pool_limits or DEFAULT_LLM_POOL_LIMITS
+        self._llm_clients: dict[str, httpx.AsyncClient] = {}
+        if http_client is not None:
+            self._client = http_client
+            self._owns_client = False
+        else:
+            self._client = httpx.AsyncClient(
+                base_url=self._base_url,
+                headers=self._default_headers(),
+                timeout=timeout,
+            )
+            self._owns_client = True
+
+    async def __aenter__(self) -> AsyncKakeiboClient:
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """保留中の保存 (write_behind) を待ってから HTTP クライアントを閉じる。
+
+        Raises:
+            PendingSaveError: 保留中の保存に失敗したものがある場合
+        """
+        try:
+            await self.flush()
+        finally:
+            if self._owns_client:
+                await self._client.aclose()
+            clients = list(self._llm_clients.values())
+            self._llm_clients.clear()
+            for client in clients:
+                await client.aclose()
+
+    async def flush(self) -> None:
+        """write_behind で保留中の保存がすべて終わるまで待つ。KakeiboClient.flush の非同期版。"""
+        with self._pending_saves_lock:
+            pending = list(self._pending_saves)
+        if pending:
+            await asyncio.wait(pending)
+        for task in pending:
+            self._settle_save(task)
+        self._raise_save_errors()
+
+    def _save_behind(self, flow: _AnalyzeFlow) -> None:
+        assert flow.draft_id is not None
+        task = asyncio.ensure_future(self._save(flow))
+        with self._pending_saves_lock:
+            self._pending_saves[task] = flow.draft_id
+        task.add_done_callback(self._settle_save)
+
+    async def _save(self, flow: _AnalyzeFlow) -> None:
+        flow.on_save(await self._send(flow.save_request()))
+
+    def _llm_client(self, provider: str) -> httpx.AsyncClient:
+        """provider 用の HTTP クライアント。KakeiboClient._llm_client と同じ。"""
+        if self._llm_http_client is not None:
+            return self._llm_http_client
+        client = self._llm_clients.get(provider)
+        if client is None:
+            client = httpx.AsyncClient(limits=self._llm_pool_limits)
+            self._llm_clients[provider] = client
+        return client
+
+    async def _send(
+        self,
+        req: _Request,
+        *,
+        deadline: _Deadline | None = None,
+        phase: str = "",
+    ) -> httpx.Response:
+        """req を送る。KakeiboClient._send と同じく一時的な失敗は再送し、
+        deadline があれば残り時間で打ち切る。"""
+        breaker = f"server:{req.endpoint()}"
+        attempt = 0
+        while True:
+            if self._server_rate_limit is not None:
+                await _aacquire_limit(self._server_rate_limit, 0, deadline, phase)
+            timeout = (
+                httpx.USE_CLIENT_DEFAULT if deadline is None
+                else deadline.cap(phase, self._client.timeout)
+            )
+            started = time.perf_counter()
+            try:
+                with self._guard(breaker) as outcome:
+                    outcome.deadline_capped = (
+                        deadline is not None and timeout != self._client.timeout
+                    )
+                    resp = await self._client.request(
+                        req.method,
+                        req.path,
+                        params=req.params,
+                        json=req.json,
+                        files=req.files,
+                        data=req.data,
+                        headers=req.headers,
+                        timeout=timeout,
+                    )
+                    outcome.failed = resp.status_code >= 500
+            except httpx.TransportError as e:
+                self._observe_server(req, started, None)
+                if deadline is not None:
+                    deadline.remaining(phase, cause=e)
+                delay = self._retry_delay(
+                    "server", attempt, exc=e, idempotent=req.is_idempotent(),
+                    deadline=deadline,
+                )
+                if delay is None:
+                    raise
+            else:
+                self._observe_server(req, started, resp)
+                delay = self._response_retry_delay(req, attempt, resp, deadline)
+                if delay is None:
+                    return resp
+                await resp.aclose()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _call_llm(
+        self,
+        call: dict[str, Any],
+        on_usage: llm.UsageCallback | None = None,
+        *,
+        deadline: _Deadline | None = None,
+        phase: str = "",
+    ) -> dict[str, Any]:
+        """llm.acall_image_llm をレート制限と retry_policy に従って呼ぶ。"""
+        limiter, estimate, on_usage = self._llm_rate_limit(
+            call, self._track_usage(call, on_usage),
+        )
+        attempt = 0
+        while True:
+            if limiter is not None:
+                await _aacquire_limit(limiter, estimate, deadline, phase)
+            timeout = self._llm_timeout(deadline, phase)
+            started = time.perf_counter()
+            try:
+                with self._guard(f"llm:{call['provider']}") as outcome:
+                    outcome.deadline_capped = timeout < _LLM_TIMEOUT
+                    result = await llm.acall_image_llm(
+                        **call, http_client=self._llm_client(call["provider"]),
+                        timeout=timeout, on_usage=on_usage,
+                    )
+            except (LLMAPIError, httpx.TransportError) as e:
+                self._observe_llm(call, started, e)
+                if deadline is not None and isinstance(e, httpx.TransportError):
+                    deadline.remaining(phase, cause=e)
+                delay = self._retry_delay("llm", attempt, exc=e, deadline=deadline)
+                if delay is None:
+                    raise
+            else:
+                self._observe_llm(call, started)
+                return result
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _iter_pages(
+        self, fetch: Callable[[int], Awaitable[_P]],
+    ) -> AsyncIterator[_P]:
+        """ページ 1 から順に返す。yield 中に次ページを別タスクで取得する。"""
+        pending: asyncio.Task[_P] | None = asyncio.ensure_future(fetch(1))
+        page_no = 1
+        try:
+            while pending is not None:
+                page = await pending
+                pending = None
+                if self._has_next_page(page):
+                    page_no += 1
+                    pending = asyncio.ensure_future(fetch(page_no))
+                yield page
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    async def _run_bulk(
+        self,
+        func: Callable[[_T], Awaitable[_R]],
+        items: list[_T],
+        *,
+        concurrency: int,
+        progress: Callable[[BulkProgress], None] | None,
+    ) -> list[_R | Exception]:
+        """KakeiboClient._run_bulk の非同期版 (同時実行数はセマフォで制限)。"""
+        results: list[Any] = [None] * len(items)
+        tracker = _BulkTracker(len(items), progress)
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def run(i: int, item: _T) -> None:
+            async with semaphore:
+                try:
+                    results[i] = await func(item)
+                except AuthenticationError:
+                    raise
+                except Exception as e:
+                    results[i] = e
+            tracker.record(results[i])
+
+        await _gather(run(i, item) for i, item in enumerate(items))
+        return results
+
+    # --- 仕訳 ---
+
+    async def create_journal(
+        self,
+        *,
+        date: date | datetime | str,
+        description: str,
+        lines: list[JournalLine],
+        source: str = "api",
+        draft_id: int | None = None,
+    ) -> JournalCreateResponse:
+        """仕訳を起票する。KakeiboClient.create_journal の非同期版。"""
+        return await self._post_journal(JournalCreateRequest(
+            date=date,
+            description=description,
+            lines=lines,
+            source=source,
+            draft_id=draft_id,
+        ))
+
+    async def create_journals(
+        self,
+        requests: Iterable[JournalCreateRequest],
+        *,
+        concurrency: int = 8,
+        progress: Callable[[BulkProgress], None] | None = None,
+    ) -> list[JournalCreateResponse | Exception]:
+        """仕訳を一括起票する。KakeiboClient.create_journals の非同期版。"""
+        return await self._run_bulk(
+            self._post_journal, list(requests),
+            concurrency=concurrency, progress=progress,
+        )
+
+    async def _post_journal(
+        self, req: JournalCreateRequest,
+    ) -> JournalCreateResponse:
+        resp = await self._send(self._post_journal_request(req))
+        result = self._parse_create_journal(resp)
+        self._journal_written(req.lines)
+        return result
+
+    async def get_journal(self, journal_id: int) -> JournalDetail:
+        """仕訳を1件取得する。KakeiboClient.get_journal の非同期版。"""
+        resp = await self._send(self._get_journal_request(journal_id))
+        return self._parse_get_journal(resp)
+
+    async def list_journals(
+        self,
+        *,
+        date_from: date | datetime | str | None = None,
+        date_to: date | datetime | str | None = None,
+        page: int = 1,
+        per_page: int = 20,
+    ) -> JournalListResponse:
+        """仕訳一覧を取得する。KakeiboClient.list_journals の非同期版。"""
+        req = self._list_journals_request(
+            date_from=date_from, date_to=date_to, page=page, per_page=per_page,
+        )
+        return self._parse_list_journals(await self._send(req))
+
+    async def iter_journals(
+        self,
+        *,
+        date_from: date | datetime | str | None = None,
+        date_to: date | datetime | str | None = None,
+        per_page: int = _MAX_PER_PAGE,
+    ) -> AsyncIterator[JournalDetail]:
+        """仕訳を全ページ分 1 件ずつ返す。KakeiboClient.iter_journals の非同期版。"""
+        async def fetch(page: int) -> JournalListResponse:
+            return await self.list_journals(
+                date_from=date_from, date_to=date_to,
+                page=page, per_page=per_page,
+            )
+
+        async for page in self._iter_pages(fetch):
+            for journal in page.journals:
+                yield journal
+
+    async def list_all_journals(
+        self,
+        *,
+        date_from: date | datetime | str | None = None,
+        date_to: date | datetime | str | None = None,
+        per_page: int = _MAX_PER_PAGE,
+        max_workers: int = 4,
+        shard_by: str | None = None,
+        shard_max_total: int = 1000,
+    ) -> list[JournalDetail]:
+        """条件に合う仕訳を全件取得する。KakeiboClient.list_all_journals の非同期版。
+
+        max_workers は同時に取得中のページ数の上限として扱う。
+        """
+        semaphore = asyncio.Semaphore(max(1, max_workers))
+
+        async def fetch(
+            date_from: date | datetime | str | None,
+            date_to: date | datetime | str | None,
+            page: int,
+        ) -> JournalListResponse:
+            async with semaphore:
+                return await self.list_journals(
+                    date_from=date_from, date_to=date_to,
+                    page=page, per_page=per_page,
+                )
+
+        async def read(
+            date_from: date | datetime | str | None,
+            date_to: date | datetime | str | None,
+            shard: _Shard | None,
+        ) -> list[JournalDetail]:
+            first = await fetch(date_from, date_to, 1)
+            if shard is not None:
+                finer = self._split_shard(shard, first.total, shard_max_total)
+                if finer:
+                    parts = await _gather(
+                        read(sub.start, sub.end, sub) for sub in finer
+                    )
+                    return [j for part in parts for j in part]
+            journals = list(first.journals)
+            if first.journals:
+                pages = await _gather(
+                    fetch(date_from, date_to, page)
+                    for page in range(2, self._page_count(first) + 1)
+                )
+                for page in pages:
+                    journals.extend(page.journals)
+            return journals
+
+        if shard_by is None:
+            return await read(date_from, date_to, None)
+        shards = self._initial_shards(date_from, date_to, shard_by)
+        parts = await _gather(
+            read(shard.start, shard.end, shard) for shard in shards
+        )
+        return [j for part in parts for j in part]
+
+    async def delete_journal(self, journal_id: int) -> None:
+        """仕訳を削除する。KakeiboClient.delete_journal の非同期版。"""
+        resp = await self._send(self._delete_journal_request(journal_id))
+        self._parse_empty(resp)
+        self._journal_written(None)
+
+    async def delete_journals(
+        self,
+        journal_ids: Iterable[int],
+        *,
+        concurrency: int = 8,
+        progress: Callable[[BulkProgress], None] | None = None,
+    ) -> BulkDeleteResult:
+        """仕訳を一括削除する。KakeiboClient.delete_journals の非同期版。"""
+        ids = list(journal_ids)
+        results = await self._run_bulk(
+            self.delete_journal, ids,
+            concurrency=concurrency, progress=progress,
+        )
+        return self._bulk_delete_result(ids, results)
+
+    # --- AI 証憑仕訳 ---
+
+    async def analyze(
+        self,
+        image: str | Path | bytes,
+        *,
+        comment: str = "",
+        mime_type: str | None = None,
+        provider: str = "openai",
+        model: str | None = None,
+        timeout_budget: float | None = None,
+        on_checkpoint: Callable[[AnalyzeCheckpoint], None] | None = None,
+    ) -> AnalyzeResponse:
+        """画像を AI 解析して下書きを作成する。KakeiboClient.analyze の非同期版。
+
+        LLM 呼出は llm.acall_image_llm 経由で、イベントループをブロックしない。
+        """
+        flow = self._analyze_flow(
+            image,
+            comment=comment,
+            mime_type=mime_type,
+            provider=provider,
+            model=model,
+            timeout_budget=timeout_budget,
+            on_checkpoint=on_checkpoint,
+        )
+        return await self._run_analyze(flow)
+
+    async def resume_analyze(
+        self,
+        checkpoint: AnalyzeCheckpoint,
+        image: str | Path | bytes | None = None,
+        *,
+        timeout_budget: float | None = None,
+        on_checkpoint: Callable[[AnalyzeCheckpoint], None] | None = None,
+    ) -> AnalyzeResponse:
+        """途中で失敗した analyze() を再開する。KakeiboClient.resume_analyze の非同期版。"""
+        flow = self._resume_flow(
+            checkpoint, image,
+            timeout_budget=timeout_budget, on_checkpoint=on_checkpoint,
+        )
+        return await self._run_analyze(flow)
+
+    async def analyze_many(
+        self,
+        images: Iterable[str | Path | bytes],
+        *,
+        comment: str = "",
+        mime_type: str | None = None,
+        provider: str = "openai",
+        model: str | None = None,
+        concurrency: int = 8,
+        server_concurrency: int = 4,
+        llm_concurrency: int = 4,
+        preprocess_workers: int = 0,
+        timeout_budget: float | None = None,
+    ) -> AsyncIterator[AnalyzeBatchItem]:
+        """複数の画像をパイプラインで AI 解析する。KakeiboClient.analyze_many の非同期版。"""
+        _llm_api_key_for(self._llm_api_keys, provider)
+        server_gate = asyncio.Semaphore(max(1, server_concurrency))
+        llm_gate = asyncio.Semaphore(max(1, llm_concurrency))
+        preprocess_pool = (
+            ProcessPoolExecutor(max_workers=preprocess_workers)
+            if preprocess_workers > 0 and self._image_options is not None
+            else None
+        )
+
+        async def run(
+            image: str | Path | bytes, checkpoint: AnalyzeCheckpoint,
+        ) -> AnalyzeResponse:
+            flow = self._analyze_flow(
+                image,
+                comment=comment,
+                mime_type=mime_type,
+                provider=provider,
+                model=model,
+                timeout_budget=timeout_budget,
+                checkpoint=checkpoint,
+            )
+            return await self._run_analyze(
+                flow, server_gate=server_gate, llm_gate=llm_gate,
+                preprocess_pool=preprocess_pool,
+            )
+
+        source = enumerate(images)
+        pending: dict[
+            asyncio.Task[AnalyzeResponse], tuple[int, AnalyzeCheckpoint]
+        ] = {}
+
+        def fill() -> None:
+            while len(pending) < max(1, concurrency):
+                item = next(source, None)
+                if item is None:
+                    return
+                checkpoint = AnalyzeCheckpoint(
+                    provider=provider, requested_model=model,
+                    comment=comment, mime_type=mime_type,
+                )
+                task = asyncio.ensure_future(run(item[1], checkpoint))
+                pending[task] = (item[0], checkpoint)
+
+        try:
+            fill()
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    index, checkpoint = pending.pop(task)
+                    try:
+                        item = AnalyzeBatchItem(
+                            index=index, response=task.result(),
+                        )
+                    except AuthenticationError:
+                        raise
+                    except Exception as e:
+                        item = AnalyzeBatchItem(
+                            index=index, error=e, checkpoint=checkpoint,
+                        )
+                    yield item
+                fill()
+        finally:
+            for task in pending:
+                task.cancel()
+            if preprocess_pool is not None:
+                preprocess_pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _run_analyze(
+        self,
+        flow: _AnalyzeFlow,
+        **options: Any,
+    ) -> AnalyzeResponse:
+        """_run_phases() を実行し、成否にかかわらず trace を on_trace に渡す。"""
+        started = time.perf_counter()
+        try:
+            result = await self._run_phases(flow, **options)
+        except BaseException as e:
+            self._finish_trace(flow, started, e)
+            raise
+        self._finish_trace(flow, started)
+        return result
+
+    async def _run_phases(
+        self,
+        flow: _AnalyzeFlow,
+        *,
+        server_gate: asyncio.Semaphore | None = None,
+        llm_gate: asyncio.Semaphore | None = None,
+        preprocess_pool: Executor | None = None,
+    ) -> AnalyzeResponse:
+        """analyze() の 6 ステップを実行する。gate はステージ別の同時実行制限。
+
+        画像の前処理は CPU 処理なので preprocess_pool (無ければ既定の
+        スレッドプール) に逃がし、イベントループを止めない。
+
+        アップロードは KakeiboClient._run_analyze と同じく別タスクで
+        2〜5 と並行させ、保存の直前で合流する。投機的 Round 2 は不要と
+        分かった時点 (または失敗時) に取り消す。時間予算の扱いも同期版と同じ。
+        """
+        deadline = flow.deadline
+
+        async def send(req: _Request, phase: str) -> httpx.Response:
+            with flow.trace_phase(phase) as trace:
+                async with _ahold(server_gate, deadline, phase):
+                    resp = await self._send(req, deadline=deadline, phase=phase)
+                flow.trace_response(trace, resp)
+                return resp
+
+        async def call_llm(
+            call: dict[str, Any],
+            phase: str,
+            on_usage: llm.UsageCallback | None = None,
+            speculative: bool = False,
+        ) -> dict[str, Any]:
+            with flow.trace_phase(
+                phase, call=call, speculative=speculative,
+            ) as trace:
+                async with _ahold(llm_gate, deadline, phase):
+                    return await self._call_llm(
+                        call, flow.usage_callback(trace, on_usage),
+                        deadline=deadline, phase=phase,
+                    )
+
+        if self._image_options is not None and flow.needs_image():
+            with flow.trace_phase("preprocess"):
+                processed = await asyncio.get_running_loop().run_in_executor(
+                    preprocess_pool, preprocess_image,
+                    flow.image_bytes, flow.mime_type, self._image_options,
+                )
+            flow.on_preprocessed(processed)
+            if deadline is not None:
+                deadline.remaining("preprocess")
+
+        upload = (
+            asyncio.ensure_future(send(flow.upload_request(), "upload"))
+            if flow.upload_pending() else None
+        )
+        speculative: asyncio.Future[dict[str, Any]] | None = None
+
+        def check_upload() -> None:
+            if upload is not None and upload.done() and flow.draft_id is None:
+                flow.on_upload(upload.result())
+
+        try:
+            if flow.round2_pending():
+                ctx_req = flow.prompt_context_request()
+                if ctx_req is not None:
+                    flow.on_prompt_context(await send(ctx_req, "prompt_context"))
+                check_upload()
+                if self._speculative_round2 and flow.round1_pending():
+                    spec_call = flow.speculative_round2_call()
+                    spec_usage: list[llm.TokenUsage] = []
+                    speculative = asyncio.ensure_future(
+                        call_llm(
+                            spec_call, "round2", spec_usage.append,
+                            speculative=True,
+                        ),
+                    )
+                    self._record_speculation(started=True)
+                if flow.round1_pending():
+                    flow.on_round1(await call_llm(flow.round1_call(), "round1"))
+                    check_upload()
+                ledger_req = flow.ledger_request()
+                if ledger_req is not None:
+                    flow.on_ledger(await send(ledger_req, "ledger"))
+                check_upload()
+                round2_call = flow.round2_call()
+                if speculative is not None and round2_call == spec_call:
+                    self._record_speculation(hit=True)
+                    adopted, speculative = speculative, None
+                    flow.on_round2(await adopted)
+                    flow.adopt_speculative_usage(spec_usage)
+                else:
+                    if speculative is not None:
+                        _discard(speculative)
+                        self._discard_speculation(speculative, spec_usage, missed=True)
+                        speculative = None
+                    flow.on_round2(await call_llm(round2_call, "round2"))
+            if upload is not None and flow.draft_id is None:
+                flow.on_upload(await upload)
+        except asyncio.CancelledError:
+            if upload is not None:
+                upload.cancel()
+            if speculative is not None:
+                _discard(speculative)
+                self._discard_speculation(speculative, spec_usage, missed=False)
+            raise
+        except BaseException:
+            if speculative is not None:
+                _discard(speculative)
+                self._discard_speculation(speculative, spec_usage, missed=False)
+            if upload is not None:
+                # 同期版と同じくアップロードの完了を待ち、成功していれば
+                # 再開に使えるよう checkpoint に残してから送出する
+                await asyncio.wait([upload])
+                if not upload.cancelled() and upload.exception() is None:
+                    flow.salvage_upload(upload.result())
+            raise
+        if flow.save_pending():
+            if self._write_behind:
+                # 後回しの保存は呼出元を待たせないので時間予算の対象外
+                self._save_behind(flow)
+            else:
+                flow.on_save(await send(flow.save_request(), "save"))
+        return flow.result()
+
+    async def list_drafts(
+        self,
+        *,
+        status: str = "analyzed",
+        page: int = 1,
+        per_page: int = 50,
+    ) -> DraftListResponse:
+        """下書き一覧を取得する。KakeiboClient.list_drafts の非同期版。"""
+        req = self._list_drafts_request(
+            status=status, page=page, per_page=per_page,
+        )
+        return self._parse_list_drafts(await self._send(req))
+
+    async def iter_drafts(
+        self,
+        *,
+        status: str = "analyzed",
+        per_page: int = _MAX_PER_PAGE,
+    ) -> AsyncIterator[DraftListItem]:
+        """下書きを全ページ分 1 件ずつ返す。KakeiboClient.iter_drafts の非同期版。"""
+        async def fetch(page: int) -> DraftListResponse:
+            return await self.list_drafts(
+                status=status, page=page, per_page=per_page,
+            )
+
+        async for page in self._iter_pages(fetch):
+            for draft in page.drafts:
+                yield draft
+
+    async def get_draft(self, draft_id: int) -> DraftDetail:
+        """下書き詳細を取得する。KakeiboClient.get_draft の非同期版。"""
+        resp = await self._send(self._get_draft_request(draft_id))
+        return self._parse_get_draft(resp)
+
+    async def delete_draft(self, draft_id: int) -> None:
+        """下書きを削除する。KakeiboClient.delete_draft の非同期版。"""
+        resp = await self._send(self._delete_draft_request(draft_id))
+        self._parse_empty(resp)
+
+    async def delete_drafts(
+        self,
+        draft_ids: Iterable[int],
+        *,
+        concurrency: int = 8,
+        progress: Callable[[BulkProgress], None] | None = None,
+    ) -> BulkDeleteResult:
+        """下書きを一括削除する。KakeiboClient.delete_drafts の非同期版。"""
+        ids = list(draft_ids)
+        results = await self._run_bulk(
+            self.delete_draft, ids,
+            concurrency=concurrency, progress=progress,
+        )
+        return self._bulk_delete_result(ids, results)
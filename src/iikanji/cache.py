@@ -0,0 +1,195 @@
+"""クライアント側キャッシュ
+
+analyze() が毎回取得するサーバ応答のうち、受信ごとにほぼ変わらないものを
+クライアント内に保持する。同期/非同期クライアントのどちらからも使える
+よう、ロックは短時間の辞書操作だけに限り I/O 中は保持しない。
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from collections.abc import Iterable
+from dataclasses import dataclass, field, replace
+from typing import Any
+
+
+@dataclass
+class CacheStats:
+    """キャッシュのヒット / ミス件数"""
+
+    hits: int = 0
+    misses: int = 0
+    revalidated: int = 0
+
+
+def account_codes(account_list_text: str) -> frozenset[str]:
+    """prompt-context の account_list_text から有効な勘定科目コードを抜き出す。
+
+    "5010 食費" のように数字で始まる行の先頭トークンをコードとみなす。
+    """
+    return frozenset(
+        line.split()[0]
+        for line in account_list_text.split("\n")
+        if line.strip() and line.strip()[0].isdigit()
+    )
+
+
+def normalize_account_name(name: str) -> str:
+    """勘定科目名の表記ゆれ (全角/半角・前後空白) を吸収する。"""
+    return unicodedata.normalize("NFKC", name).strip()
+
+
+def account_codes_by_name(account_list_text: str) -> dict[str, str]:
+    """account_list_text の "コード 科目名" 行から 科目名 → コード を作る。"""
+    result: dict[str, str] = {}
+    for line in account_list_text.split("\n"):
+        parts = line.split(maxsplit=1)
+        if len(parts) == 2 and parts[0][0].isdigit():
+            result[normalize_account_name(parts[1])] = parts[0]
+    return result
+
+
+@dataclass(frozen=True)
+class PromptContext:
+    """GET /api/v1/ai/prompt-context の解析済み応答"""
+
+    data: dict[str, Any]
+    account_codes: frozenset[str]
+    etag: str | None = None
+    account_codes_by_name: dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_data(
+        cls, data: dict[str, Any], etag: str | None = None,
+    ) -> PromptContext:
+        account_list_text = data.get("account_list_text", "")
+        return cls(
+            data=data,
+            account_codes=account_codes(account_list_text),
+            etag=etag,
+            account_codes_by_name=account_codes_by_name(account_list_text),
+        )
+
+
+class PromptContextCache:
+    """prompt-context の TTL キャッシュ
+
+    ttl 秒以内は保持している値をそのまま使う。期限切れ後はサーバが ETag を
+    返していれば If-None-Match で再検証し、304 なら値を使い回して期限を
+    延ばす。ttl=0 なら毎回再検証する (往復は減らないが転送と解析は省ける)。
+    """
+
+    def __init__(self, ttl: float = 300.0) -> None:
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._entry: PromptContext | None = None
+        self._expires_at = 0.0
+
+    def lookup(self) -> tuple[PromptContext | None, bool]:
+        """(保持している値, 期限内か) を返す。値が無ければ (None, False)。"""
+        with self._lock:
+            entry = self._entry
+            fresh = entry is not None and time.monotonic() < self._expires_at
+            if fresh:
+                self.stats.hits += 1
+            else:
+                self.stats.misses += 1
+            return entry, fresh
+
+    def store(self, entry: PromptContext) -> None:
+        with self._lock:
+            self._entry = entry
+            self._expires_at = time.monotonic() + self.ttl
+
+    def revalidated(self, entry: PromptContext) -> None:
+        """304 Not Modified を受けた entry の期限を延ばす。"""
+        with self._lock:
+            if self._entry is entry:
+                self._expires_at = time.monotonic() + self.ttl
+            self.stats.revalidated += 1
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entry = None
+            self._expires_at = 0.0
+
+    def stats_snapshot(self) -> CacheStats:
+        """ヒット / ミス件数のスナップショット。"""
+        with self._lock:
+            return replace(self.stats)
+
+
+@dataclass
+class _LedgerEntry:
+    ledger_text: str
+    account_codes: frozenset[str] | None
+    expires_at: float
+
+
+class LedgerCache:
+    """ledger-context 応答のキャッシュ (要求した勘定科目名の集合がキー)
+
+    バッチ処理では水道光熱費・地代家賃・未払金など同じ科目の元帳が繰り返し
+    要求されるため、短い TTL で使い回す。仕訳の起票・削除でその科目の元帳が
+    変わり得るときは invalidate() で該当エントリを捨てる。
+    """
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 256) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[frozenset[str], _LedgerEntry] = OrderedDict()
+
+    @staticmethod
+    def key(account_names: Iterable[str]) -> frozenset[str]:
+        return frozenset(normalize_account_name(n) for n in account_names)
+
+    def get(self, key: frozenset[str]) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() >= entry.expires_at:
+                self._entries.pop(key, None)
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return entry.ledger_text
+
+    def put(
+        self,
+        key: frozenset[str],
+        ledger_text: str,
+        account_codes: frozenset[str] | None,
+    ) -> None:
+        """account_codes は key の科目に対応するコード。不明なら None
+        (どの仕訳が書かれても無効化する)。"""
+        with self._lock:
+            self._entries[key] = _LedgerEntry(
+                ledger_text, account_codes, time.monotonic() + self.ttl,
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, account_codes: Iterable[str] | None = None) -> None:
+        """account_codes に触れるエントリを捨てる。None なら全件。"""
+        with self._lock:
+            if account_codes is None:
+                self._entries.clear()
+                return
+            touched = set(account_codes)
+            for key in [
+                k for k, e in self._entries.items()
+                if e.account_codes is None or e.account_codes & touched
+            ]:
+                del self._entries[key]
+
+    def stats_snapshot(self) -> CacheStats:
+        """ヒット / ミス件数のスナップショット。"""
+        with self._lock:
+            return replace(self.stats)
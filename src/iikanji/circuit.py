@@ -0,0 +1,203 @@
+"""サーキットブレーカ
+
+LLM プロバイダやサーバが劣化すると、呼出のたびにタイムアウト (LLM は
+60 秒) まで待たされ、ワーカが詰まってスループットが落ちる。失敗や遅延が
+続いた呼出先はしばらく「開いた」状態にして即座に CircuitOpenError を
+返し、reset_timeout 後に少数の試行 (half-open) で回復を確かめる。
+
+状態遷移::
+
+    closed --(連続 failure_threshold 回の失敗/遅延)--> open
+    open --(reset_timeout 経過)--> half_open
+    half_open --(試行が成功)--> closed
+    half_open --(試行が失敗)--> open
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Literal
+
+import httpx
+
+from .exceptions import CircuitOpenError, KakeiboAPIError, LLMAPIError
+
+CircuitStateName = Literal["closed", "open", "half_open"]
+
+
+@dataclass(frozen=True)
+class CircuitBreakerPolicy:
+    """サーキットブレーカの設定
+
+    failure_threshold: 連続でこの回数失敗 (5xx・通信エラー・遅延) したら開く
+    slow_call_seconds: これより時間の掛かった呼出は成功しても失敗と数える。
+        None なら遅延は見ない
+    reset_timeout: 開いてから試行 (half-open) を許すまでの秒数
+    half_open_max_calls: half-open 中に同時に通す試行の数
+    """
+
+    failure_threshold: int = 5
+    slow_call_seconds: float | None = None
+    reset_timeout: float = 30.0
+    half_open_max_calls: int = 1
+
+    def __post_init__(self) -> None:
+        if self.failure_threshold < 1:
+            raise ValueError("failure_threshold must be positive")
+        if self.half_open_max_calls < 1:
+            raise ValueError("half_open_max_calls must be positive")
+
+
+@dataclass(frozen=True)
+class CircuitState:
+    """ヘルスチェック用のブレーカ状態 (スナップショット)
+
+    state: "closed" (正常) / "open" (遮断中) / "half_open" (試行中)
+    consecutive_failures: 直近の連続失敗回数
+    opened: これまでに開いた回数
+    rejected: 開いていたため即座に失敗させた呼出の回数
+    retry_after: open のとき、試行を再開するまでの秒数 (それ以外は None)
+    """
+
+    name: str
+    state: CircuitStateName
+    consecutive_failures: int
+    opened: int
+    rejected: int
+    retry_after: float | None = None
+
+
+class CallOutcome:
+    """guard() 内の呼出結果
+
+    failed: 応答が失敗扱いなら True にする
+    deadline_capped: 呼出側の時間予算でタイムアウトを縮めたなら True にする。
+        このときのタイムアウトは呼出先の劣化とみなさず、結果不明として数えない
+    """
+
+    failed = False
+    deadline_capped = False
+
+
+def is_failure(exc: BaseException) -> bool:
+    """呼出先の劣化とみなす例外 (通信エラー・5xx) なら True。"""
+    if isinstance(exc, httpx.TransportError):
+        return True
+    if isinstance(exc, (KakeiboAPIError, LLMAPIError)):
+        return exc.status_code >= 500
+    return False
+
+
+class CircuitBreaker:
+    """呼出先 1 つ分のサーキットブレーカ (スレッドセーフ)
+
+    Usage::
+
+        with breaker.guard() as outcome:  # 開いていれば CircuitOpenError
+            resp = http.get(...)
+            outcome.failed = resp.status_code >= 500
+    """
+
+    def __init__(self, name: str, policy: CircuitBreakerPolicy) -> None:
+        self.name = name
+        self.policy = policy
+        self._lock = threading.Lock()
+        self._state: CircuitStateName = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._opened = 0
+        self._rejected = 0
+
+    def _current(self, now: float) -> CircuitStateName:
+        if (
+            self._state == "open"
+            and now - self._opened_at >= self.policy.reset_timeout
+        ):
+            self._state = "half_open"
+            self._probes = 0
+        return self._state
+
+    def _admit(self) -> bool:
+        """呼出を通すなら True (half-open の試行枠を取ったかどうか)。"""
+        with self._lock:
+            now = time.monotonic()
+            state = self._current(now)
+            if state == "closed":
+                return False
+            if state == "half_open" and self._probes < self.policy.half_open_max_calls:
+                self._probes += 1
+                return True
+            self._rejected += 1
+            retry_after = max(0.0, self._opened_at + self.policy.reset_timeout - now)
+        raise CircuitOpenError(self.name, retry_after)
+
+    def _finish(self, probe: bool, failed: bool | None, elapsed: float) -> None:
+        slow = self.policy.slow_call_seconds
+        if failed is False and slow is not None and elapsed > slow:
+            failed = True
+        with self._lock:
+            if probe:
+                self._probes -= 1
+            if failed is None:
+                # キャンセル等で結果が分からない呼出は数えない
+                return
+            if not failed:
+                self._failures = 0
+                if probe:
+                    self._state = "closed"
+                return
+            self._failures += 1
+            if probe or (
+                self._state == "closed"
+                and self._failures >= self.policy.failure_threshold
+            ):
+                self._state = "open"
+                self._opened_at = time.monotonic()
+                self._opened += 1
+
+    @contextmanager
+    def guard(self) -> Iterator[CallOutcome]:
+        """ブロック内の呼出を監視する。開いていれば入る前に CircuitOpenError。
+
+        ブロックから出た例外は is_failure() で失敗かどうかを判定する。
+        """
+        probe = self._admit()
+        outcome = CallOutcome()
+        started = time.monotonic()
+        try:
+            yield outcome
+        except Exception as e:
+            if outcome.deadline_capped and isinstance(e, httpx.TimeoutException):
+                # 縮めたタイムアウトに掛かっただけで、呼出先は健全かもしれない
+                self._finish(probe, None, 0.0)
+            else:
+                self._finish(
+                    probe, outcome.failed or is_failure(e),
+                    time.monotonic() - started,
+                )
+            raise
+        except BaseException:
+            self._finish(probe, None, 0.0)
+            raise
+        self._finish(probe, outcome.failed, time.monotonic() - started)
+
+    def state(self) -> CircuitState:
+        with self._lock:
+            now = time.monotonic()
+            state = self._current(now)
+            return CircuitState(
+                name=self.name,
+                state=state,
+                consecutive_failures=self._failures,
+                opened=self._opened,
+                rejected=self._rejected,
+                retry_after=(
+                    max(0.0, self._opened_at + self.policy.reset_timeout - now)
+                    if state == "open" else None
+                ),
+            )
@@ -2,31 +2,1260 @@
 
 from __future__ import annotations
 
-from datetime import date, datetime
-from typing import TYPE_CHECKING
+import math
+import re
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    CancelledError,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from dataclasses import dataclass, replace
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, NamedTuple, TypeVar
 
 import httpx
 
-from .exceptions import AuthenticationError, KakeiboAPIError
-from pathlib import Path
+from . import llm
+from .cache import CacheStats, LedgerCache, PromptContext, PromptContextCache
+from .circuit import (
+    CallOutcome,
+    CircuitBreaker,
+    CircuitBreakerPolicy,
+    CircuitState,
+)
+from .exceptions import (
+    AuthenticationError,
+    DeadlineExceededError,
+    KakeiboAPIError,
+    LLMAPIError,
+    PendingSaveError,
+)
+from .image import (
+    ImageOptions,
+    PreprocessedImage,
+    _require_pillow,
+    preprocess_image,
+)
+from .models import (
+    AnalyzeBatchItem,
+    AnalyzeCheckpoint,
+    AnalyzeResponse,
+    AnalyzeTrace,
+    BulkDeleteResult,
+    BulkProgress,
+    DraftDetail,
+    DraftListItem,
+    DraftListResponse,
+    JournalCreateRequest,
+    JournalCreateResponse,
+    JournalDetail,
+    JournalLine,
+    JournalListResponse,
+    PhaseTrace,
+    SpeculationStats,
+)
+from .ratelimit import RateLimiter, estimate_tokens
+from .retry import (
+    DEFAULT_RETRY_POLICY,
+    RetryPolicy,
+    RetryStats,
+    parse_retry_after,
+    retry_after_of,
+)
+from .metrics import MetricsSink
+from .usage import ModelPrice, UsageStats, UsageTracker
+
+if TYPE_CHECKING:
+    import asyncio
+    from types import TracebackType
+
+# サーバが受け付ける per_page の上限 (仕訳・下書きとも 100)
+_MAX_PER_PAGE = 100
+
+# analyze() が provider ごとに保持する LLM 用接続プールの既定上限
+DEFAULT_LLM_POOL_LIMITS = httpx.Limits(
+    max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0,
+)
+
+_P = TypeVar("_P", JournalListResponse, DraftListResponse)
+_T = TypeVar("_T")
+_R = TypeVar("_R")
+
+# list_all_journals(shard_by=...) の分割単位と、total 超過時の細分化先
+_SHARD_UNITS = ("month", "week", "day")
+_FINER_SHARD = {"month": "week", "week": "day"}
+
+# llm.call_image_llm の既定タイムアウト (秒)。timeout_budget 指定時は残り時間で短縮する
+_LLM_TIMEOUT = 60.0
+
+# 残り時間がこれ未満なら呼出を始めても間に合わないので時間切れとする
+_DEADLINE_SLACK = 0.01
+
+# 同時に走らせる投機的 Round 2 の上限 (超えた分は空きを待つ)
+_SPECULATION_WORKERS = 32
+
+# サーキットブレーカをエンドポイント単位にするため path から伏せる ID 部分
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+class _Shard(NamedTuple):
+    """日付ウィンドウ 1 つ (両端を含む)。"""
+
+    start: date
+    end: date
+    unit: str
+
+
+def _shard_windows(start: date, end: date, unit: str) -> list[_Shard]:
+    """[start, end] を暦の月 / 週 (月曜始まり) / 日で区切る。"""
+    windows: list[_Shard] = []
+    cur = start
+    while cur <= end:
+        if unit == "day":
+            nxt = cur + timedelta(days=1)
+        elif unit == "week":
+            nxt = cur + timedelta(days=7 - cur.weekday())
+        else:
+            nxt = (cur.replace(day=1) + timedelta(days=32)).replace(day=1)
+        windows.append(_Shard(cur, min(nxt - timedelta(days=1), end), unit))
+        cur = nxt
+    return windows
+
+
+@dataclass
+class _Request:
+    """サーバ API 呼出 1 回分の組立結果 (同期/非同期クライアント共通)。"""
+
+    method: str
+    path: str
+    params: dict[str, Any] | None = None
+    json: Any = None
+    files: dict[str, Any] | None = None
+    data: dict[str, Any] | None = None
+    headers: dict[str, str] | None = None
+    # 再送してよいか。None ならメソッドで決める (POST 以外は冪等)
+    idempotent: bool | None = None
+
+    def is_idempotent(self) -> bool:
+        if self.idempotent is not None:
+            return self.idempotent
+        return self.method != "POST"
+
+    def endpoint(self) -> str:
+        """ID を伏せたエンドポイント名 ("GET /api/v1/journals/{id}")。"""
+        return f"{self.method} {_ID_SEGMENT.sub('/{id}', self.path)}"
+
+
+class _Deadline:
+    """analyze() 1 回分の時間予算 (timeout_budget)。
+
+    各フェーズの呼出のタイムアウトを残り時間まで縮め、使い切ったら
+    フェーズ名付きの DeadlineExceededError にする。
+    """
+
+    def __init__(self, budget: float) -> None:
+        if budget <= 0:
+            raise ValueError("timeout_budget must be positive")
+        self.budget = budget
+        self._expires = time.monotonic() + budget
+
+    def left(self) -> float:
+        return self._expires - time.monotonic()
+
+    def remaining(self, phase: str, cause: BaseException | None = None) -> float:
+        """残り秒数。使い切っていれば DeadlineExceededError (cause を連鎖)。"""
+        left = self.left()
+        if left < _DEADLINE_SLACK:
+            error = DeadlineExceededError(phase, self.budget)
+            if cause is not None:
+                raise error from cause
+            raise error
+        return left
+
+    def cap(self, phase: str, timeout: httpx.Timeout) -> httpx.Timeout:
+        """timeout の各項目を残り時間以下に縮める。"""
+        left = self.remaining(phase)
+
+        def capped(value: float | None) -> float:
+            return left if value is None else min(value, left)
+
+        return httpx.Timeout(
+            connect=capped(timeout.connect),
+            read=capped(timeout.read),
+            write=capped(timeout.write),
+            pool=capped(timeout.pool),
+        )
+
+
+def _acquire_limit(
+    limiter: RateLimiter, tokens: int, deadline: _Deadline | None, phase: str,
+) -> None:
+    """limiter の枠を待つ。deadline までに空かないなら待たずに打ち切る。"""
+    if deadline is None:
+        limiter.acquire(tokens)
+    elif not limiter.acquire(tokens, timeout=deadline.remaining(phase)):
+        raise DeadlineExceededError(phase, deadline.budget)
+
+
+@contextmanager
+def _hold(
+    gate: threading.Semaphore | None, deadline: _Deadline | None, phase: str,
+) -> Iterator[None]:
+    """analyze_many の同時実行制限 gate を保持する。待ちは deadline まで。"""
+    if gate is None:
+        yield
+        return
+    timeout = None if deadline is None else deadline.remaining(phase)
+    if not gate.acquire(timeout=timeout):
+        assert deadline is not None
+        raise DeadlineExceededError(phase, deadline.budget)
+    try:
+        yield
+    finally:
+        gate.release()
+
+
+def _body_bytes(resp: httpx.Response) -> tuple[int, int]:
+    """resp の送信ボディと受信ボディのバイト数。"""
+    return (
+        int(resp.request.headers.get("Content-Length", 0)), len(resp.content),
+    )
+
+
+def _llm_payload_bytes(call: dict[str, Any]) -> int:
+    """LLM 呼出で送る画像 (base64) とプロンプトのバイト数 (JSON の枠は除く)。"""
+    return len(call["image_bytes"].b64) + len(call["prompt"].encode("utf-8"))
+
+
+def _llm_api_key_for(
+    llm_api_keys: dict[str, str | None], provider: str,
+) -> str:
+    """provider の LLM API キーを返す。未設定 / 未対応なら ValueError。"""
+    llm_api_key = llm_api_keys.get(provider)
+    if llm_api_key is None:
+        raise ValueError(
+            f"{provider}_api_key が未設定です。KakeiboClient(__init__, "
+            f"{provider}_api_key=...) で API キーを渡してください。"
+        )
+    if provider not in llm.IMAGE_HANDLERS:
+        raise ValueError(
+            f"unsupported provider: {provider} (supported: "
+            f"{', '.join(sorted(llm.IMAGE_HANDLERS))})"
+        )
+    return llm_api_key
+
+
+class _AnalyzeFlow:
+    """analyze() 1 回分の状態と I/O 以外のロジック。
+
+    同期/非同期クライアントはここで組み立てたリクエストを送り、応答を
+    on_* に渡すだけにして、両者の挙動を一致させる。
+
+    各フェーズの結果は checkpoint (AnalyzeCheckpoint) にも記録し、
+    on_checkpoint に通知する。途中経過のある checkpoint を渡すと、完了済みの
+    フェーズは *_pending() が False になり、クライアントはそれを飛ばす。
+
+    クライアントは各呼出を trace_phase() で囲み、フェーズ別の経過時間と
+    送受信量を trace (AnalyzeTrace) に溜める。
+    """
+
+    def __init__(
+        self,
+        image: str | Path | bytes | None,
+        *,
+        comment: str,
+        mime_type: str | None,
+        provider: str,
+        model: str | None,
+        llm_api_keys: dict[str, str | None],
+        prompt_cache: PromptContextCache | None = None,
+        ledger_cache: LedgerCache | None = None,
+        deadline: _Deadline | None = None,
+        checkpoint: AnalyzeCheckpoint | None = None,
+        on_checkpoint: Callable[[AnalyzeCheckpoint], None] | None = None,
+        usage_tracker: UsageTracker | None = None,
+    ) -> None:
+        llm_api_key = _llm_api_key_for(llm_api_keys, provider)
+
+        if isinstance(image, (str, Path)):
+            path = Path(image)
+            self.image_bytes = path.read_bytes()
+            self.filename = path.name
+        else:
+            self.image_bytes = image or b""
+            self.filename = "image.jpg"
+        self.mime_type = mime_type or "image/jpeg"
+        self._prepared_image: llm.PreparedImage | None = None
+        self.bytes_saved = 0
+        self.comment = comment
+        self.provider = provider
+        self.llm_api_key = llm_api_key
+        self.requested_model = model
+        self._prompt_cache = prompt_cache
+        self._stale_context: PromptContext | None = None
+        self._ledger_cache = ledger_cache
+        self._account_codes_by_name: dict[str, str] = {}
+        self.deadline = deadline
+        self._usage_tracker = usage_tracker
+
+        self.draft_id: int | None = None
+        self.prompt_context: dict[str, Any] = {}
+        self.account_codes: frozenset[str] = frozenset()
+        self.model = ""
+        self.compliance_check_enabled = False
+        self.analysis: llm.DocumentAnalysis | None = None
+        self.compliance_result: dict[str, Any] | None = None
+        self.ledger_text = ""
+        self.suggestions: list[dict[str, Any]] = []
+        self.usage: dict[str, llm.TokenUsage] = {}
+
+        self.checkpoint = checkpoint or AnalyzeCheckpoint(
+            provider=provider, requested_model=model,
+            comment=comment, mime_type=mime_type,
+        )
+        self._on_checkpoint = on_checkpoint
+        self.trace = AnalyzeTrace(provider=provider)
+        self._restore()
+        if self.needs_image() and image is None:
+            raise ValueError(
+                f"{self.checkpoint.next_phase} から再開するには画像が必要です"
+            )
+
+    def _restore(self) -> None:
+        cp = self.checkpoint
+        self.draft_id = cp.draft_id
+        self.model = cp.model
+        self.analysis = cp.analysis
+        self.compliance_result = cp.compliance_result
+        self.ledger_text = cp.ledger_text or ""
+        self.suggestions = cp.suggestions or []
+
+    def _record(self, **progress: Any) -> None:
+        for name, value in progress.items():
+            setattr(self.checkpoint, name, value)
+        if self._on_checkpoint is not None:
+            self._on_checkpoint(self.checkpoint)
+
+    def upload_pending(self) -> bool:
+        return self.checkpoint.draft_id is None
+
+    def round1_pending(self) -> bool:
+        return self.checkpoint.analysis is None
+
+    def round2_pending(self) -> bool:
+        return self.checkpoint.suggestions is None
+
+    def save_pending(self) -> bool:
+        return not self.checkpoint.saved
+
+    def needs_image(self) -> bool:
+        """アップロードか LLM 呼出が残っていて画像が要るなら True。"""
+        return self.upload_pending() or self.round2_pending()
+
+    @contextmanager
+    def trace_phase(
+        self,
+        name: str,
+        *,
+        call: dict[str, Any] | None = None,
+        speculative: bool = False,
+    ) -> Iterator[PhaseTrace]:
+        """with ブロックの経過時間を name のフェーズとして trace に記録する。
+
+        call (LLM 呼出) を渡すとプロンプト文字数と送信量も記録する。
+        サーバ呼出は応答を trace_response() に渡す。
+        """
+        phase = PhaseTrace(name, speculative=speculative)
+        # finish_trace() 後に終わった呼出 (捨てた投機) は返した trace に混ぜない
+        phases = self.trace.phases
+        if call is not None:
+            phase.prompt_chars = len(call["prompt"])
+            phase.request_bytes = _llm_payload_bytes(call)
+        started = time.perf_counter()
+        try:
+            yield phase
+        except BaseException as e:
+            phase.error = type(e).__name__
+            raise
+        finally:
+            phase.seconds = time.perf_counter() - started
+            phases.append(phase)
+
+    def usage_callback(
+        self,
+        phase: PhaseTrace,
+        then: llm.UsageCallback | None = None,
+    ) -> llm.UsageCallback:
+        """LLM 呼出の使用量を phase と (投機でなければ) Round 別の usage に
+        記録し、then にも渡すコールバック。"""
+        def record(usage: llm.TokenUsage) -> None:
+            phase.usage = usage
+            if not phase.speculative:
+                self.usage[phase.name] = usage
+            if then is not None:
+                then(usage)
+
+        return record
+
+    @staticmethod
+    def trace_response(phase: PhaseTrace, resp: httpx.Response) -> None:
+        phase.status_code = resp.status_code
+        phase.request_bytes, phase.response_bytes = _body_bytes(resp)
+
+    def finish_trace(
+        self, seconds: float, error: BaseException | None = None,
+    ) -> AnalyzeTrace:
+        trace = self.trace
+        trace.phases = list(trace.phases)
+        trace.model = self.model
+        trace.draft_id = self.draft_id
+        trace.needs_ledger = (
+            None if self.analysis is None else self.analysis.needs_ledger
+        )
+        trace.total_seconds = seconds
+        trace.error = None if error is None else type(error).__name__
+        return trace
+
+    # 0. (任意) 画像の前処理 — 縮小・再圧縮した画像をアップロード / LLM に使う
+
+    def on_preprocessed(self, result: PreprocessedImage) -> None:
+        if result.extension is None:
+            # 再圧縮しなかった (PDF 等) ならファイル名も MIME タイプも元のまま
+            return
+        self.image_bytes = result.data
+        self.mime_type = result.mime_type
+        self.filename = Path(self.filename).stem + result.extension
+        self._prepared_image = None
+        self.bytes_saved = result.bytes_saved
+
+    # 1. POST /api/v1/ai/uploads — サーバが画像を保存し draft_id を返す
+
+    def upload_request(self) -> _Request:
+        files = {"image": (self.filename, self.image_bytes, self.mime_type)}
+        data: dict[str, str] = {}
+        if self.comment:
+            data["comment"] = self.comment[:500]
+        return _Request("POST", "/api/v1/ai/uploads", files=files, data=data)
+
+    def on_upload(self, resp: httpx.Response) -> None:
+        if resp.status_code != 201:
+            _raise_for_error(resp)
+        self.draft_id = resp.json()["draft_id"]
+        self._record(draft_id=self.draft_id)
+
+    def salvage_upload(self, resp: httpx.Response) -> None:
+        """後続のフェーズが失敗しても、成功したアップロードは checkpoint に残す。"""
+        if self.draft_id is None and resp.status_code == 201:
+            self.on_upload(resp)
+
+    # 2. GET /api/v1/ai/prompt-context — Round 1+2 プロンプト材料取得
+
+    #    キャッシュが期限内なら送信不要 (None)。期限切れでも ETag があれば
+    #    If-None-Match で再検証する。
+
+    def prompt_context_request(self) -> _Request | None:
+        headers = None
+        if self._prompt_cache is not None:
+            entry, fresh = self._prompt_cache.lookup()
+            if fresh and entry is not None:
+                self._use_prompt_context(entry)
+                self.trace.phases.append(PhaseTrace("prompt_context", cached=True))
+                return None
+            if entry is not None and entry.etag:
+                self._stale_context = entry
+                headers = {"If-None-Match": entry.etag}
+        return _Request("GET", "/api/v1/ai/prompt-context", headers=headers)
+
+    def on_prompt_context(self, resp: httpx.Response) -> None:
+        cache = self._prompt_cache
+        if resp.status_code == 304 and self._stale_context is not None:
+            entry = self._stale_context
+            if cache is not None:
+                cache.revalidated(entry)
+        elif resp.status_code == 200:
+            entry = PromptContext.from_data(
+                resp.json(), resp.headers.get("ETag"),
+            )
+            if cache is not None:
+                cache.store(entry)
+        else:
+            _raise_for_error(resp)
+        self._use_prompt_context(entry)
+
+    def _use_prompt_context(self, entry: PromptContext) -> None:
+        cp = self.checkpoint
+        if cp.prompt_context_etag and entry.etag != cp.prompt_context_etag:
+            # 前回と違うプロンプト・勘定科目で得た LLM の結果は使わない
+            cp.discard_llm_results()
+            self._restore()
+        cp.prompt_context_etag = entry.etag
+        self.prompt_context = entry.data
+        self.account_codes = entry.account_codes
+        self._account_codes_by_name = entry.account_codes_by_name
+        self.model = self.requested_model or self.prompt_context.get(
+            "default_model_by_provider", {}
+        ).get(self.provider)
+        if not self.model:
+            raise ValueError(
+                f"provider {self.provider} のデフォルトモデルが取得できません。"
+                "model 引数を明示してください。"
+            )
+        self.compliance_check_enabled = bool(
+            self.prompt_context.get("compliance_check_enabled"),
+        )
+
+    # 3. Round 1 (画像 → DocumentAnalysis)
+
+    def round1_call(self) -> dict[str, Any]:
+        ctx = self.prompt_context
+        prompt = llm.build_round1_prompt(
+            round1_prompt=ctx.get("round1_prompt", ""),
+            compliance_check_enabled=self.compliance_check_enabled,
+            compliance_prompt=ctx.get("compliance_prompt", ""),
+            custom_prompt=ctx.get("custom_prompt", ""),
+            comment=self.comment,
+        )
+        max_tokens = 1500 if self.compliance_check_enabled else 1000
+        return self._llm_call(prompt, max_tokens)
+
+    def on_round1(self, raw: dict[str, Any]) -> None:
+        self.analysis = llm.parse_document_analysis(raw)
+        self.compliance_result = (
+            llm.parse_compliance_result(raw.get("compliance"))
+            if self.compliance_check_enabled else None
+        )
+        self._record(
+            model=self.model,
+            analysis=self.analysis,
+            compliance_result=self.compliance_result,
+        )
+
+    # 4. needs_ledger なら ledger 取得 (同じ科目の組合せはキャッシュを使う)
+
+    def ledger_request(self) -> _Request | None:
+        analysis = self.analysis
+        if analysis is None or not (
+            analysis.needs_ledger and analysis.requested_accounts
+        ):
+            return None
+        if self.checkpoint.ledger_text is not None:
+            return None
+        if self._ledger_cache is not None:
+            cached = self._ledger_cache.get(self._ledger_key())
+            if cached is not None:
+                self.ledger_text = cached
+                self._record(ledger_text=cached)
+                self.trace.phases.append(PhaseTrace("ledger", cached=True))
+                return None
+        # 元帳の読み出しだけなので POST でも再送してよい
+        return _Request(
+            "POST", "/api/v1/ai/ledger-context",
+            json={"account_names": analysis.requested_accounts},
+            idempotent=True,
+        )
+
+    def on_ledger(self, resp: httpx.Response) -> None:
+        if resp.status_code != 200:
+            return
+        self.ledger_text = resp.json().get("ledger_text", "")
+        self._record(ledger_text=self.ledger_text)
+        if self._ledger_cache is not None:
+            key = self._ledger_key()
+            codes = [self._account_codes_by_name.get(name) for name in key]
+            self._ledger_cache.put(
+                key,
+                self.ledger_text,
+                None if None in codes else frozenset(codes),
+            )
+
+    def _ledger_key(self) -> frozenset[str]:
+        assert self.analysis is not None
+        return LedgerCache.key(self.analysis.requested_accounts)
+
+    # 5. Round 2 (画像 + 元帳 → suggestions)
+
+    def round2_call(self) -> dict[str, Any]:
+        prompt = llm.build_round2_prompt(
+            prompt_context=self.prompt_context,
+            needs_ledger=self.analysis is not None
+            and self.analysis.needs_ledger,
+            ledger_text=self.ledger_text,
+        )
+        return self._llm_call(prompt, 2000)
+
+    def speculative_round2_call(self) -> dict[str, Any]:
+        """Round 1 を待たずに送る、元帳なしテンプレートの Round 2。
+
+        Round 1 後の round2_call() と一致すれば (needs_ledger=False の
+        場合) その結果をそのまま on_round2 に渡せる。
+        """
+        prompt = llm.build_round2_prompt(
+            prompt_context=self.prompt_context, needs_ledger=False,
+        )
+        return self._llm_call(prompt, 2000)
+
+    def on_round2(self, raw: dict[str, Any]) -> None:
+        suggestions = llm.validate_suggestions(raw, set(self.account_codes))
+        if self.compliance_result is not None:
+            for s in suggestions:
+                s["compliance"] = self.compliance_result
+        self.suggestions = suggestions
+        self._record(model=self.model, suggestions=suggestions)
+
+    # 6. PATCH /api/v1/ai/drafts/<id>/suggestions — 結果保存 + AIUsageLog
+
+    def save_request(self) -> _Request:
+        return _Request(
+            "PATCH", f"/api/v1/ai/drafts/{self.draft_id}/suggestions",
+            json={
+                "suggestions": self.suggestions,
+                "provider": self.provider,
+                "model": self.model,
+            },
+        )
+
+    def on_save(self, resp: httpx.Response) -> None:
+        if resp.status_code != 200:
+            _raise_for_error(resp)
+        self._record(saved=True)
+
+    def adopt_speculative_usage(self, usage: Iterable[llm.TokenUsage]) -> None:
+        """採用した投機的 Round 2 の使用量を round2 の分として記録する。"""
+        for u in usage:
+            self.usage["round2"] = u
+
+    def result(self) -> AnalyzeResponse:
+        assert self.draft_id is not None
+        cost = None
+        if self.usage and self._usage_tracker is not None:
+            total = sum(self.usage.values(), llm.TokenUsage())
+            cost = self._usage_tracker.cost(self.model, total)
+        return AnalyzeResponse(
+            draft_id=self.draft_id,
+            suggestions=self.suggestions,
+            bytes_saved=self.bytes_saved,
+            trace=self.trace,
+            usage=dict(self.usage),
+            cost=cost,
+        )
+
+    def _llm_call(self, prompt: str, max_tokens: int) -> dict[str, Any]:
+        # base64 エンコードは Round 1 / Round 2 で共有する (1 解析 1 回)
+        if self._prepared_image is None:
+            self._prepared_image = llm.prepare_image(self.image_bytes)
+        return {
+            "provider": self.provider,
+            "api_key": self.llm_api_key,
+            "model": self.model,
+            "image_bytes": self._prepared_image,
+            "mime_type": self.mime_type,
+            "prompt": prompt,
+            "max_tokens": max_tokens,
+        }
+
+
+class _BulkTracker:
+    """一括操作の完了件数を数えて BulkProgress を通知する。"""
+
+    def __init__(
+        self, total: int, callback: Callable[[BulkProgress], None] | None,
+    ) -> None:
+        self._total = total
+        self._callback = callback
+        self._started = time.monotonic()
+        self.done = 0
+        self.failed = 0
+
+    def record(self, result: object) -> None:
+        self.done += 1
+        if isinstance(result, Exception):
+            self.failed += 1
+        if self._callback is not None:
+            self._callback(BulkProgress(
+                total=self._total,
+                done=self.done,
+                failed=self.failed,
+                elapsed=time.monotonic() - self._started,
+            ))
+
+
+class _BaseClient:
+    """同期/非同期クライアント共通のリクエスト組立と応答解析。"""
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        *,
+        openai_api_key: str | None = None,
+        anthropic_api_key: str | None = None,
+        google_api_key: str | None = None,
+        prompt_context_ttl: float | None = 300.0,
+        ledger_cache_ttl: float | None = 30.0,
+        image_options: ImageOptions | None = None,
+        speculative_round2: bool = False,
+        write_behind: bool = False,
+        retry_policy: RetryPolicy | None = DEFAULT_RETRY_POLICY,
+        server_rate_limit: RateLimiter | None = None,
+        llm_rate_limits: Mapping[str, RateLimiter] | None = None,
+        circuit_breaker: CircuitBreakerPolicy | None = None,
+        on_trace: Callable[[AnalyzeTrace], None] | None = None,
+        metrics: MetricsSink | None = None,
+        model_prices: Mapping[str, ModelPrice] | None = None,
+    ) -> None:
+        self._base_url = base_url.rstrip("/")
+        self._api_key = api_key
+        self._llm_api_keys = {
+            "openai": openai_api_key,
+            "anthropic": anthropic_api_key,
+            "google": google_api_key,
+        }
+        self._prompt_cache = (
+            PromptContextCache(prompt_context_ttl)
+            if prompt_context_ttl is not None else None
+        )
+        self._ledger_cache = (
+            LedgerCache(ledger_cache_ttl)
+            if ledger_cache_ttl is not None else None
+        )
+        if image_options is not None:
+            _require_pillow()
+        self._image_options = image_options
+        self._speculative_round2 = speculative_round2
+        self._speculation = SpeculationStats()
+        self._speculation_lock = threading.Lock()
+        self._write_behind = write_behind
+        # 保留中の保存 (Future / asyncio.Task) → draft_id
+        self._pending_saves: dict[Any, int] = {}
+        self._pending_saves_lock = threading.Lock()
+        self._save_errors: dict[int, Exception] = {}
+        self._retry_policy = retry_policy
+        self._retry_stats = {"server": RetryStats(), "llm": RetryStats()}
+        self._retry_lock = threading.Lock()
+        self._server_rate_limit = server_rate_limit
+        self._llm_rate_limits = dict(llm_rate_limits or {})
+        for provider in self._llm_rate_limits:
+            if provider not in llm.IMAGE_HANDLERS:
+                raise llm._unsupported_provider(provider)
+        self._circuit_policy = circuit_breaker
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._breakers_lock = threading.Lock()
+        self._on_trace = on_trace
+        self._metrics = metrics
+        self._usage = UsageTracker(model_prices)
+
+    def invalidate_prompt_context(self) -> None:
+        """キャッシュ済みの prompt-context を破棄する。
+
+        サーバ側で勘定科目やプロンプト設定を変更した直後に呼ぶと、次の
+        analyze() で最新の値を取得する。
+        """
+        if self._prompt_cache is not None:
+            self._prompt_cache.invalidate()
+
+    def cache_stats(self) -> dict[str, CacheStats]:
+        """有効なキャッシュごとのヒット / ミス件数 ("prompt_context" / "ledger")。
+
+        値は呼出時点のコピーで、以後のキャッシュ操作では変わらない。
+        """
+        stats: dict[str, CacheStats] = {}
+        if self._prompt_cache is not None:
+            stats["prompt_context"] = self._prompt_cache.stats_snapshot()
+        if self._ledger_cache is not None:
+            stats["ledger"] = self._ledger_cache.stats_snapshot()
+        return stats
+
+    def speculation_stats(self) -> SpeculationStats:
+        """投機的 Round 2 のヒット率と無駄になったトークン数 (スナップショット)。"""
+        with self._speculation_lock:
+            return replace(self._speculation)
+
+    def _record_speculation(
+        self,
+        *,
+        started: bool = False,
+        hit: bool | None = None,
+        cancelled: bool = False,
+        wasted: Iterable[llm.TokenUsage] = (),
+    ) -> None:
+        with self._speculation_lock:
+            stats = self._speculation
+            stats.started += started
+            if hit is not None:
+                if hit:
+                    stats.hits += 1
+                else:
+                    stats.misses += 1
+            stats.cancelled += cancelled
+            stats.wasted_tokens += sum(u.total for u in wasted)
+
+    def _discard_speculation(
+        self,
+        future: Future[Any] | asyncio.Future[Any],
+        usage: list[llm.TokenUsage],
+        *,
+        missed: bool,
+    ) -> None:
+        """採用しない投機 Round 2 の集計を future の完了時に記録する。
+
+        実行中の呼出が消費したトークンは完了するまで分からないので、
+        usage は完了後に数える。missed が False なら Round 1 などの失敗で
+        判定前に捨てたもので、misses には入れない。
+        """
+
+        def record(done: Future[Any] | asyncio.Future[Any]) -> None:
+            self._record_speculation(
+                hit=False if missed else None,
+                cancelled=missed and done.cancelled(),
+                wasted=usage,
+            )
+
+        future.add_done_callback(record)
+
+    def usage_stats(self) -> dict[str, UsageStats]:
+        """LLM のトークン使用量と推定コストの合計 (スナップショット)。
+
+        キーは "<provider>:<model>"。投機的 Round 2 で捨てた分も含む。
+        """
+        return self._usage.stats()
+
+    def _track_usage(
+        self, call: dict[str, Any], on_usage: llm.UsageCallback | None,
+    ) -> llm.UsageCallback:
+        """使用量を usage_stats() に合算してから on_usage に渡すコールバック。"""
+        def track(usage: llm.TokenUsage) -> None:
+            self._usage.record(call["provider"], call["model"], usage)
+            if on_usage is not None:
+                on_usage(usage)
+
+        return track
+
+    def retry_stats(self) -> dict[str, RetryStats]:
+        """サーバ ("server") / LLM ("llm") 呼出ごとのリトライ集計 (スナップショット)。"""
+        with self._retry_lock:
+            return {k: replace(v) for k, v in self._retry_stats.items()}
+
+    def _retry_delay(
+        self,
+        kind: str,
+        attempt: int,
+        *,
+        status: int | None = None,
+        exc: BaseException | None = None,
+        retry_after: float | None = None,
+        idempotent: bool = True,
+        deadline: _Deadline | None = None,
+    ) -> float | None:
+        """attempt 回目の失敗後に待つ秒数。再送しないなら None。
+
+        deadline があり、待つと残り時間を使い切るなら再送しない。
+        """
+        policy = self._retry_policy
+        if policy is None or not policy.is_retryable(
+            status=status, exc=exc, idempotent=idempotent,
+        ):
+            return None
+        if exc is not None and retry_after is None:
+            retry_after = retry_after_of(exc)
+        delay = policy.delay(attempt, retry_after)
+        if delay is not None and deadline is not None and delay >= deadline.left():
+            delay = None
+        with self._retry_lock:
+            stats = self._retry_stats[kind]
+            if delay is None:
+                stats.gave_up += 1
+            else:
+                stats.retries += 1
+                stats.backoff_seconds += delay
+        return delay
+
+    def _response_retry_delay(
+        self,
+        req: _Request,
+        attempt: int,
+        resp: httpx.Response,
+        deadline: _Deadline | None = None,
+    ) -> float | None:
+        if resp.status_code < 400:
+            return None
+        return self._retry_delay(
+            "server", attempt,
+            status=resp.status_code,
+            retry_after=parse_retry_after(resp.headers.get("Retry-After")),
+            idempotent=req.is_idempotent(),
+            deadline=deadline,
+        )
+
+    @staticmethod
+    def _llm_timeout(deadline: _Deadline | None, phase: str) -> float:
+        if deadline is None:
+            return _LLM_TIMEOUT
+        return min(_LLM_TIMEOUT, deadline.remaining(phase))
+
+    def circuit_states(self) -> dict[str, CircuitState]:
+        """呼出先ごとのサーキットブレーカの状態 (ヘルスチェック用)。
+
+        キーは "llm:<provider>" と "server:<METHOD> <path>" (path の ID は
+        {id})。一度も呼んでいない呼出先は含まない。
+        """
+        with self._breakers_lock:
+            breakers = list(self._breakers.values())
+        return {b.name: b.state() for b in breakers}
+
+    def _guard(self, name: str) -> AbstractContextManager[CallOutcome]:
+        """name のブレーカで呼出を監視する。無効なら何もしない。"""
+        if self._circuit_policy is None:
+            return nullcontext(CallOutcome())
+        with self._breakers_lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(name, self._circuit_policy)
+                self._breakers[name] = breaker
+        return breaker.guard()
+
+    def _observe_server(
+        self, req: _Request, started: float, resp: httpx.Response | None,
+    ) -> None:
+        """サーバへの 1 試行を metrics に記録する (resp が None なら通信エラー)。"""
+        if self._metrics is None:
+            return
+        sent, received = (0, 0) if resp is None else _body_bytes(resp)
+        self._metrics.observe(
+            "server", req.endpoint(),
+            status="error" if resp is None else str(resp.status_code),
+            seconds=time.perf_counter() - started,
+            request_bytes=sent, response_bytes=received,
+        )
+
+    def _observe_llm(
+        self,
+        call: dict[str, Any],
+        started: float,
+        exc: LLMAPIError | httpx.TransportError | None = None,
+    ) -> None:
+        """LLM への 1 試行を metrics に記録する。応答の大きさは数えない。"""
+        if self._metrics is None:
+            return
+        if exc is None:
+            status = "200"
+        elif isinstance(exc, LLMAPIError):
+            status = str(exc.status_code)
+        else:
+            status = "error"
+        self._metrics.observe(
+            "llm", call["provider"],
+            status=status,
+            seconds=time.perf_counter() - started,
+            request_bytes=_llm_payload_bytes(call),
+        )
+
+    def _finish_trace(
+        self,
+        flow: _AnalyzeFlow,
+        started: float,
+        error: BaseException | None = None,
+    ) -> None:
+        """analyze() の終了時 (成功・失敗とも) に trace を確定し on_trace に渡す。"""
+        trace = flow.finish_trace(time.perf_counter() - started, error)
+        if self._on_trace is not None:
+            self._on_trace(trace)
+
+    def _llm_rate_limit(
+        self, call: dict[str, Any], on_usage: llm.UsageCallback,
+    ) -> tuple[RateLimiter | None, int, llm.UsageCallback]:
+        """call の provider のリミッタ、予約するトークン見積り、精算付き on_usage。"""
+        limiter = self._llm_rate_limits.get(call["provider"])
+        if limiter is None or limiter.tokens_per_minute is None:
+            return limiter, 0, on_usage
+        estimate = estimate_tokens(call)
+
+        def reconcile(usage: llm.TokenUsage) -> None:
+            limiter.reconcile(estimate, usage.total)
+            on_usage(usage)
+
+        return limiter, estimate, reconcile
+
+    def _settle_save(self, future: Any) -> None:
+        """完了した保存を保留リストから外し、失敗なら記録する。
+
+        完了コールバックと flush() の両方から呼ばれる (先に呼ばれた側だけが
+        記録する)。wait() はコールバック実行前に返り得るため、flush() 側でも
+        呼んで取りこぼしを防ぐ。
+        """
+        with self._pending_saves_lock:
+            draft_id = self._pending_saves.pop(future, None)
+            if draft_id is None:
+                return
+            if future.cancelled():
+                self._save_errors[draft_id] = CancelledError()
+            elif future.exception() is not None:
+                self._save_errors[draft_id] = future.exception()
+
+    def _raise_save_errors(self) -> None:
+        """溜まった write_behind の保存失敗を PendingSaveError で送出する。"""
+        with self._pending_saves_lock:
+            errors, self._save_errors = self._save_errors, {}
+        if errors:
+            raise PendingSaveError(errors)
+
+    def _journal_written(self, lines: Iterable[JournalLine] | None) -> None:
+        """仕訳の起票・削除後、元帳が変わり得る ledger キャッシュを捨てる。
+
+        lines が None (削除など科目が分からない場合) は全件捨てる。
+        """
+        if self._ledger_cache is not None:
+            self._ledger_cache.invalidate(
+                None if lines is None else {line.account_code for line in lines}
+            )
+
+    def _default_headers(self) -> dict[str, str]:
+        return {"Authorization": f"Bearer {self._api_key}"}
+
+    # --- 仕訳 ---
+
+    @staticmethod
+    def _post_journal_request(req: JournalCreateRequest) -> _Request:
+        return _Request("POST", "/api/v1/journals", json=req.to_dict())
+
+    @staticmethod
+    def _parse_create_journal(resp: httpx.Response) -> JournalCreateResponse:
+        if resp.status_code == 201:
+            data = resp.json()
+            return JournalCreateResponse(
+                id=data["id"],
+                entry_number=data["entry_number"],
+            )
+        _raise_for_error(resp)
+
+    @staticmethod
+    def _get_journal_request(journal_id: int) -> _Request:
+        return _Request("GET", f"/api/v1/journals/{journal_id}")
+
+    @staticmethod
+    def _parse_get_journal(resp: httpx.Response) -> JournalDetail:
+        if resp.status_code == 200:
+            return JournalDetail.from_dict(resp.json()["journal"])
+        _raise_for_error(resp)
+
+    @classmethod
+    def _list_journals_request(
+        cls,
+        *,
+        date_from: date | datetime | str | None,
+        date_to: date | datetime | str | None,
+        page: int,
+        per_page: int,
+    ) -> _Request:
+        params: dict[str, str | int] = {"page": page, "per_page": per_page}
+        if date_from is not None:
+            params["date_from"] = cls._to_date_str(date_from)
+        if date_to is not None:
+            params["date_to"] = cls._to_date_str(date_to)
+        return _Request("GET", "/api/v1/journals", params=params)
+
+    @staticmethod
+    def _parse_list_journals(resp: httpx.Response) -> JournalListResponse:
+        if resp.status_code == 200:
+            data = resp.json()
+            return JournalListResponse(
+                journals=[JournalDetail.from_dict(j) for j in data["journals"]],
+                total=data["total"],
+                page=data["page"],
+                per_page=data["per_page"],
+            )
+        _raise_for_error(resp)
+
+    @staticmethod
+    def _delete_journal_request(journal_id: int) -> _Request:
+        return _Request("DELETE", f"/api/v1/journals/{journal_id}")
+
+    # --- AI 証憑仕訳 ---
+
+    def _analyze_flow(
+        self,
+        image: str | Path | bytes | None,
+        *,
+        comment: str,
+        mime_type: str | None,
+        provider: str,
+        model: str | None,
+        timeout_budget: float | None = None,
+        checkpoint: AnalyzeCheckpoint | None = None,
+        on_checkpoint: Callable[[AnalyzeCheckpoint], None] | None = None,
+    ) -> _AnalyzeFlow:
+        return _AnalyzeFlow(
+            image,
+            comment=comment,
+            mime_type=mime_type,
+            provider=provider,
+            model=model,
+            llm_api_keys=self._llm_api_keys,
+            prompt_cache=self._prompt_cache,
+            ledger_cache=self._ledger_cache,
+            deadline=(
+                _Deadline(timeout_budget) if timeout_budget is not None else None
+            ),
+            checkpoint=checkpoint,
+            on_checkpoint=on_checkpoint,
+            usage_tracker=self._usage,
+        )
+
+    def _resume_flow(
+        self,
+        checkpoint: AnalyzeCheckpoint,
+        image: str | Path | bytes | None,
+        *,
+        timeout_budget: float | None,
+        on_checkpoint: Callable[[AnalyzeCheckpoint], None] | None,
+    ) -> _AnalyzeFlow:
+        return self._analyze_flow(
+            image,
+            comment=checkpoint.comment,
+            mime_type=checkpoint.mime_type,
+            provider=checkpoint.provider,
+            model=checkpoint.requested_model,
+            timeout_budget=timeout_budget,
+            checkpoint=checkpoint,
+            on_checkpoint=on_checkpoint,
+        )
+
+    @staticmethod
+    def _list_drafts_request(
+        *, status: str, page: int, per_page: int,
+    ) -> _Request:
+        params: dict[str, str | int] = {
+            "status": status,
+            "page": page,
+            "per_page": per_page,
+        }
+        return _Request("GET", "/api/v1/ai/drafts", params=params)
+
+    @staticmethod
+    def _parse_list_drafts(resp: httpx.Response) -> DraftListResponse:
+        if resp.status_code == 200:
+            data = resp.json()
+            return DraftListResponse(
+                drafts=[DraftListItem.from_dict(d) for d in data["drafts"]],
+                total=data["total"],
+                page=data["page"],
+                per_page=data["per_page"],
+            )
+        _raise_for_error(resp)
+
+    @staticmethod
+    def _get_draft_request(draft_id: int) -> _Request:
+        return _Request("GET", f"/api/v1/ai/drafts/{draft_id}")
+
+    @staticmethod
+    def _parse_get_draft(resp: httpx.Response) -> DraftDetail:
+        if resp.status_code == 200:
+            return DraftDetail.from_dict(resp.json()["draft"])
+        _raise_for_error(resp)
+
+    @staticmethod
+    def _delete_draft_request(draft_id: int) -> _Request:
+        return _Request("DELETE", f"/api/v1/ai/drafts/{draft_id}")
+
+    # --- 内部ヘルパー ---
+
+    @classmethod
+    def _initial_shards(
+        cls,
+        date_from: date | datetime | str | None,
+        date_to: date | datetime | str | None,
+        shard_by: str,
+    ) -> list[_Shard]:
+        if shard_by not in _SHARD_UNITS:
+            raise ValueError(
+                f"unsupported shard_by: {shard_by} (supported: "
+                f"{', '.join(_SHARD_UNITS)})"
+            )
+        if date_from is None or date_to is None:
+            raise ValueError("shard_by を使うには date_from と date_to が必要です。")
+        start = date.fromisoformat(cls._to_date_str(date_from))
+        end = date.fromisoformat(cls._to_date_str(date_to))
+        return _shard_windows(start, end, shard_by)
+
+    @staticmethod
+    def _split_shard(shard: _Shard, total: int, max_total: int) -> list[_Shard]:
+        """total が多すぎるウィンドウを細かい単位に分割する。不要なら空。"""
+        unit = shard.unit
+        while total > max_total and unit in _FINER_SHARD:
+            unit = _FINER_SHARD[unit]
+            finer = _shard_windows(shard.start, shard.end, unit)
+            if len(finer) > 1:
+                return finer
+        return []
+
+    @staticmethod
+    def _page_count(page: JournalListResponse | DraftListResponse) -> int:
+        if page.per_page <= 0:
+            return 1
+        return max(1, math.ceil(page.total / page.per_page))
+
+    @staticmethod
+    def _has_next_page(page: JournalListResponse | DraftListResponse) -> bool:
+        items = (
+            page.journals if isinstance(page, JournalListResponse)
+            else page.drafts
+        )
+        return bool(items) and page.page * page.per_page < page.total
+
+    @staticmethod
+    def _bulk_delete_result(
+        ids: list[int], results: list[Any],
+    ) -> BulkDeleteResult:
+        out = BulkDeleteResult()
+        for id_, r in zip(ids, results):
+            if r is None:
+                out.deleted.append(id_)
+            elif isinstance(r, KakeiboAPIError):
+                if r.status_code == 404:
+                    out.not_found.append(id_)
+                else:
+                    out.rejected[id_] = r
+            else:
+                out.errors[id_] = r
+        return out
+
+    @staticmethod
+    def _parse_empty(resp: httpx.Response) -> None:
+        if resp.status_code == 200:
+            return
+        _raise_for_error(resp)
+
+    @staticmethod
+    def _to_date_str(d: date | datetime | str) -> str:
+        if isinstance(d, str):
+            return d
+        if isinstance(d, datetime):
+            return d.date().isoformat()
+        return d.isoformat()
+
+    @staticmethod
+    def _raise_for_error(resp: httpx.Response) -> None:
+        _raise_for_error(resp)
 
-from .models import (
-    AnalyzeResponse,
-    DraftDetail,
-    DraftListItem,
-    DraftListResponse,
-    JournalCreateRequest,
-    JournalCreateResponse,
-    JournalDetail,
-    JournalLine,
-    JournalListResponse,
-)
 
-if TYPE_CHECKING:
-    from types import TracebackType
+def _raise_for_error(resp: httpx.Response) -> None:
+    data = resp.json()
+    message = data.get("error", "不明なエラー")
+    if resp.status_code == 401:
+        raise AuthenticationError(message)
+    raise KakeiboAPIError(resp.status_code, message)
 
 
-class KakeiboClient:
+class KakeiboClient(_BaseClient):
     """いいかんじ家計簿 API クライアント
 
     Usage::
@@ -53,6 +1282,19 @@ class KakeiboClient:
         timeout: float = 30.0,
         http_client: httpx.Client | None = None,
         llm_http_client: httpx.Client | None = None,
+        prompt_context_ttl: float | None = 300.0,
+        ledger_cache_ttl: float | None = 30.0,
+        llm_pool_limits: httpx.Limits | None = None,
+        image_options: ImageOptions | None = None,
+        speculative_round2: bool = False,
+        write_behind: bool = False,
+        retry_policy: RetryPolicy | None = DEFAULT_RETRY_POLICY,
+        server_rate_limit: RateLimiter | None = None,
+        llm_rate_limits: Mapping[str, RateLimiter] | None = None,
+        circuit_breaker: CircuitBreakerPolicy | None = None,
+        on_trace: Callable[[AnalyzeTrace], None] | None = None,
+        metrics: MetricsSink | None = None,
+        model_prices: Mapping[str, ModelPrice] | None = None,
     ) -> None:
         """E2 PR-D-a/b: 各 provider の API キーを保持してクライアント完結 AI 解析。
 
@@ -65,23 +1307,80 @@ class KakeiboClient:
                 SharedWorker でしか復号できないため、Python クライアントは
                 オーナーが直接 LLM API キーを保持する設計。
             timeout / http_client: サーバ通信用
-            llm_http_client: LLM 通信用 (テスト DI、省略時は httpx 標準)
+            llm_http_client: LLM 通信用 (テスト DI)。省略時は provider ごとに
+                keep-alive 付きの httpx.Client を保持し、close() で閉じる
+            llm_pool_limits: 上記 provider 別クライアントのコネクション上限
+                (省略時は DEFAULT_LLM_POOL_LIMITS)
+            prompt_context_ttl: analyze() が使う prompt-context のキャッシュ
+                秒数。期限切れ後は ETag があれば条件付き GET で再検証する。
+                0 で毎回再検証、None でキャッシュ無効
+            ledger_cache_ttl: ledger-context 応答のキャッシュ秒数。要求科目の
+                集合ごとに保持し、その科目に触れる仕訳の起票・削除で破棄する。
+                None でキャッシュ無効
+            image_options: 指定すると analyze() / analyze_many() がアップロード
+                前に画像を縮小・再圧縮する (Pillow が必要)。省略時は元のまま送る
+            speculative_round2: True なら Round 1 と並行して元帳なしの
+                Round 2 を投機的に呼ぶ。Round 1 が needs_ledger=False なら
+                その結果を使い、そうでなければ捨てて元帳付きでやり直す。
+                効果は speculation_stats() で確認する
+            write_behind: True なら analyze() は候補が揃った時点で返り、
+                結果の保存 (PATCH suggestions) はバックグラウンドでリトライ
+                付きで行う。失敗は flush() / close() が PendingSaveError で
+                送出する
+            retry_policy: サーバ / LLM 呼出で 429・5xx・通信エラーを再送する
+                方針 (Retry-After を尊重)。冪等でない POST は 429 と接続前の
+                失敗だけ再送する。None でリトライしない
+            server_rate_limit: サーバへの全リクエストに掛けるレート制限。
+                上限に達すると空くまでブロックする
+            llm_rate_limits: provider 名 ("openai" 等) → その provider への
+                LLM 呼出に掛けるレート制限 (RPM / 見積りトークンの TPM)。
+                同じ RateLimiter を複数クライアントに渡すと上限を共有する
+            circuit_breaker: 指定すると LLM provider ごと・サーバの
+                エンドポイントごとにサーキットブレーカを掛ける。失敗や遅延が
+                続いた呼出先は CircuitOpenError で即座に失敗させる。状態は
+                circuit_states() で確認する
+            on_trace: analyze() / resume_analyze() / analyze_many() の 1 件が
+                終わるたびに (失敗時も) フェーズ別の計測 (AnalyzeTrace) を
+                受け取る。成功時は AnalyzeResponse.trace と同じオブジェクト
+            metrics: サーバ / LLM への HTTP リクエスト (リトライの各試行) の
+                レイテンシ・ステータス・バイト数を記録する先。組込みの
+                InMemoryMetrics は p50 / p99 の推定と Prometheus 形式の出力が
+                できる。None なら計測しない
+            model_prices: モデル名 → 単価 (ModelPrice)。usage_stats() と
+                AnalyzeResponse.cost の推定コストに使う
         """
-        self._base_url = base_url.rstrip("/")
-        self._api_key = api_key
-        self._llm_api_keys = {
-            "openai": openai_api_key,
-            "anthropic": anthropic_api_key,
-            "google": google_api_key,
-        }
+        super().__init__(
+            base_url,
+            api_key,
+            openai_api_key=openai_api_key,
+            anthropic_api_key=anthropic_api_key,
+            google_api_key=google_api_key,
+            prompt_context_ttl=prompt_context_ttl,
+            ledger_cache_ttl=ledger_cache_ttl,
+            image_options=image_options,
+            speculative_round2=speculative_round2,
+            write_behind=write_behind,
+            retry_policy=retry_policy,
+            server_rate_limit=server_rate_limit,
+            llm_rate_limits=llm_rate_limits,
+            circuit_breaker=circuit_breaker,
+            on_trace=on_trace,
+            metrics=metrics,
+            model_prices=model_prices,
+        )
         self._llm_http_client = llm_http_client
+        self._llm_pool_limits = llm_pool_limits or DEFAULT_LLM_POOL_LIMITS
+        self._llm_clients: dict[str, httpx.Client] = {}
+        self._llm_clients_lock = threading.Lock()
+        self._saver: ThreadPoolExecutor | None = None
+        self._speculator: ThreadPoolExecutor | None = None
         if http_client is not None:
             self._client = http_client
             self._owns_client = False
         else:
             self._client = httpx.Client(
                 base_url=self._base_url,
-                headers={"Authorization": f"Bearer {api_key}"},
+                headers=self._default_headers(),
                 timeout=timeout,
             )
             self._owns_client = True
@@ -98,8 +1397,247 @@ class KakeiboClient:
         self.close()
 
     def close(self) -> None:
-        if self._owns_client:
-            self._client.close()
+        """保留中の保存 (write_behind) を待ってから HTTP クライアントを閉じる。
+
+        Raises:
+            PendingSaveError: 保留中の保存に失敗したものがある場合
+                (クライアントは閉じられる)
+        """
+        try:
+            self.flush()
+        finally:
+            if self._saver is not None:
+                self._saver.shutdown()
+                self._saver = None
+            if self._speculator is not None:
+                # 捨てた投機的 Round 2 の完了 (と消費トークンの集計) を待つ
+                self._speculator.shutdown()
+                self._speculator = None
+            if self._owns_client:
+                self._client.close()
+            with self._llm_clients_lock:
+                clients = list(self._llm_clients.values())
+                self._llm_clients.clear()
+            for client in clients:
+                client.close()
+
+    def flush(self) -> None:
+        """write_behind で保留中の保存がすべて終わるまで待つ。
+
+        Raises:
+            PendingSaveError: リトライしても保存できなかった下書きがある場合
+        """
+        with self._pending_saves_lock:
+            pending = list(self._pending_saves)
+        wait(pending)
+        for future in pending:
+            self._settle_save(future)
+        self._raise_save_errors()
+
+    def _save_behind(self, flow: _AnalyzeFlow) -> None:
+        """flow の結果保存をバックグラウンドに回す。"""
+        assert flow.draft_id is not None
+        with self._pending_saves_lock:
+            if self._saver is None:
+                self._saver = ThreadPoolExecutor(
+                    max_workers=4, thread_name_prefix="iikanji-save",
+                )
+            future = self._saver.submit(self._save, flow)
+            self._pending_saves[future] = flow.draft_id
+        future.add_done_callback(self._settle_save)
+
+    def _speculate(
+        self, fn: Callable[..., _R], *args: Any, **kwargs: Any,
+    ) -> Future[_R]:
+        """投機的 Round 2 をクライアント共有のスレッドで実行する。
+
+        解析ごとのスレッドプールに載せると、捨てる投機の完了を analyze() の
+        終了時に待つことになるため。close() が完了を待つ。
+        """
+        with self._speculation_lock:
+            if self._speculator is None:
+                self._speculator = ThreadPoolExecutor(
+                    max_workers=_SPECULATION_WORKERS,
+                    thread_name_prefix="iikanji-speculative",
+                )
+            return self._speculator.submit(fn, *args, **kwargs)
+
+    def _save(self, flow: _AnalyzeFlow) -> None:
+        # 429 / 5xx の再送は _send の retry_policy に任せる (PATCH は冪等)
+        flow.on_save(self._send(flow.save_request()))
+
+    def _llm_client(self, provider: str) -> httpx.Client:
+        """provider 用の HTTP クライアント。注入が無ければ使い回す接続プール。
+
+        毎回 httpx.post すると Round 1 / Round 2 のたびに TCP + TLS
+        ハンドシェイクが発生するため、provider ごとに 1 つ保持する。
+        """
+        if self._llm_http_client is not None:
+            return self._llm_http_client
+        with self._llm_clients_lock:
+            client = self._llm_clients.get(provider)
+            if client is None:
+                client = httpx.Client(limits=self._llm_pool_limits)
+                self._llm_clients[provider] = client
+            return client
+
+    def _send(
+        self,
+        req: _Request,
+        *,
+        deadline: _Deadline | None = None,
+        phase: str = "",
+    ) -> httpx.Response:
+        """req を送る。retry_policy に従い一時的な失敗は待ってから再送する。
+
+        deadline (analyze() の timeout_budget) があれば各試行のタイムアウトを
+        残り時間まで縮め、時間切れは phase 付きの DeadlineExceededError にする。
+        """
+        breaker = f"server:{req.endpoint()}"
+        attempt = 0
+        while True:
+            if self._server_rate_limit is not None:
+                _acquire_limit(self._server_rate_limit, 0, deadline, phase)
+            timeout = (
+                httpx.USE_CLIENT_DEFAULT if deadline is None
+                else deadline.cap(phase, self._client.timeout)
+            )
+            started = time.perf_counter()
+            try:
+                with self._guard(breaker) as outcome:
+                    outcome.deadline_capped = (
+                        deadline is not None and timeout != self._client.timeout
+                    )
+                    resp = self._client.request(
+                        req.method,
+                        req.path,
+                        params=req.params,
+                        json=req.json,
+                        files=req.files,
+                        data=req.data,
+                        headers=req.headers,
+                        timeout=timeout,
+                    )
+                    outcome.failed = resp.status_code >= 500
+            except httpx.TransportError as e:
+                self._observe_server(req, started, None)
+                if deadline is not None:
+                    deadline.remaining(phase, cause=e)
+                delay = self._retry_delay(
+                    "server", attempt, exc=e, idempotent=req.is_idempotent(),
+                    deadline=deadline,
+                )
+                if delay is None:
+                    raise
+            else:
+                self._observe_server(req, started, resp)
+                delay = self._response_retry_delay(req, attempt, resp, deadline)
+                if delay is None:
+                    return resp
+                resp.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def _call_llm(
+        self,
+        call: dict[str, Any],
+        on_usage: llm.UsageCallback | None = None,
+        *,
+        deadline: _Deadline | None = None,
+        phase: str = "",
+    ) -> dict[str, Any]:
+        """llm.call_image_llm をレート制限と retry_policy に従って呼ぶ。"""
+        limiter, estimate, on_usage = self._llm_rate_limit(
+            call, self._track_usage(call, on_usage),
+        )
+        attempt = 0
+        while True:
+            if limiter is not None:
+                _acquire_limit(limiter, estimate, deadline, phase)
+            timeout = self._llm_timeout(deadline, phase)
+            started = time.perf_counter()
+            try:
+                with self._guard(f"llm:{call['provider']}") as outcome:
+                    outcome.deadline_capped = timeout < _LLM_TIMEOUT
+                    result = llm.call_image_llm(
+                        **call, http_client=self._llm_client(call["provider"]),
+                        timeout=timeout, on_usage=on_usage,
+                    )
+            except (LLMAPIError, httpx.TransportError) as e:
+                self._observe_llm(call, started, e)
+                if deadline is not None and isinstance(e, httpx.TransportError):
+                    deadline.remaining(phase, cause=e)
+                delay = self._retry_delay("llm", attempt, exc=e, deadline=deadline)
+                if delay is None:
+                    raise
+            else:
+                self._observe_llm(call, started)
+                return result
+            time.sleep(delay)
+            attempt += 1
+
+    def _iter_pages(self, fetch: Callable[[int], _P]) -> Iterator[_P]:
+        """ページ 1 から順に返す。yield 中に次ページを別スレッドで取得する。"""
+        pool = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="iikanji-prefetch",
+        )
+        pending: Future[_P] | None = pool.submit(fetch, 1)
+        page_no = 1
+        try:
+            while pending is not None:
+                page = pending.result()
+                pending = None
+                if self._has_next_page(page):
+                    page_no += 1
+                    pending = pool.submit(fetch, page_no)
+                yield page
+        finally:
+            if pending is not None:
+                pending.cancel()
+            pool.shutdown(wait=True)
+
+    def _run_bulk(
+        self,
+        func: Callable[[_T], _R],
+        items: list[_T],
+        *,
+        concurrency: int,
+        progress: Callable[[BulkProgress], None] | None,
+    ) -> list[_R | Exception]:
+        """items を最大 concurrency 並列で func に通し、入力順の結果を返す。
+
+        要素ごとの例外 (API エラー、通信エラー、JSON でないエラー応答等) は
+        その要素の結果として格納し、他の要素は続行する。途中で止めると
+        送信済みの結果まで失われ、再実行で二重起票になるため。認証エラー
+        だけは全件失敗が確定するため即座に送出する。
+        progress は完了のたびに呼出元スレッドから呼ぶ。
+        """
+        results: list[Any] = [None] * len(items)
+        if not items:
+            return results
+        tracker = _BulkTracker(len(items), progress)
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(concurrency, len(items))),
+            thread_name_prefix="iikanji-bulk",
+        ) as pool:
+            futures = {
+                pool.submit(func, item): i for i, item in enumerate(items)
+            }
+            try:
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        results[i] = future.result()
+                    except AuthenticationError:
+                        raise
+                    except Exception as e:
+                        results[i] = e
+                    tracker.record(results[i])
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+        return results
 
     # --- 仕訳起票 ---
 
@@ -128,21 +1666,49 @@ class KakeiboClient:
             AuthenticationError: APIキーが無効な場合
             KakeiboAPIError: バリデーションエラー等
         """
-        req = JournalCreateRequest(
+        return self._post_journal(JournalCreateRequest(
             date=date,
             description=description,
             lines=lines,
             source=source,
             draft_id=draft_id,
+        ))
+
+    def create_journals(
+        self,
+        requests: Iterable[JournalCreateRequest],
+        *,
+        concurrency: int = 8,
+        progress: Callable[[BulkProgress], None] | None = None,
+    ) -> list[JournalCreateResponse | Exception]:
+        """仕訳を一括起票する (銀行明細の取込等)。
+
+        最大 concurrency 件の POST を共有コネクションプール上で並行に送る。
+        バリデーションエラー (400) 等は該当行の結果として返し、残りの行は
+        続行する。
+
+        Args:
+            requests: 起票する仕訳のリスト
+            concurrency: 同時に送るリクエスト数の上限
+            progress: 1 件完了するごとに BulkProgress を受け取るコールバック
+
+        Returns:
+            入力と同じ順序の結果リスト。各要素は JournalCreateResponse、
+            または失敗時の例外 (KakeiboAPIError / httpx.TransportError 等)
+
+        Raises:
+            AuthenticationError: APIキーが無効な場合 (残りの送信は中止)
+        """
+        return self._run_bulk(
+            self._post_journal, list(requests),
+            concurrency=concurrency, progress=progress,
         )
-        resp = self._client.post("/api/v1/journals", json=req.to_dict())
-        if resp.status_code == 201:
-            data = resp.json()
-            return JournalCreateResponse(
-                id=data["id"],
-                entry_number=data["entry_number"],
-            )
-        self._raise_for_error(resp)
+
+    def _post_journal(self, req: JournalCreateRequest) -> JournalCreateResponse:
+        resp = self._send(self._post_journal_request(req))
+        result = self._parse_create_journal(resp)
+        self._journal_written(req.lines)
+        return result
 
     # --- 仕訳閲覧 ---
 
@@ -158,10 +1724,8 @@ class KakeiboClient:
         Raises:
             KakeiboAPIError: 仕訳が見つからない場合 (404) 等
         """
-        resp = self._client.get(f"/api/v1/journals/{journal_id}")
-        if resp.status_code == 200:
-            return JournalDetail.from_dict(resp.json()["journal"])
-        self._raise_for_error(resp)
+        resp = self._send(self._get_journal_request(journal_id))
+        return self._parse_get_journal(resp)
 
     def list_journals(
         self,
@@ -182,22 +1746,151 @@ class KakeiboClient:
         Returns:
             JournalListResponse: 仕訳一覧とページネーション情報
         """
-        params: dict[str, str | int] = {"page": page, "per_page": per_page}
-        if date_from is not None:
-            params["date_from"] = self._to_date_str(date_from)
-        if date_to is not None:
-            params["date_to"] = self._to_date_str(date_to)
+        req = self._list_journals_request(
+            date_from=date_from, date_to=date_to, page=page, per_page=per_page,
+        )
+        return self._parse_list_journals(self._send(req))
 
-        resp = self._client.get("/api/v1/journals", params=params)
-        if resp.status_code == 200:
-            data = resp.json()
-            return JournalListResponse(
-                journals=[JournalDetail.from_dict(j) for j in data["journals"]],
-                total=data["total"],
-                page=data["page"],
-                per_page=data["per_page"],
+    def iter_journals(
+        self,
+        *,
+        date_from: date | datetime | str | None = None,
+        date_to: date | datetime | str | None = None,
+        per_page: int = _MAX_PER_PAGE,
+    ) -> Iterator[JournalDetail]:
+        """仕訳を全ページ分 1 件ずつ返すジェネレータ。
+
+        呼出側がページ N を処理している間にページ N+1 をバックグラウンドで
+        取得する。保持するのは処理中と先読み中の高々 2 ページ分。
+
+        Args:
+            date_from: 日付の下限 (省略可)
+            date_to: 日付の上限 (省略可)
+            per_page: 1ページあたりの件数 (デフォルトはサーバ上限の 100)
+
+        Yields:
+            JournalDetail: 仕訳の詳細情報
+        """
+        def fetch(page: int) -> JournalListResponse:
+            return self.list_journals(
+                date_from=date_from, date_to=date_to,
+                page=page, per_page=per_page,
+            )
+
+        for page in self._iter_pages(fetch):
+            yield from page.journals
+
+    def list_all_journals(
+        self,
+        *,
+        date_from: date | datetime | str | None = None,
+        date_to: date | datetime | str | None = None,
+        per_page: int = _MAX_PER_PAGE,
+        max_workers: int = 4,
+        shard_by: str | None = None,
+        shard_max_total: int = 1000,
+    ) -> list[JournalDetail]:
+        """条件に合う仕訳を全件取得する (月次エクスポート向け)。
+
+        ページ 1 の total から総ページ数を求め、残りのページを最大
+        max_workers 本のスレッドで並行取得する。結果はページ順に連結する。
+        一時的な失敗 (通信エラー / 429 / 5xx) は retry_policy に従って
+        そのページだけを再取得し、全体はやり直さない。
+
+        shard_by を指定すると期間を日付ウィンドウに分割して取得する
+        (複数年のバックフィル向け)。深い page= オフセットはサーバ側で
+        行スキップが増えて遅くなるため、各ウィンドウを浅いページ読みに
+        留める。ウィンドウの total が shard_max_total を超えたら、より
+        細かい単位 (month → week → day) に分割し直す。
+
+        Args:
+            date_from: 日付の下限 (shard_by 指定時は必須)
+            date_to: 日付の上限 (shard_by 指定時は必須)
+            per_page: 1ページあたりの件数 (デフォルトはサーバ上限の 100)
+            max_workers: 同時に取得するページ数の上限
+            shard_by: "month" / "week" / "day" (省略時は分割しない)
+            shard_max_total: 1 ウィンドウで読む件数の目安上限
+
+        Returns:
+            list[JournalDetail]: 日付条件に合う全仕訳。分割時はウィンドウの
+            日付順に連結する (ウィンドウ内はサーバの並び順)
+        """
+        if shard_by is not None:
+            return self._list_all_sharded(
+                shards=self._initial_shards(date_from, date_to, shard_by),
+                per_page=per_page,
+                max_workers=max_workers,
+                shard_max_total=shard_max_total,
             )
-        self._raise_for_error(resp)
+
+        def fetch(page: int) -> JournalListResponse:
+            return self.list_journals(
+                date_from=date_from, date_to=date_to,
+                page=page, per_page=per_page,
+            )
+
+        first = fetch(1)
+        journals = list(first.journals)
+        rest = range(2, self._page_count(first) + 1)
+        if not first.journals or not rest:
+            return journals
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(max_workers, len(rest))),
+            thread_name_prefix="iikanji-export",
+        ) as pool:
+            for page in pool.map(fetch, rest):
+                journals.extend(page.journals)
+        return journals
+
+    def _list_all_sharded(
+        self,
+        *,
+        shards: list[_Shard],
+        per_page: int,
+        max_workers: int,
+        shard_max_total: int,
+    ) -> list[JournalDetail]:
+        # ウィンドウの分割はページ 1 の total を見てから決まるため、
+        # pool.map ではなく完了順に次の取得を積むループで回す。
+        results: dict[tuple[date, int], list[JournalDetail]] = {}
+        pending: dict[Future[JournalListResponse], tuple[_Shard, int]] = {}
+        with ThreadPoolExecutor(
+            max_workers=max(1, max_workers),
+            thread_name_prefix="iikanji-export",
+        ) as pool:
+            def submit(shard: _Shard, page: int) -> None:
+                future = pool.submit(
+                    self.list_journals,
+                    date_from=shard.start, date_to=shard.end,
+                    page=page, per_page=per_page,
+                )
+                pending[future] = (shard, page)
+
+            for shard in shards:
+                submit(shard, 1)
+            try:
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        shard, page_no = pending.pop(future)
+                        page = future.result()
+                        if page_no == 1:
+                            finer = self._split_shard(
+                                shard, page.total, shard_max_total,
+                            )
+                            if finer:
+                                for sub in finer:
+                                    submit(sub, 1)
+                                continue
+                            if page.journals:
+                                for n in range(2, self._page_count(page) + 1):
+                                    submit(shard, n)
+                        results[(shard.start, page_no)] = page.journals
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+        return [j for key in sorted(results) for j in results[key]]
 
     # --- 仕訳削除 ---
 
@@ -210,10 +1903,39 @@ class KakeiboClient:
         Raises:
             KakeiboAPIError: 仕訳が見つからない (404)、期間ロック (400) 等
         """
-        resp = self._client.delete(f"/api/v1/journals/{journal_id}")
-        if resp.status_code == 200:
-            return
-        self._raise_for_error(resp)
+        resp = self._send(self._delete_journal_request(journal_id))
+        self._parse_empty(resp)
+        self._journal_written(None)
+
+    def delete_journals(
+        self,
+        journal_ids: Iterable[int],
+        *,
+        concurrency: int = 8,
+        progress: Callable[[BulkProgress], None] | None = None,
+    ) -> BulkDeleteResult:
+        """仕訳を一括削除する (取込やり直し時のクリーンアップ等)。
+
+        最大 concurrency 件の DELETE を並行に送る。1 件の失敗で全体は
+        止めず、ID ごとの結果を BulkDeleteResult に振り分けて返す。
+
+        Args:
+            journal_ids: 仕訳 ID のリスト
+            concurrency: 同時に送るリクエスト数の上限
+            progress: 1 件完了するごとに BulkProgress を受け取るコールバック
+
+        Returns:
+            BulkDeleteResult: 削除済み / 404 / API エラー / その他の例外別の ID
+
+        Raises:
+            AuthenticationError: APIキーが無効な場合 (残りの送信は中止)
+        """
+        ids = list(journal_ids)
+        results = self._run_bulk(
+            self.delete_journal, ids,
+            concurrency=concurrency, progress=progress,
+        )
+        return self._bulk_delete_result(ids, results)
 
     # --- AI 証憑仕訳 ---
 
@@ -225,6 +1947,8 @@ class KakeiboClient:
         mime_type: str | None = None,
         provider: str = "openai",
         model: str | None = None,
+        timeout_budget: float | None = None,
+        on_checkpoint: Callable[[AnalyzeCheckpoint], None] | None = None,
     ) -> AnalyzeResponse:
         """画像を AI 解析して下書きを作成する。必要なスコープ: ``ai:analyze``
 
@@ -239,137 +1963,318 @@ class KakeiboClient:
             mime_type: バイト列渡し時の MIME タイプ (デフォルト: image/jpeg)
             provider: "openai" / "anthropic" / "google" (デフォルト openai)
             model: 使用モデル名 (省略時はサーバの default_model_by_provider)
+            timeout_budget: 解析全体の時間予算 (秒)。各フェーズの呼出の
+                タイムアウトを残り時間まで縮め、リトライも残り時間内に限る。
+                None なら呼出ごとのタイムアウト (サーバ timeout / LLM 60 秒) のみ
+            on_checkpoint: フェーズ (アップロード・Round 1・元帳取得・Round 2・
+                保存) が完了するたびに途中経過 (AnalyzeCheckpoint) を受け取る。
+                毎回同じオブジェクトが更新される。失敗時は最後に受け取った
+                ものを resume_analyze() に渡すと続きから再開できる
 
         Returns:
             AnalyzeResponse: 作成された下書き ID と候補リスト
+
+        Raises:
+            DeadlineExceededError: timeout_budget を使い切った場合 (phase に
+                時間切れになったフェーズ)
         """
-        from . import llm
+        flow = self._analyze_flow(
+            image,
+            comment=comment,
+            mime_type=mime_type,
+            provider=provider,
+            model=model,
+            timeout_budget=timeout_budget,
+            on_checkpoint=on_checkpoint,
+        )
+        return self._run_analyze(flow)
 
-        llm_api_key = self._llm_api_keys.get(provider)
-        if llm_api_key is None:
-            raise ValueError(
-                f"{provider}_api_key が未設定です。KakeiboClient(__init__, "
-                f"{provider}_api_key=...) で API キーを渡してください。"
-            )
-        if provider not in llm.IMAGE_HANDLERS:
-            raise ValueError(
-                f"unsupported provider: {provider} (supported: "
-                f"{', '.join(sorted(llm.IMAGE_HANDLERS))})"
-            )
+    def resume_analyze(
+        self,
+        checkpoint: AnalyzeCheckpoint,
+        image: str | Path | bytes | None = None,
+        *,
+        timeout_budget: float | None = None,
+        on_checkpoint: Callable[[AnalyzeCheckpoint], None] | None = None,
+    ) -> AnalyzeResponse:
+        """途中で失敗した analyze() を、最初の未完了フェーズから再開する。
 
-        if isinstance(image, (str, Path)):
-            path = Path(image)
-            image_bytes = path.read_bytes()
-            filename = path.name
-        else:
-            image_bytes = image
-            filename = "image.jpg"
-        actual_mime = mime_type or "image/jpeg"
+        アップロード済みなら同じ下書きに保存し、Round 1 / Round 2 の結果が
+        あれば LLM を呼び直さない。provider / model / comment は checkpoint
+        に記録されたものを使う。prompt-context の ETag が前回から変わって
+        いれば、LLM の結果は捨てて Round 1 からやり直す。
 
-        # 1. POST /api/v1/ai/uploads — サーバが画像を保存し draft_id を返す
-        files = {"image": (filename, image_bytes, actual_mime)}
-        data: dict[str, str] = {}
-        if comment:
-            data["comment"] = comment[:500]
-        resp = self._client.post("/api/v1/ai/uploads", files=files, data=data)
-        if resp.status_code != 201:
-            self._raise_for_error(resp)
-        draft_id = resp.json()["draft_id"]
+        Args:
+            checkpoint: analyze() の on_checkpoint や
+                AnalyzeBatchItem.checkpoint で得た途中経過 (更新される)
+            image: analyze() に渡したものと同じ画像。アップロードか LLM
+                呼出が残っている場合は必須 (保存だけなら不要)
+            timeout_budget / on_checkpoint: analyze() と同じ
+
+        Raises:
+            ValueError: 画像が必要なのに image が省略された場合
+        """
+        flow = self._resume_flow(
+            checkpoint, image,
+            timeout_budget=timeout_budget, on_checkpoint=on_checkpoint,
+        )
+        return self._run_analyze(flow)
+
+    def analyze_many(
+        self,
+        images: Iterable[str | Path | bytes],
+        *,
+        comment: str = "",
+        mime_type: str | None = None,
+        provider: str = "openai",
+        model: str | None = None,
+        concurrency: int = 8,
+        server_concurrency: int = 4,
+        llm_concurrency: int = 4,
+        preprocess_workers: int = 0,
+        timeout_budget: float | None = None,
+    ) -> Iterator[AnalyzeBatchItem]:
+        """複数の画像をパイプラインで AI 解析する (スキャンバッチ向け)。
 
-        # 2. GET /api/v1/ai/prompt-context — Round 1+2 プロンプト材料取得
-        ctx_resp = self._client.get("/api/v1/ai/prompt-context")
-        if ctx_resp.status_code != 200:
-            self._raise_for_error(ctx_resp)
-        prompt_context = ctx_resp.json()
+        最大 concurrency 枚を同時に処理し、各画像の 6 ステップのうち
+        サーバ呼出は server_concurrency、LLM 呼出は llm_concurrency を
+        上限に並行させる。ある画像が LLM 待ちの間に別の画像のアップロード
+        等が進むため、1 枚ずつ analyze() を呼ぶより待ち時間が重なる。
 
-        # 3. Round 1 (画像 → DocumentAnalysis)
-        actual_model = model or prompt_context.get(
-            "default_model_by_provider", {}
-        ).get(provider)
-        if not actual_model:
-            raise ValueError(
-                f"provider {provider} のデフォルトモデルが取得できません。"
-                "model 引数を明示してください。"
-            )
-        compliance_check_enabled = bool(
-            prompt_context.get("compliance_check_enabled"),
-        )
-        round1_prompt = llm.build_round1_prompt(
-            round1_prompt=prompt_context.get("round1_prompt", ""),
-            compliance_check_enabled=compliance_check_enabled,
-            compliance_prompt=prompt_context.get("compliance_prompt", ""),
-            custom_prompt=prompt_context.get("custom_prompt", ""),
-            comment=comment,
+        Args:
+            images: 画像ファイルパス (str/Path) またはバイト列の列
+            comment / mime_type / provider / model: analyze() と同じ (全画像共通)
+            concurrency: 同時に処理中にする画像の枚数
+            server_concurrency: 同時に送るサーバリクエスト数の上限
+            llm_concurrency: 同時に送る LLM リクエスト数の上限
+            preprocess_workers: image_options 指定時、画像の前処理を
+                このプロセス数の ProcessPoolExecutor で行う (高解像度画像の
+                大量処理向け)。0 なら各ワーカースレッド内で行う
+            timeout_budget: 画像 1 枚あたりの時間予算 (秒)。処理を始めた
+                時点から数え、同時実行制限の待ちも含む。時間切れの画像は
+                error に DeadlineExceededError が入る
+
+        Yields:
+            AnalyzeBatchItem: 完了順。index は images 内の位置。失敗した
+            画像は error に例外、checkpoint に途中経過 (resume_analyze() で
+            再開できる) が入り、他の画像の処理は続行する
+
+        Raises:
+            AuthenticationError: APIキーが無効な場合 (残りの処理は中止)
+            ValueError: provider の API キーが未設定 / 未対応の場合
+        """
+        _llm_api_key_for(self._llm_api_keys, provider)
+        server_gate = threading.BoundedSemaphore(max(1, server_concurrency))
+        llm_gate = threading.BoundedSemaphore(max(1, llm_concurrency))
+        preprocess_pool = (
+            ProcessPoolExecutor(max_workers=preprocess_workers)
+            if preprocess_workers > 0 and self._image_options is not None
+            else None
         )
-        max_tokens_r1 = 1500 if compliance_check_enabled else 1000
-        r1_raw = llm.call_image_llm(
-            provider=provider,
-            api_key=llm_api_key,
-            model=actual_model,
-            image_bytes=image_bytes,
-            mime_type=actual_mime,
-            prompt=round1_prompt,
-            max_tokens=max_tokens_r1,
-            http_client=self._llm_http_client,
-        )
-        analysis = llm.parse_document_analysis(r1_raw)
-        compliance_result = (
-            llm.parse_compliance_result(r1_raw.get("compliance"))
-            if compliance_check_enabled else None
-        )
-
-        # 4. needs_ledger なら ledger 取得
-        ledger_text = ""
-        if analysis.needs_ledger and analysis.requested_accounts:
-            ledger_resp = self._client.post(
-                "/api/v1/ai/ledger-context",
-                json={"account_names": analysis.requested_accounts},
+
+        def run(
+            image: str | Path | bytes, checkpoint: AnalyzeCheckpoint,
+        ) -> AnalyzeResponse:
+            flow = self._analyze_flow(
+                image,
+                comment=comment,
+                mime_type=mime_type,
+                provider=provider,
+                model=model,
+                timeout_budget=timeout_budget,
+                checkpoint=checkpoint,
+            )
+            return self._run_analyze(
+                flow, server_gate=server_gate, llm_gate=llm_gate,
+                preprocess_pool=preprocess_pool,
             )
-            if ledger_resp.status_code == 200:
-                ledger_text = ledger_resp.json().get("ledger_text", "")
 
-        # 5. Round 2 (画像 + 元帳 → suggestions)
-        round2_prompt = llm.build_round2_prompt(
-            prompt_context=prompt_context,
-            needs_ledger=analysis.needs_ledger,
-            ledger_text=ledger_text,
-        )
-        r2_raw = llm.call_image_llm(
-            provider=provider,
-            api_key=llm_api_key,
-            model=actual_model,
-            image_bytes=image_bytes,
-            mime_type=actual_mime,
-            prompt=round2_prompt,
-            max_tokens=2000,
-            http_client=self._llm_http_client,
-        )
-        valid_codes = {
-            line.split()[0]
-            for line in prompt_context.get("account_list_text", "").split("\n")
-            if line.strip() and line.strip()[0].isdigit()
-        }
-        suggestions = llm.validate_suggestions(r2_raw, valid_codes)
-        if compliance_result is not None:
-            for s in suggestions:
-                s["compliance"] = compliance_result
+        source = enumerate(images)
+        pending: dict[
+            Future[AnalyzeResponse], tuple[int, AnalyzeCheckpoint]
+        ] = {}
+        with ThreadPoolExecutor(
+            max_workers=max(1, concurrency),
+            thread_name_prefix="iikanji-analyze",
+        ) as pool:
+            def fill() -> None:
+                while len(pending) < max(1, concurrency):
+                    item = next(source, None)
+                    if item is None:
+                        return
+                    checkpoint = AnalyzeCheckpoint(
+                        provider=provider, requested_model=model,
+                        comment=comment, mime_type=mime_type,
+                    )
+                    pending[pool.submit(run, item[1], checkpoint)] = (
+                        item[0], checkpoint,
+                    )
 
-        # 6. PATCH /api/v1/ai/drafts/<id>/suggestions — 結果保存 + AIUsageLog
-        save_resp = self._client.patch(
-            f"/api/v1/ai/drafts/{draft_id}/suggestions",
-            json={
-                "suggestions": suggestions,
-                "provider": provider,
-                "model": actual_model,
-            },
-        )
-        if save_resp.status_code != 200:
-            self._raise_for_error(save_resp)
+            try:
+                fill()
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        index, checkpoint = pending.pop(future)
+                        try:
+                            item = AnalyzeBatchItem(
+                                index=index, response=future.result(),
+                            )
+                        except AuthenticationError:
+                            raise
+                        except Exception as e:
+                            item = AnalyzeBatchItem(
+                                index=index, error=e, checkpoint=checkpoint,
+                            )
+                        yield item
+                    fill()
+            finally:
+                for future in pending:
+                    future.cancel()
+                if preprocess_pool is not None:
+                    preprocess_pool.shutdown(cancel_futures=True)
 
-        return AnalyzeResponse(
-            draft_id=draft_id,
-            suggestions=suggestions,
-        )
+    def _run_analyze(
+        self,
+        flow: _AnalyzeFlow,
+        **options: Any,
+    ) -> AnalyzeResponse:
+        """_run_phases() を実行し、成否にかかわらず trace を on_trace に渡す。"""
+        started = time.perf_counter()
+        try:
+            result = self._run_phases(flow, **options)
+        except BaseException as e:
+            self._finish_trace(flow, started, e)
+            raise
+        self._finish_trace(flow, started)
+        return result
+
+    def _run_phases(
+        self,
+        flow: _AnalyzeFlow,
+        *,
+        server_gate: threading.Semaphore | None = None,
+        llm_gate: threading.Semaphore | None = None,
+        preprocess_pool: Executor | None = None,
+    ) -> AnalyzeResponse:
+        """analyze() の 6 ステップを実行する。gate はステージ別の同時実行制限。
+
+        image_options があれば最初に画像を前処理する (preprocess_pool が
+        あればそこで、無ければこのスレッドで)。
+
+        アップロード (1) は draft_id が必要な保存 (6) まで他のステップと
+        依存しないため別スレッドで並行させ、2〜5 の合間に完了を確認する。
+        アップロードが失敗した時点で LLM 呼出を打ち切り、2〜5 が失敗した
+        場合はアップロードの完了を待ってから例外を送出する (スレッドを
+        残さない)。speculative_round2 なら Round 2 (元帳なし) をクライアント
+        共有のスレッドで Round 1 と並行させ、不要になれば完了を待たずに捨てる。
+
+        flow.deadline (timeout_budget) があれば、各呼出はフェーズ名を添えて
+        残り時間内で打ち切る。
+        """
+        deadline = flow.deadline
+
+        def send(req: _Request, phase: str) -> httpx.Response:
+            with flow.trace_phase(phase) as trace, \
+                    _hold(server_gate, deadline, phase):
+                resp = self._send(req, deadline=deadline, phase=phase)
+                flow.trace_response(trace, resp)
+                return resp
+
+        def call_llm(
+            call: dict[str, Any],
+            phase: str,
+            on_usage: llm.UsageCallback | None = None,
+            speculative: bool = False,
+        ) -> dict[str, Any]:
+            with flow.trace_phase(
+                phase, call=call, speculative=speculative,
+            ) as trace, _hold(llm_gate, deadline, phase):
+                return self._call_llm(
+                    call, flow.usage_callback(trace, on_usage),
+                    deadline=deadline, phase=phase,
+                )
+
+        options = self._image_options
+        if options is not None and flow.needs_image():
+            with flow.trace_phase("preprocess"):
+                if preprocess_pool is None:
+                    processed = preprocess_image(
+                        flow.image_bytes, flow.mime_type, options,
+                    )
+                else:
+                    processed = preprocess_pool.submit(
+                        preprocess_image, flow.image_bytes, flow.mime_type,
+                        options,
+                    ).result()
+            flow.on_preprocessed(processed)
+            if deadline is not None:
+                deadline.remaining("preprocess")
+
+        with ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="iikanji-analyze-bg",
+        ) as background:
+            upload = (
+                background.submit(send, flow.upload_request(), "upload")
+                if flow.upload_pending() else None
+            )
+
+            def check_upload() -> None:
+                if upload is not None and upload.done() and flow.draft_id is None:
+                    flow.on_upload(upload.result())
+
+            speculative: Future[dict[str, Any]] | None = None
+            try:
+                if flow.round2_pending():
+                    ctx_req = flow.prompt_context_request()
+                    if ctx_req is not None:
+                        flow.on_prompt_context(send(ctx_req, "prompt_context"))
+                    check_upload()
+                    if self._speculative_round2 and flow.round1_pending():
+                        spec_call = flow.speculative_round2_call()
+                        spec_usage: list[llm.TokenUsage] = []
+                        speculative = self._speculate(
+                            call_llm, spec_call, "round2", spec_usage.append,
+                            speculative=True,
+                        )
+                        self._record_speculation(started=True)
+                    if flow.round1_pending():
+                        flow.on_round1(call_llm(flow.round1_call(), "round1"))
+                        check_upload()
+                    ledger_req = flow.ledger_request()
+                    if ledger_req is not None:
+                        flow.on_ledger(send(ledger_req, "ledger"))
+                    check_upload()
+                    round2_call = flow.round2_call()
+                    if speculative is not None and round2_call == spec_call:
+                        self._record_speculation(hit=True)
+                        adopted, speculative = speculative, None
+                        flow.on_round2(adopted.result())
+                        flow.adopt_speculative_usage(spec_usage)
+                    else:
+                        if speculative is not None:
+                            # 同期 HTTP は中断できないので待たずに捨てる
+                            self._discard_speculation(
+                                speculative, spec_usage, missed=True,
+                            )
+                            speculative = None
+                        flow.on_round2(call_llm(round2_call, "round2"))
+                if upload is not None and flow.draft_id is None:
+                    flow.on_upload(upload.result())
+            except BaseException:
+                if speculative is not None:
+                    self._discard_speculation(speculative, spec_usage, missed=False)
+                if upload is not None and upload.exception() is None:
+                    # 再開時に同じ下書きを使えるよう、完了したアップロードは残す
+                    flow.salvage_upload(upload.result())
+                raise
+        if flow.save_pending():
+            if self._write_behind:
+                # 後回しの保存は呼出元を待たせないので時間予算の対象外
+                self._save_behind(flow)
+            else:
+                flow.on_save(send(flow.save_request(), "save"))
+        return flow.result()
 
     def list_drafts(
         self,
@@ -388,21 +2293,33 @@ class KakeiboClient:
         Returns:
             DraftListResponse: 下書き一覧とページネーション情報
         """
-        params: dict[str, str | int] = {
-            "status": status,
-            "page": page,
-            "per_page": per_page,
-        }
-        resp = self._client.get("/api/v1/ai/drafts", params=params)
-        if resp.status_code == 200:
-            data = resp.json()
-            return DraftListResponse(
-                drafts=[DraftListItem.from_dict(d) for d in data["drafts"]],
-                total=data["total"],
-                page=data["page"],
-                per_page=data["per_page"],
-            )
-        self._raise_for_error(resp)
+        req = self._list_drafts_request(
+            status=status, page=page, per_page=per_page,
+        )
+        return self._parse_list_drafts(self._send(req))
+
+    def iter_drafts(
+        self,
+        *,
+        status: str = "analyzed",
+        per_page: int = _MAX_PER_PAGE,
+    ) -> Iterator[DraftListItem]:
+        """下書きを全ページ分 1 件ずつ返すジェネレータ。必要なスコープ: ``ai:analyze``
+
+        iter_journals と同様に次ページを先読みする。
+
+        Args:
+            status: フィルタ ("analyzed" / "done" / "all", デフォルト: "analyzed")
+            per_page: 1ページあたりの件数 (デフォルトはサーバ上限の 100)
+
+        Yields:
+            DraftListItem: 下書き一覧の1件
+        """
+        def fetch(page: int) -> DraftListResponse:
+            return self.list_drafts(status=status, page=page, per_page=per_page)
+
+        for page in self._iter_pages(fetch):
+            yield from page.drafts
 
     def get_draft(self, draft_id: int) -> DraftDetail:
         """下書き詳細を取得する（候補データ含む）。必要なスコープ: ``ai:analyze``
@@ -413,10 +2330,8 @@ class KakeiboClient:
         Returns:
             DraftDetail: 下書きの詳細と候補リスト
         """
-        resp = self._client.get(f"/api/v1/ai/drafts/{draft_id}")
-        if resp.status_code == 200:
-            return DraftDetail.from_dict(resp.json()["draft"])
-        self._raise_for_error(resp)
+        resp = self._send(self._get_draft_request(draft_id))
+        return self._parse_get_draft(resp)
 
     def delete_draft(self, draft_id: int) -> None:
         """下書きを削除する。必要なスコープ: ``ai:analyze``
@@ -424,25 +2339,31 @@ class KakeiboClient:
         Args:
             draft_id: 下書き ID
         """
-        resp = self._client.delete(f"/api/v1/ai/drafts/{draft_id}")
-        if resp.status_code == 200:
-            return
-        self._raise_for_error(resp)
+        resp = self._send(self._delete_draft_request(draft_id))
+        self._parse_empty(resp)
 
-    # --- 内部ヘルパー ---
+    def delete_drafts(
+        self,
+        draft_ids: Iterable[int],
+        *,
+        concurrency: int = 8,
+        progress: Callable[[BulkProgress], None] | None = None,
+    ) -> BulkDeleteResult:
+        """下書きを一括削除する。必要なスコープ: ``ai:analyze``
 
-    @staticmethod
-    def _to_date_str(d: date | datetime | str) -> str:
-        if isinstance(d, str):
-            return d
-        if isinstance(d, datetime):
-            return d.date().isoformat()
-        return d.isoformat()
+        古い下書きの整理向け。挙動は delete_journals と同じ。
 
-    @staticmethod
-    def _raise_for_error(resp: httpx.Response) -> None:
-        data = resp.json()
-        message = data.get("error", "不明なエラー")
-        if resp.status_code == 401:
-            raise AuthenticationError(message)
-        raise KakeiboAPIError(resp.status_code, message)
+        Args:
+            draft_ids: 下書き ID のリスト
+            concurrency: 同時に送るリクエスト数の上限
+            progress: 1 件完了するごとに BulkProgress を受け取るコールバック
+
+        Returns:
+            BulkDeleteResult: 削除済み / 404 / API エラー / その他の例外別の ID
+        """
+        ids = list(draft_ids)
+        results = self._run_bulk(
+            self.delete_draft, ids,
+            concurrency=concurrency, progress=progress,
+        )
+        return self._bulk_delete_result(ids, results)
@@ -15,3 +15,70 @@ class AuthenticationError(KakeiboAPIError):
 
     def __init__(self, message: str = "無効な API キーです。") -> None:
         super().__init__(401, message)
+
+
+class PendingSaveError(Exception):
+    """write_behind で後回しにした下書き保存が失敗した場合の例外
+
+    errors は draft_id → 最後に発生した例外 (リトライ後)。
+    flush() / close() が送出する。
+    """
+
+    def __init__(self, errors: dict[int, Exception]) -> None:
+        self.errors = errors
+        ids = ", ".join(str(draft_id) for draft_id in sorted(errors))
+        super().__init__(
+            f"{len(errors)} 件の下書き保存に失敗しました (draft_id: {ids})"
+        )
+
+
+class LLMAPIError(RuntimeError):
+    """LLM provider API がエラーレスポンスを返した場合の例外
+
+    RuntimeError のサブクラス (従来の送出型との互換のため)。
+    retry_after は応答の Retry-After ヘッダ (秒)。無ければ None。
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        status_code: int,
+        message: str,
+        retry_after: float | None = None,
+    ) -> None:
+        self.provider = provider
+        self.status_code = status_code
+        self.retry_after = retry_after
+        super().__init__(message)
+
+
+class CircuitOpenError(Exception):
+    """サーキットブレーカが開いていて呼出を即座に打ち切った場合の例外
+
+    name は対象 ("llm:openai" / "server:GET /api/v1/journals/{id}" 等)、
+    retry_after は試行 (half-open) を再開するまでの秒数。
+    """
+
+    def __init__(self, name: str, retry_after: float) -> None:
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(
+            f"サーキットブレーカが開いています: {name} "
+            f"({retry_after:.1f} 秒後に再試行)"
+        )
+
+
+class DeadlineExceededError(TimeoutError):
+    """analyze() の時間予算 (timeout_budget) を使い切った場合の例外
+
+    phase は時間切れになったフェーズ ("upload" / "prompt_context" /
+    "round1" / "ledger" / "round2" / "save" / "preprocess")、budget は
+    予算の秒数。
+    """
+
+    def __init__(self, phase: str, budget: float) -> None:
+        self.phase = phase
+        self.budget = budget
+        super().__init__(
+            f"analyze() の時間予算 {budget:g} 秒を {phase} で使い切りました"
+        )
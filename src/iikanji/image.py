@@ -0,0 +1,124 @@
+"""画像の前処理 (縮小・再圧縮)
+
+スマートフォンで撮った領収書は 8〜12 MB になることが多いが、画像 LLM は
+長辺 2000px 前後に縮小してから読むため、それ以上の解像度はアップロード
+時間・LLM の応答待ち・トークン課金を増やすだけになる。analyze() の前に
+ここで縮小・再圧縮しておく。
+
+Pillow はオプション依存 (``pip install 'iikanji[image]'``)。前処理を
+有効にしたときだけ import する。関数・引数はすべて pickle 可能なので、
+ProcessPoolExecutor からそのまま呼べる。
+"""
+
+from __future__ import annotations
+
+import io
+from dataclasses import dataclass
+from typing import Any, Literal
+
+_FORMATS = {
+    "JPEG": ("image/jpeg", ".jpg"),
+    "WEBP": ("image/webp", ".webp"),
+}
+
+
+@dataclass(frozen=True)
+class ImageOptions:
+    """前処理の設定
+
+    max_dimension: 長辺の上限 px (これより大きい画像だけ縮小する)。None で縮小しない
+    format: 再圧縮後の形式 ("JPEG" / "WEBP")
+    quality: 再圧縮の品質 (1〜100)
+    """
+
+    max_dimension: int | None = 2048
+    format: Literal["JPEG", "WEBP"] = "JPEG"
+    quality: int = 85
+
+    def __post_init__(self) -> None:
+        if self.format not in _FORMATS:
+            raise ValueError(
+                f"unsupported image format: {self.format} (supported: "
+                f"{', '.join(sorted(_FORMATS))})"
+            )
+        if not 1 <= self.quality <= 100:
+            raise ValueError("quality must be between 1 and 100")
+        if self.max_dimension is not None and self.max_dimension < 1:
+            raise ValueError("max_dimension must be positive")
+
+
+@dataclass(frozen=True)
+class PreprocessedImage:
+    """前処理後の画像と元のサイズ
+
+    extension は再圧縮した形式の拡張子。元のデータをそのまま返したときは None。
+    """
+
+    data: bytes
+    mime_type: str
+    extension: str | None
+    original_size: int
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_size - len(self.data)
+
+
+def _require_pillow() -> tuple[Any, Any]:
+    try:
+        from PIL import Image, ImageOps
+    except ImportError as e:
+        raise ImportError(
+            "画像の前処理には Pillow が必要です: pip install 'iikanji[image]'"
+        ) from e
+    return Image, ImageOps
+
+
+def preprocess_image(
+    data: bytes, mime_type: str, options: ImageOptions,
+) -> PreprocessedImage:
+    """EXIF の向きを反映し、長辺を max_dimension 以下に縮小して再圧縮する。
+
+    再圧縮で EXIF (撮影位置など) は落ちる。縮小も回転も不要で、再圧縮しても
+    小さくならない画像と、Pillow が読めない形式 (PDF 等) は元のまま返す。
+    """
+    Image, ImageOps = _require_pillow()
+    unchanged = PreprocessedImage(
+        data=data, mime_type=mime_type, extension=None, original_size=len(data),
+    )
+    try:
+        img = Image.open(io.BytesIO(data))
+        img.load()
+    except (OSError, Image.DecompressionBombError):
+        return unchanged
+
+    # EXIF Orientation (0x0112) が 1 以外なら画素を回転して向きを確定させる
+    rotated = img.getexif().get(0x0112, 1) != 1
+    img = ImageOps.exif_transpose(img)
+    resized = False
+    if options.max_dimension is not None and max(img.size) > options.max_dimension:
+        img.thumbnail(
+            (options.max_dimension, options.max_dimension),
+            Image.Resampling.LANCZOS,
+        )
+        resized = True
+
+    if img.mode not in ("RGB", "L") and not (
+        options.format == "WEBP" and img.mode == "RGBA"
+    ):
+        # JPEG は alpha を持てないので透過部分は白背景に合成する
+        rgba = img.convert("RGBA")
+        img = Image.new("RGB", rgba.size, (255, 255, 255))
+        img.paste(rgba, mask=rgba.getchannel("A"))
+
+    out = io.BytesIO()
+    img.save(out, format=options.format, quality=options.quality, optimize=True)
+    encoded = out.getvalue()
+    if not (resized or rotated) and len(encoded) >= len(data):
+        return unchanged
+    new_mime, extension = _FORMATS[options.format]
+    return PreprocessedImage(
+        data=encoded, mime_type=new_mime, extension=extension,
+        original_size=len(data),
+    )
+
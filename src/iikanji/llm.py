@@ -8,6 +8,7 @@ Round 1 + Round 2 ロジックを Python で再実装する。
   (サーバ E2EE blob の復号は browser SharedWorker でのみ可能)
 - prompt 材料は /api/v1/ai/prompt-context から取得 (サーバ実装と整合)
 - 画像 + プロンプトは OpenAI API に直接送る (サーバを通らない)
+- 同期 (call_*) / 非同期 (acall_*) ハンドラはリクエスト組立と応答解析を共有
 
 Anthropic / Google 対応は E2 PR-D-b で追加予定。
 """
@@ -17,11 +18,17 @@ from __future__ import annotations
 import base64
 import json
 import re
+import secrets
+from collections.abc import Callable, Collection
 from dataclasses import dataclass, field
 from typing import Any
+from urllib.parse import quote
 
 import httpx
 
+from .exceptions import LLMAPIError
+from .retry import parse_retry_after
+
 
 OPENAI_URL = "https://api.openai.com/v1/chat/completions"
 ANTHROPIC_URL = "https://api.anthropic.com/v1/messages"
@@ -54,23 +61,79 @@ def extract_json(text: str) -> dict[str, Any]:
     return json.loads(text[start:end + 1])
 
 
-# ============ OpenAI 画像 呼出 ============
+# ============ provider 別 リクエスト組立 / 応答解析 ============
+#
+# 同期 (call_*_image) / 非同期 (acall_*_image) ハンドラは下の組立・解析関数を
+# 共有し、HTTP 送信部分だけが異なる。挙動差が出ないよう送信以外のロジックは
+# ここに集約する。
 
-def call_openai_image(
+
+# body 内で画像 base64 の位置を示す目印。プロンプト文字列と衝突しないよう
+# プロセスごとに乱数を含める (JSON エスケープ不要な英数字と _ のみ)。
+_IMAGE_SLOT = f"__iikanji_image_{secrets.token_hex(8)}__"
+
+
+@dataclass(frozen=True)
+class PreparedImage:
+    """base64 エンコード済みの画像
+
+    analyze() 1 回につき 1 度だけ作り、Round 1 / Round 2 の全ハンドラで
+    使い回す。b64 は ASCII バイト列のまま保持し、送信時に JSON ボディへ
+    そのまま埋め込む (文字列化・再エンコードのコピーを作らない)。
+    """
+
+    data: bytes
+    b64: bytes
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> PreparedImage:
+        return cls(data=data, b64=base64.b64encode(data))
+
+
+def prepare_image(image: bytes | PreparedImage) -> PreparedImage:
+    """bytes なら base64 エンコードし、PreparedImage ならそのまま返す。"""
+    if isinstance(image, PreparedImage):
+        return image
+    return PreparedImage.from_bytes(image)
+
+
+@dataclass
+class ProviderRequest:
+    """provider API への POST 1 回分 (URL / JSON ボディ / ヘッダ)。
+
+    body 中の画像データは目印文字列になっており、content() でシリアライズ
+    するときに image.b64 を差し込む。
+    """
+
+    url: str
+    body: dict[str, Any]
+    headers: dict[str, str]
+    image: PreparedImage | None = None
+
+    def content(self) -> bytes:
+        """JSON ボディのバイト列。画像部分は 1 回の join でコピーするだけ。"""
+        encoded = json.dumps(self.body, ensure_ascii=False).encode("utf-8")
+        if self.image is None:
+            return encoded
+        head, sep, tail = encoded.partition(_IMAGE_SLOT.encode("ascii"))
+        if not sep:
+            return encoded
+        return b"".join((head, self.image.b64, tail))
+
+
+def build_openai_request(
     *,
     api_key: str,
     model: str,
-    image_bytes: bytes,
+    image_bytes: bytes | PreparedImage,
     mime_type: str,
     prompt: str,
     max_tokens: int = 2000,
-    timeout: float = 60.0,
-    http_client: httpx.Client | None = None,
-) -> dict[str, Any]:
-    """OpenAI Chat Completions API (画像 + テキスト) を呼んで JSON を返す。"""
+) -> ProviderRequest:
+    """OpenAI Chat Completions API (画像 + テキスト) のリクエストを組み立てる。"""
     if not api_key:
         raise ValueError("api_key is required")
-    b64 = base64.b64encode(image_bytes).decode("ascii")
+    image = prepare_image(image_bytes)
     body = {
         "model": model,
         "messages": [{
@@ -79,7 +142,7 @@ def call_openai_image(
                 {"type": "text", "text": prompt},
                 {
                     "type": "image_url",
-                    "image_url": {"url": f"data:{mime_type};base64,{b64}"},
+                    "image_url": {"url": f"data:{mime_type};base64,{_IMAGE_SLOT}"},
                 },
             ],
         }],
@@ -89,16 +152,23 @@ def call_openai_image(
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json",
     }
-    if http_client is not None:
-        resp = http_client.post(OPENAI_URL, json=body, headers=headers,
-                                 timeout=timeout)
-    else:
-        resp = httpx.post(OPENAI_URL, json=body, headers=headers,
-                           timeout=timeout)
+    return ProviderRequest(url=OPENAI_URL, body=body, headers=headers,
+                           image=image)
+
+
+def _api_error(provider: str, label: str, resp: httpx.Response) -> LLMAPIError:
+    return LLMAPIError(
+        provider,
+        resp.status_code,
+        f"{label} API error: HTTP {resp.status_code} {resp.text[:200]}",
+        retry_after=parse_retry_after(resp.headers.get("Retry-After")),
+    )
+
+
+def parse_openai_response(resp: httpx.Response) -> dict[str, Any]:
+    """OpenAI 応答から本文 JSON を取り出す。"""
     if resp.status_code >= 400:
-        raise RuntimeError(
-            f"OpenAI API error: HTTP {resp.status_code} {resp.text[:200]}",
-        )
+        raise _api_error("openai", "OpenAI", resp)
     data = resp.json()
     content = data.get("choices", [{}])[0].get("message", {}).get("content")
     if not isinstance(content, str):
@@ -106,23 +176,19 @@ def call_openai_image(
     return extract_json(content)
 
 
-# ============ Anthropic 画像 呼出 ============
-
-def call_anthropic_image(
+def build_anthropic_request(
     *,
     api_key: str,
     model: str,
-    image_bytes: bytes,
+    image_bytes: bytes | PreparedImage,
     mime_type: str,
     prompt: str,
     max_tokens: int = 2000,
-    timeout: float = 60.0,
-    http_client: httpx.Client | None = None,
-) -> dict[str, Any]:
-    """Anthropic Messages API (画像 + テキスト) を呼んで JSON を返す。"""
+) -> ProviderRequest:
+    """Anthropic Messages API (画像 + テキスト) のリクエストを組み立てる。"""
     if not api_key:
         raise ValueError("api_key is required")
-    b64 = base64.b64encode(image_bytes).decode("ascii")
+    image = prepare_image(image_bytes)
     body = {
         "model": model,
         "max_tokens": max_tokens,
@@ -132,7 +198,7 @@ def call_anthropic_image(
                 {
                     "type": "image",
                     "source": {"type": "base64", "media_type": mime_type,
-                                "data": b64},
+                                "data": _IMAGE_SLOT},
                 },
                 {"type": "text", "text": prompt},
             ],
@@ -143,16 +209,14 @@ def call_anthropic_image(
         "anthropic-version": ANTHROPIC_VERSION,
         "Content-Type": "application/json",
     }
-    if http_client is not None:
-        resp = http_client.post(ANTHROPIC_URL, json=body, headers=headers,
-                                 timeout=timeout)
-    else:
-        resp = httpx.post(ANTHROPIC_URL, json=body, headers=headers,
-                           timeout=timeout)
+    return ProviderRequest(url=ANTHROPIC_URL, body=body, headers=headers,
+                           image=image)
+
+
+def parse_anthropic_response(resp: httpx.Response) -> dict[str, Any]:
+    """Anthropic 応答から本文 JSON を取り出す。"""
     if resp.status_code >= 400:
-        raise RuntimeError(
-            f"Anthropic API error: HTTP {resp.status_code} {resp.text[:200]}",
-        )
+        raise _api_error("anthropic", "Anthropic", resp)
     data = resp.json()
     content = data.get("content", [{}])[0].get("text")
     if not isinstance(content, str):
@@ -160,20 +224,16 @@ def call_anthropic_image(
     return extract_json(content)
 
 
-# ============ Google 画像 呼出 ============
-
-def call_google_image(
+def build_google_request(
     *,
     api_key: str,
     model: str,
-    image_bytes: bytes,
+    image_bytes: bytes | PreparedImage,
     mime_type: str,
     prompt: str,
     max_tokens: int = 2000,
-    timeout: float = 60.0,
-    http_client: httpx.Client | None = None,
-) -> dict[str, Any]:
-    """Google Gemini generateContent (画像 + テキスト) を呼んで JSON を返す。
+) -> ProviderRequest:
+    """Google Gemini generateContent (画像 + テキスト) のリクエストを組み立てる。
 
     セキュリティ注意: Gemini 標準仕様のため URL クエリに API キーが入る
     (Anthropic/OpenAI はヘッダ認証)。ブラウザ履歴 / Referer / ネットワーク
@@ -182,8 +242,7 @@ def call_google_image(
     """
     if not api_key:
         raise ValueError("api_key is required")
-    b64 = base64.b64encode(image_bytes).decode("ascii")
-    from urllib.parse import quote
+    image = prepare_image(image_bytes)
     url = (
         f"{GOOGLE_URL}/{quote(model, safe='')}:generateContent"
         f"?key={quote(api_key, safe='')}"
@@ -192,7 +251,7 @@ def call_google_image(
         "contents": [{
             "parts": [
                 {"text": prompt},
-                {"inline_data": {"mime_type": mime_type, "data": b64}},
+                {"inline_data": {"mime_type": mime_type, "data": _IMAGE_SLOT}},
             ],
         }],
         "generationConfig": {
@@ -201,15 +260,13 @@ def call_google_image(
         },
     }
     headers = {"Content-Type": "application/json"}
-    if http_client is not None:
-        resp = http_client.post(url, json=body, headers=headers,
-                                 timeout=timeout)
-    else:
-        resp = httpx.post(url, json=body, headers=headers, timeout=timeout)
+    return ProviderRequest(url=url, body=body, headers=headers, image=image)
+
+
+def parse_google_response(resp: httpx.Response) -> dict[str, Any]:
+    """Google 応答から本文 JSON を取り出す。"""
     if resp.status_code >= 400:
-        raise RuntimeError(
-            f"Google API error: HTTP {resp.status_code} {resp.text[:200]}",
-        )
+        raise _api_error("google", "Google", resp)
     data = resp.json()
     content = (
         data.get("candidates", [{}])[0]
@@ -222,6 +279,292 @@ def call_google_image(
     return extract_json(content)
 
 
+_REQUEST_BUILDERS = {
+    "openai": build_openai_request,
+    "anthropic": build_anthropic_request,
+    "google": build_google_request,
+}
+_RESPONSE_PARSERS = {
+    "openai": parse_openai_response,
+    "anthropic": parse_anthropic_response,
+    "google": parse_google_response,
+}
+
+
+# ============ トークン使用量 ============
+
+
+@dataclass(frozen=True)
+class TokenUsage:
+    """LLM 呼出 1 回分のトークン使用量 (provider 応答の usage 欄)。
+
+    input_tokens はキャッシュから読んだ分も含む入力トークンの総数で、
+    cached_input_tokens はそのうちのキャッシュ分 (割引単価の対象)。
+    """
+
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached_input_tokens: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+    def __add__(self, other: TokenUsage) -> TokenUsage:
+        return TokenUsage(
+            self.input_tokens + other.input_tokens,
+            self.output_tokens + other.output_tokens,
+            self.cached_input_tokens + other.cached_input_tokens,
+        )
+
+
+UsageCallback = Callable[[TokenUsage], None]
+
+
+def _int(value: Any) -> int:
+    return value if isinstance(value, int) else 0
+
+
+def parse_usage(provider: str, resp: httpx.Response) -> TokenUsage:
+    """成功応答の usage 欄を TokenUsage にする。欠けている値は 0。
+
+    provider ごとの違いはここで揃える。Anthropic の input_tokens は
+    キャッシュ分 (cache_read / cache_creation) を含まないので足し込み、
+    Google の出力には思考トークン (thoughtsTokenCount) も含める。
+    """
+    try:
+        data = resp.json()
+    except ValueError:
+        return TokenUsage()
+    if not isinstance(data, dict):
+        return TokenUsage()
+    if provider == "openai":
+        usage = data.get("usage") or {}
+        details = usage.get("prompt_tokens_details") or {}
+        return TokenUsage(_int(usage.get("prompt_tokens")),
+                          _int(usage.get("completion_tokens")),
+                          _int(details.get("cached_tokens")))
+    if provider == "anthropic":
+        usage = data.get("usage") or {}
+        cache_read = _int(usage.get("cache_read_input_tokens"))
+        return TokenUsage(
+            _int(usage.get("input_tokens")) + cache_read
+            + _int(usage.get("cache_creation_input_tokens")),
+            _int(usage.get("output_tokens")),
+            cache_read,
+        )
+    usage = data.get("usageMetadata") or {}
+    return TokenUsage(_int(usage.get("promptTokenCount")),
+                      _int(usage.get("candidatesTokenCount"))
+                      + _int(usage.get("thoughtsTokenCount")),
+                      _int(usage.get("cachedContentTokenCount")))
+
+
+def _post(
+    req: ProviderRequest, timeout: float, http_client: httpx.Client | None,
+) -> httpx.Response:
+    if http_client is not None:
+        return http_client.post(req.url, content=req.content(),
+                                headers=req.headers, timeout=timeout)
+    return httpx.post(req.url, content=req.content(), headers=req.headers,
+                      timeout=timeout)
+
+
+async def _apost(
+    req: ProviderRequest,
+    timeout: float,
+    http_client: httpx.AsyncClient | None,
+) -> httpx.Response:
+    if http_client is not None:
+        return await http_client.post(req.url, content=req.content(),
+                                      headers=req.headers, timeout=timeout)
+    async with httpx.AsyncClient() as client:
+        return await client.post(req.url, content=req.content(),
+                                 headers=req.headers, timeout=timeout)
+
+
+def _parse(
+    provider: str, resp: httpx.Response, on_usage: UsageCallback | None,
+) -> dict[str, Any]:
+    """応答を解析し、成功していれば on_usage に使用量を通知する。
+
+    本文の JSON 抽出に失敗してもトークンは消費されているので先に通知する。
+    """
+    if on_usage is not None and resp.status_code < 400:
+        on_usage(parse_usage(provider, resp))
+    return _RESPONSE_PARSERS[provider](resp)
+
+
+def _call(
+    provider: str,
+    *,
+    api_key: str,
+    model: str,
+    image_bytes: bytes | PreparedImage,
+    mime_type: str,
+    prompt: str,
+    max_tokens: int,
+    timeout: float,
+    http_client: httpx.Client | None,
+    on_usage: UsageCallback | None = None,
+) -> dict[str, Any]:
+    req = _REQUEST_BUILDERS[provider](
+        api_key=api_key, model=model, image_bytes=image_bytes,
+        mime_type=mime_type, prompt=prompt, max_tokens=max_tokens,
+    )
+    return _parse(provider, _post(req, timeout, http_client), on_usage)
+
+
+async def _acall(
+    provider: str,
+    *,
+    api_key: str,
+    model: str,
+    image_bytes: bytes | PreparedImage,
+    mime_type: str,
+    prompt: str,
+    max_tokens: int,
+    timeout: float,
+    http_client: httpx.AsyncClient | None,
+    on_usage: UsageCallback | None = None,
+) -> dict[str, Any]:
+    req = _REQUEST_BUILDERS[provider](
+        api_key=api_key, model=model, image_bytes=image_bytes,
+        mime_type=mime_type, prompt=prompt, max_tokens=max_tokens,
+    )
+    resp = await _apost(req, timeout, http_client)
+    return _parse(provider, resp, on_usage)
+
+
+# ============ OpenAI 画像 呼出 ============
+
+def call_openai_image(
+    *,
+    api_key: str,
+    model: str,
+    image_bytes: bytes | PreparedImage,
+    mime_type: str,
+    prompt: str,
+    max_tokens: int = 2000,
+    timeout: float = 60.0,
+    http_client: httpx.Client | None = None,
+    on_usage: UsageCallback | None = None,
+) -> dict[str, Any]:
+    """OpenAI Chat Completions API (画像 + テキスト) を呼んで JSON を返す。"""
+    return _call(
+        "openai", api_key=api_key, model=model, image_bytes=image_bytes,
+        mime_type=mime_type, prompt=prompt, max_tokens=max_tokens,
+        timeout=timeout, http_client=http_client, on_usage=on_usage,
+    )
+
+
+async def acall_openai_image(
+    *,
+    api_key: str,
+    model: str,
+    image_bytes: bytes | PreparedImage,
+    mime_type: str,
+    prompt: str,
+    max_tokens: int = 2000,
+    timeout: float = 60.0,
+    http_client: httpx.AsyncClient | None = None,
+    on_usage: UsageCallback | None = None,
+) -> dict[str, Any]:
+    """call_openai_image の非同期版。"""
+    return await _acall(
+        "openai", api_key=api_key, model=model, image_bytes=image_bytes,
+        mime_type=mime_type, prompt=prompt, max_tokens=max_tokens,
+        timeout=timeout, http_client=http_client, on_usage=on_usage,
+    )
+
+
+# ============ Anthropic 画像 呼出 ============
+
+def call_anthropic_image(
+    *,
+    api_key: str,
+    model: str,
+    image_bytes: bytes | PreparedImage,
+    mime_type: str,
+    prompt: str,
+    max_tokens: int = 2000,
+    timeout: float = 60.0,
+    http_client: httpx.Client | None = None,
+    on_usage: UsageCallback | None = None,
+) -> dict[str, Any]:
+    """Anthropic Messages API (画像 + テキスト) を呼んで JSON を返す。"""
+    return _call(
+        "anthropic", api_key=api_key, model=model, image_bytes=image_bytes,
+        mime_type=mime_type, prompt=prompt, max_tokens=max_tokens,
+        timeout=timeout, http_client=http_client, on_usage=on_usage,
+    )
+
+
+async def acall_anthropic_image(
+    *,
+    api_key: str,
+    model: str,
+    image_bytes: bytes | PreparedImage,
+    mime_type: str,
+    prompt: str,
+    max_tokens: int = 2000,
+    timeout: float = 60.0,
+    http_client: httpx.AsyncClient | None = None,
+    on_usage: UsageCallback | None = None,
+) -> dict[str, Any]:
+    """call_anthropic_image の非同期版。"""
+    return await _acall(
+        "anthropic", api_key=api_key, model=model, image_bytes=image_bytes,
+        mime_type=mime_type, prompt=prompt, max_tokens=max_tokens,
+        timeout=timeout, http_client=http_client, on_usage=on_usage,
+    )
+
+
+# ============ Google 画像 呼出 ============
+
+def call_google_image(
+    *,
+    api_key: str,
+    model: str,
+    image_bytes: bytes | PreparedImage,
+    mime_type: str,
+    prompt: str,
+    max_tokens: int = 2000,
+    timeout: float = 60.0,
+    http_client: httpx.Client | None = None,
+    on_usage: UsageCallback | None = None,
+) -> dict[str, Any]:
+    """Google Gemini generateContent (画像 + テキスト) を呼んで JSON を返す。
+
+    API キーの扱いは build_google_request の注意書きを参照。
+    """
+    return _call(
+        "google", api_key=api_key, model=model, image_bytes=image_bytes,
+        mime_type=mime_type, prompt=prompt, max_tokens=max_tokens,
+        timeout=timeout, http_client=http_client, on_usage=on_usage,
+    )
+
+
+async def acall_google_image(
+    *,
+    api_key: str,
+    model: str,
+    image_bytes: bytes | PreparedImage,
+    mime_type: str,
+    prompt: str,
+    max_tokens: int = 2000,
+    timeout: float = 60.0,
+    http_client: httpx.AsyncClient | None = None,
+    on_usage: UsageCallback | None = None,
+) -> dict[str, Any]:
+    """call_google_image の非同期版。"""
+    return await _acall(
+        "google", api_key=api_key, model=model, image_bytes=image_bytes,
+        mime_type=mime_type, prompt=prompt, max_tokens=max_tokens,
+        timeout=timeout, http_client=http_client, on_usage=on_usage,
+    )
+
+
 # ============ provider 共通ディスパッチ ============
 
 IMAGE_HANDLERS = {
@@ -230,30 +573,70 @@ IMAGE_HANDLERS = {
     "google": call_google_image,
 }
 
+ASYNC_IMAGE_HANDLERS = {
+    "openai": acall_openai_image,
+    "anthropic": acall_anthropic_image,
+    "google": acall_google_image,
+}
+
+
+def _unsupported_provider(provider: str) -> ValueError:
+    return ValueError(
+        f"unsupported provider: {provider} (supported: "
+        f"{', '.join(sorted(IMAGE_HANDLERS))})"
+    )
+
 
 def call_image_llm(
     *,
     provider: str,
     api_key: str,
     model: str,
-    image_bytes: bytes,
+    image_bytes: bytes | PreparedImage,
     mime_type: str,
     prompt: str,
     max_tokens: int = 2000,
     timeout: float = 60.0,
     http_client: httpx.Client | None = None,
+    on_usage: UsageCallback | None = None,
 ) -> dict[str, Any]:
-    """provider 別に画像 LLM を呼ぶ薄いディスパッチャ。"""
+    """provider 別に画像 LLM を呼ぶ薄いディスパッチャ。
+
+    同じ画像で複数回呼ぶときは image_bytes に PreparedImage を渡すと
+    base64 エンコードが 1 回で済む。on_usage を渡すと成功時にトークン
+    使用量 (TokenUsage) を通知する。
+    """
     handler = IMAGE_HANDLERS.get(provider)
     if handler is None:
-        raise ValueError(
-            f"unsupported provider: {provider} (supported: "
-            f"{', '.join(sorted(IMAGE_HANDLERS))})"
-        )
+        raise _unsupported_provider(provider)
     return handler(
         api_key=api_key, model=model, image_bytes=image_bytes,
         mime_type=mime_type, prompt=prompt, max_tokens=max_tokens,
-        timeout=timeout, http_client=http_client,
+        timeout=timeout, http_client=http_client, on_usage=on_usage,
+    )
+
+
+async def acall_image_llm(
+    *,
+    provider: str,
+    api_key: str,
+    model: str,
+    image_bytes: bytes | PreparedImage,
+    mime_type: str,
+    prompt: str,
+    max_tokens: int = 2000,
+    timeout: float = 60.0,
+    http_client: httpx.AsyncClient | None = None,
+    on_usage: UsageCallback | None = None,
+) -> dict[str, Any]:
+    """call_image_llm の非同期版。"""
+    handler = ASYNC_IMAGE_HANDLERS.get(provider)
+    if handler is None:
+        raise _unsupported_provider(provider)
+    return await handler(
+        api_key=api_key, model=model, image_bytes=image_bytes,
+        mime_type=mime_type, prompt=prompt, max_tokens=max_tokens,
+        timeout=timeout, http_client=http_client, on_usage=on_usage,
     )
 
 
@@ -358,7 +741,7 @@ def build_round2_prompt(
 
 
 def validate_suggestions(
-    raw: dict[str, Any], valid_codes: set[str],
+    raw: dict[str, Any], valid_codes: Collection[str],
 ) -> list[dict[str, Any]]:
     """LLM 応答の suggestions を整形 + account_code バリデーション。
 
@@ -0,0 +1,223 @@
+"""呼出先ごとのメトリクス (レイテンシのヒストグラム・ステータス・バイト数)
+
+KakeiboClient(metrics=...) に MetricsSink を渡すと、サーバ / LLM への
+HTTP リクエスト 1 回 (リトライの各試行) ごとに observe() が呼ばれる。
+未指定なら計測自体を行わない。
+
+InMemoryMetrics は組込みの実装で、呼出先ごとに固定バケットのヒストグラムと
+カウンタを持ち、p50 / p99 の推定と Prometheus のテキスト形式での出力が
+できる。スレッドセーフなので同期/非同期どちらのクライアントとも、複数の
+クライアント間でも共有できる。
+"""
+
+from __future__ import annotations
+
+import bisect
+import math
+import threading
+from dataclasses import dataclass, field
+from typing import Protocol
+
+# 既定のレイテンシバケット (秒)。サーバ呼出は 1 秒未満、LLM は数秒〜数十秒
+DEFAULT_LATENCY_BUCKETS = (
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0,
+)
+
+
+class MetricsSink(Protocol):
+    """メトリクスの受け口
+
+    kind: "server" または "llm"
+    endpoint: サーバは "<METHOD> <path>" (path の ID は {id})、LLM は provider 名
+    status: HTTP ステータス (文字列)。応答が無かった通信エラーは "error"
+    seconds: 1 回の試行の経過時間 (レート制限・リトライ待ちは含まない)
+    request_bytes / response_bytes: 送受信したボディのバイト数
+    """
+
+    def observe(
+        self,
+        kind: str,
+        endpoint: str,
+        *,
+        status: str,
+        seconds: float,
+        request_bytes: int = 0,
+        response_bytes: int = 0,
+    ) -> None: ...
+
+
+@dataclass
+class EndpointMetrics:
+    """1 つの呼出先の集計
+
+    buckets: ヒストグラムのバケット上限 (秒)
+    bucket_counts: 各バケットに入った件数 (累積ではない。末尾は +Inf)
+    statuses: ステータス → 件数
+    """
+
+    kind: str
+    endpoint: str
+    buckets: tuple[float, ...]
+    bucket_counts: list[int]
+    count: int = 0
+    sum_seconds: float = 0.0
+    statuses: dict[str, int] = field(default_factory=dict)
+    request_bytes: int = 0
+    response_bytes: int = 0
+
+    def quantile(self, q: float) -> float:
+        """経過時間の q 分位 (0〜1) をバケット内の線形補間で推定する。
+
+        Prometheus の histogram_quantile() と同じ方法。最後のバケットを
+        超える値は最後のバケット上限を返す。未観測なら NaN。
+        """
+        if not 0 <= q <= 1:
+            raise ValueError("q must be between 0 and 1")
+        if self.count == 0:
+            return math.nan
+        rank = q * self.count
+        cumulative = 0
+        lower = 0.0
+        for upper, n in zip(self.buckets, self.bucket_counts):
+            if n and cumulative + n >= rank:
+                return lower + (upper - lower) * (rank - cumulative) / n
+            cumulative += n
+            lower = upper
+        return self.buckets[-1]
+
+
+class InMemoryMetrics:
+    """プロセス内に溜める MetricsSink の実装
+
+    Usage::
+
+        metrics = InMemoryMetrics()
+        client = KakeiboClient(url, key, openai_api_key="sk-...",
+                               metrics=metrics)
+        ...
+        stats = metrics.snapshot()["llm:openai"]
+        print(stats.quantile(0.5), stats.quantile(0.99))
+        text = metrics.render_prometheus()  # /metrics の応答に使う
+
+    Args:
+        buckets: レイテンシヒストグラムのバケット上限 (秒、昇順)
+        namespace: Prometheus のメトリクス名の接頭辞
+    """
+
+    def __init__(
+        self,
+        buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS,
+        *,
+        namespace: str = "iikanji",
+    ) -> None:
+        if not buckets or list(buckets) != sorted(set(buckets)):
+            raise ValueError("buckets must be non-empty and strictly increasing")
+        self.buckets = tuple(buckets)
+        self.namespace = namespace
+        self._endpoints: dict[tuple[str, str], EndpointMetrics] = {}
+        self._lock = threading.Lock()
+
+    def observe(
+        self,
+        kind: str,
+        endpoint: str,
+        *,
+        status: str,
+        seconds: float,
+        request_bytes: int = 0,
+        response_bytes: int = 0,
+    ) -> None:
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            metrics = self._endpoints.get((kind, endpoint))
+            if metrics is None:
+                metrics = EndpointMetrics(
+                    kind, endpoint, self.buckets, [0] * (len(self.buckets) + 1),
+                )
+                self._endpoints[(kind, endpoint)] = metrics
+            metrics.bucket_counts[index] += 1
+            metrics.count += 1
+            metrics.sum_seconds += seconds
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+            metrics.request_bytes += request_bytes
+            metrics.response_bytes += response_bytes
+
+    def snapshot(self) -> dict[str, EndpointMetrics]:
+        """"<kind>:<endpoint>" → 集計のコピー (circuit_states() と同じキー)。"""
+        with self._lock:
+            return {
+                f"{kind}:{endpoint}": EndpointMetrics(
+                    kind, endpoint, m.buckets, list(m.bucket_counts),
+                    m.count, m.sum_seconds, dict(m.statuses),
+                    m.request_bytes, m.response_bytes,
+                )
+                for (kind, endpoint), m in self._endpoints.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints.clear()
+
+    def render_prometheus(self) -> str:
+        """Prometheus のテキスト形式 (exposition format 0.0.4) で出力する。"""
+        ns = self.namespace
+        snapshot = sorted(
+            self.snapshot().values(), key=lambda m: (m.kind, m.endpoint),
+        )
+        lines = [
+            f"# HELP {ns}_request_duration_seconds "
+            "Latency of each HTTP request attempt.",
+            f"# TYPE {ns}_request_duration_seconds histogram",
+        ]
+        for m in snapshot:
+            labels = _labels(kind=m.kind, endpoint=m.endpoint)
+            cumulative = 0
+            for upper, n in zip((*m.buckets, math.inf), m.bucket_counts):
+                cumulative += n
+                le = "+Inf" if upper == math.inf else _number(upper)
+                lines.append(
+                    f"{ns}_request_duration_seconds_bucket"
+                    f"{{{labels},le=\"{le}\"}} {cumulative}"
+                )
+            lines.append(
+                f"{ns}_request_duration_seconds_sum{{{labels}}} "
+                f"{_number(m.sum_seconds)}"
+            )
+            lines.append(f"{ns}_request_duration_seconds_count{{{labels}}} {m.count}")
+
+        lines += [
+            f"# HELP {ns}_requests_total HTTP request attempts by status.",
+            f"# TYPE {ns}_requests_total counter",
+        ]
+        for m in snapshot:
+            for status, n in sorted(m.statuses.items()):
+                labels = _labels(kind=m.kind, endpoint=m.endpoint, status=status)
+                lines.append(f"{ns}_requests_total{{{labels}}} {n}")
+
+        for name, attr, help_text in (
+            ("request_bytes_total", "request_bytes", "Request body bytes sent."),
+            ("response_bytes_total", "response_bytes",
+             "Response body bytes received."),
+        ):
+            lines += [
+                f"# HELP {ns}_{name} {help_text}",
+                f"# TYPE {ns}_{name} counter",
+            ]
+            for m in snapshot:
+                labels = _labels(kind=m.kind, endpoint=m.endpoint)
+                lines.append(f"{ns}_{name}{{{labels}}} {getattr(m, attr)}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels: str) -> str:
+    return ",".join(
+        f'{name}="{_escape(value)}"' for name, value in labels.items()
+    )
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _number(value: float) -> str:
+    return repr(float(value))
@@ -2,9 +2,12 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field
 from datetime import date, datetime
 
+from .exceptions import KakeiboAPIError
+from .llm import DocumentAnalysis, TokenUsage
+
 
 @dataclass
 class JournalLine:
@@ -63,6 +66,40 @@ class JournalCreateResponse:
     entry_number: int
 
 
+@dataclass
+class BulkProgress:
+    """一括操作 (create_journals 等) の進捗"""
+
+    total: int
+    done: int
+    failed: int
+    elapsed: float
+
+    @property
+    def rate(self) -> float:
+        """完了件数ベースのスループット (件/秒)"""
+        return self.done / self.elapsed if self.elapsed > 0 else 0.0
+
+
+@dataclass
+class BulkDeleteResult:
+    """一括削除 (delete_journals / delete_drafts) の ID 別結果
+
+    deleted / not_found は想定内の結果、rejected は期間ロック (400) 等の
+    API エラー、errors は通信エラー等それ以外の例外。各リストは入力順。
+    """
+
+    deleted: list[int] = field(default_factory=list)
+    not_found: list[int] = field(default_factory=list)
+    rejected: dict[int, KakeiboAPIError] = field(default_factory=dict)
+    errors: dict[int, Exception] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        """rejected / errors が無ければ True (404 は削除済みとみなす)"""
+        return not self.rejected and not self.errors
+
+
 @dataclass
 class JournalDetail:
     """仕訳詳細"""
@@ -192,9 +229,195 @@ class DraftListResponse:
     per_page: int
 
 
+@dataclass
+class PhaseTrace:
+    """analyze() の 1 フェーズ (1 呼出) の計測値
+
+    name: "preprocess" / "upload" / "prompt_context" / "round1" / "ledger" /
+        "round2" / "save"
+    seconds: 経過時間 (同時実行制限・レート制限・リトライの待ちを含む)
+    request_bytes / response_bytes: サーバ呼出の送受信バイト数。LLM 呼出の
+        request_bytes は送信する画像 (base64) とプロンプトの分で、応答は数えない
+    prompt_chars: LLM 呼出のプロンプト文字数
+    status_code: サーバ呼出の HTTP ステータス
+    usage: LLM 呼出のトークン使用量 (provider の応答の usage 欄)
+    cached: キャッシュで済ませ、送信しなかった (prompt_context / ledger)
+    speculative: 投機的 Round 2 (speculative_round2)
+    error: 失敗した場合の例外クラス名
+    """
+
+    name: str
+    seconds: float = 0.0
+    request_bytes: int = 0
+    response_bytes: int = 0
+    prompt_chars: int = 0
+    status_code: int | None = None
+    usage: TokenUsage | None = None
+    cached: bool = False
+    speculative: bool = False
+    error: str | None = None
+
+
+@dataclass
+class AnalyzeTrace:
+    """analyze() 1 回分のフェーズ別の計測 (ボトルネックの切り分け用)
+
+    アップロードと投機的 Round 2 は他のフェーズと並行するため、phases の
+    seconds の合計は total_seconds を超えることがある。resume_analyze() では
+    実行したフェーズだけが入る。write_behind の保存は含まない。
+
+    provider / model: 使った provider とモデル (model は prompt-context
+        取得前に失敗すると空)
+    draft_id: 下書き ID (アップロード前に失敗すると None)
+    needs_ledger: Round 1 が元帳を要求したか (Round 1 前に失敗すると None)
+    total_seconds: analyze() 全体の経過時間
+    phases: 開始順ではなく完了順の PhaseTrace
+    error: analyze() が失敗した場合の例外クラス名
+    """
+
+    provider: str
+    model: str = ""
+    draft_id: int | None = None
+    needs_ledger: bool | None = None
+    total_seconds: float = 0.0
+    phases: list[PhaseTrace] = field(default_factory=list)
+    error: str | None = None
+
+    def phase_seconds(self) -> dict[str, float]:
+        """フェーズ名 → 経過時間の合計 (投機的 Round 2 は含まない)。"""
+        seconds: dict[str, float] = {}
+        for phase in self.phases:
+            if not phase.speculative:
+                seconds[phase.name] = seconds.get(phase.name, 0.0) + phase.seconds
+        return seconds
+
+
 @dataclass
 class AnalyzeResponse:
-    """AI解析レスポンス"""
+    """AI解析レスポンス
+
+    bytes_saved は画像の前処理 (image_options) で減ったバイト数。
+    trace はフェーズ別の経過時間などの計測 (AnalyzeTrace)。
+    usage は Round ("round1" / "round2") ごとのトークン使用量で、
+    resume_analyze() では再開後に呼んだ Round だけが入る。cost はその
+    推定コスト (クライアントの model_prices に単価が無ければ None)。
+    """
 
     draft_id: int
     suggestions: list[dict]
+    bytes_saved: int = 0
+    trace: AnalyzeTrace | None = None
+    usage: dict[str, TokenUsage] = field(default_factory=dict)
+    cost: float | None = None
+
+
+@dataclass
+class AnalyzeCheckpoint:
+    """analyze() の途中経過 (resume_analyze() で未完了のフェーズから再開する)
+
+    analyze() は各フェーズの完了ごとにこのオブジェクトを更新する。失敗後に
+    resume_analyze() へ渡すと、アップロード済みなら同じ下書きに保存し、
+    Round 1 / Round 2 の結果があれば LLM を呼び直さない。to_dict() /
+    from_dict() で JSON として保存できる (画像そのものは含まない)。
+
+    provider / requested_model / comment / mime_type: analyze() の引数
+    draft_id: アップロード済みの下書き ID (None なら未アップロード)
+    prompt_context_etag: Round 1 / 2 に使った prompt-context の ETag。
+        再開時にサーバ側の ETag が変わっていれば LLM の結果は捨てて呼び直す
+    model: 実際に使ったモデル名 (prompt-context 取得後に決まる)
+    analysis / compliance_result: Round 1 の結果 (None なら未完了)
+    ledger_text: 取得した元帳 (None なら未取得)
+    suggestions: Round 2 の結果 (None なら未完了)
+    saved: 結果の保存 (PATCH suggestions) まで完了したか
+    """
+
+    provider: str
+    requested_model: str | None = None
+    comment: str = ""
+    mime_type: str | None = None
+    draft_id: int | None = None
+    prompt_context_etag: str | None = None
+    model: str = ""
+    analysis: DocumentAnalysis | None = None
+    compliance_result: dict | None = None
+    ledger_text: str | None = None
+    suggestions: list[dict] | None = None
+    saved: bool = False
+
+    @property
+    def next_phase(self) -> str:
+        """最初の未完了フェーズ ("upload" / "round1" / "ledger" / "round2" /
+        "save")。すべて完了していれば "done"。"""
+        if self.draft_id is None:
+            return "upload"
+        if self.suggestions is None:
+            if self.analysis is None:
+                return "round1"
+            if (
+                self.analysis.needs_ledger
+                and self.analysis.requested_accounts
+                and self.ledger_text is None
+            ):
+                return "ledger"
+            return "round2"
+        return "done" if self.saved else "save"
+
+    def discard_llm_results(self) -> None:
+        """Round 1 以降の結果を捨てる (prompt-context が変わった場合)。"""
+        self.analysis = None
+        self.compliance_result = None
+        self.ledger_text = None
+        self.suggestions = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> AnalyzeCheckpoint:
+        analysis = data.get("analysis")
+        return cls(**{
+            **data,
+            "analysis": DocumentAnalysis(**analysis) if analysis else None,
+        })
+
+
+@dataclass
+class SpeculationStats:
+    """投機的 Round 2 (speculative_round2) の集計
+
+    started: 投機実行した回数 (Round 1 などが失敗した分は hits / misses に入らない)
+    hits: Round 1 の結果、投機した Round 2 をそのまま採用できた回数
+    misses: 元帳付きの Round 2 をやり直した回数
+    cancelled: misses のうち、完了前に取り消せた回数 (非同期クライアントのみ)
+    wasted_tokens: 捨てた Round 2 が消費したトークン数 (入力 + 出力)。
+        Round 1 などの失敗で判定前に捨てた分も含み、呼出の完了時に加算する
+    """
+
+    started: int = 0
+    hits: int = 0
+    misses: int = 0
+    cancelled: int = 0
+    wasted_tokens: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        decided = self.hits + self.misses
+        return self.hits / decided if decided else 0.0
+
+
+@dataclass
+class AnalyzeBatchItem:
+    """analyze_many の 1 件分の結果 (response か error のどちらか一方が入る)
+
+    失敗した画像は checkpoint に途中経過が入り、resume_analyze() に渡すと
+    完了済みのフェーズ (アップロード・LLM 呼出) を繰り返さずに再開できる。
+    """
+
+    index: int
+    response: AnalyzeResponse | None = None
+    error: Exception | None = None
+    checkpoint: AnalyzeCheckpoint | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
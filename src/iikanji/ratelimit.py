@@ -0,0 +1,209 @@
+"""クライアント側のレート制限 (トークンバケツ)
+
+並列に analyze() を回すと、LLM プロバイダの RPM / TPM 上限やサーバの API
+レート制限に一斉に当たり、429 の山とやり直しが発生する。送信前にここで
+待つことで、上限内に収まるペースに均す。
+
+RateLimiter はスレッドセーフで、同期/非同期どちらのクライアントからも
+使える。1 つのインスタンスを複数のクライアントに渡せば、プロセス内で
+上限を共有できる。ロックは残量の計算だけに使い、待機中は保持しない。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Any
+
+# 画像 1 枚の入力トークン見積り (長辺 2048px 前後。プロバイダにより 800〜1600)
+_IMAGE_TOKEN_ESTIMATE = 1600
+
+
+@dataclass
+class RateLimitStats:
+    """レート制限の集計
+
+    acquired: 通過した呼出の回数
+    throttled: そのうち待たされた回数
+    wait_seconds: 待った秒数の合計
+    """
+
+    acquired: int = 0
+    throttled: int = 0
+    wait_seconds: float = 0.0
+
+
+class _Bucket:
+    """毎秒 rate ずつ、capacity まで溜まるトークンバケツ。
+
+    取り出しは残量が足りなくても先に予約し (残量は負になる)、負債を返し
+    終える時刻まで待たせる。呼出順に待ち時間が伸びるので、待機中の呼出が
+    後から来た呼出に追い越されることはない。
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._level = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self._level = min(
+            self.capacity, self._level + (now - self._updated) * self.rate,
+        )
+        self._updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """amount を予約し、使えるようになるまでの秒数を返す。
+
+        capacity を超える amount は満杯になった時点で通す (超過分は負債と
+        して後続の呼出が待つ)。でないと空いていても通せない。
+        """
+        self._refill(now)
+        delay = max(0.0, (min(amount, self.capacity) - self._level) / self.rate)
+        self._level -= amount
+        return delay
+
+    def give_back(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self._level = min(self.capacity, self._level + amount)
+
+
+class RateLimiter:
+    """リクエスト数 / トークン数の毎分上限を守るレートリミッタ
+
+    Usage::
+
+        openai_limit = RateLimiter(requests_per_minute=500,
+                                   tokens_per_minute=200_000)
+        server_limit = RateLimiter(requests_per_minute=300)
+        # 複数クライアントで同じインスタンスを共有すると合算で制限される
+        client = KakeiboClient(url, key, openai_api_key="sk-...",
+                               server_rate_limit=server_limit,
+                               llm_rate_limits={"openai": openai_limit})
+
+    Args:
+        requests_per_minute: 毎分のリクエスト数上限。None で制限しない
+        tokens_per_minute: 毎分のトークン数上限 (LLM 用)。呼出前は見積り
+            (estimate_tokens) で予約し、応答の使用量で差分を精算する。
+            枠はプロバイダと同じく 1 分分まで溜めるので、空いていれば
+            大きな呼出も待たずに通る。None で制限しない
+        burst_seconds: リクエスト数の枠を何秒分まで溜めるか (空いている時に
+            待たずに通せる件数)。既定の 1 秒なら、毎分 600 件の制限で 10 件
+            までは連続で通し、以降は 0.1 秒間隔に均す
+    """
+
+    def __init__(
+        self,
+        *,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+        burst_seconds: float = 1.0,
+    ) -> None:
+        for name, value in (
+            ("requests_per_minute", requests_per_minute),
+            ("tokens_per_minute", tokens_per_minute),
+        ):
+            if value is not None and value <= 0:
+                raise ValueError(f"{name} must be positive")
+        if burst_seconds <= 0:
+            raise ValueError("burst_seconds must be positive")
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = self._bucket(requests_per_minute, burst_seconds)
+        # 1 回の LLM 呼出は 1 秒分の TPM を超えることが多い (数千〜1 万
+        # トークン) ので、トークンは毎分の窓そのものを容量にする
+        self._tokens = self._bucket(tokens_per_minute, 60.0)
+        self._lock = threading.Lock()
+        self._stats = RateLimitStats()
+
+    @staticmethod
+    def _bucket(per_minute: float | None, burst_seconds: float) -> _Bucket | None:
+        if per_minute is None:
+            return None
+        rate = per_minute / 60
+        # 1 回分も溜まらない容量だと常に待つことになるので最低 1
+        return _Bucket(rate, max(1.0, rate * burst_seconds))
+
+    def _reserve(self, tokens: int, timeout: float | None = None) -> float | None:
+        """枠を予約して待つ秒数を返す。timeout を超えるなら予約せず None。"""
+        with self._lock:
+            now = time.monotonic()
+            delay = 0.0
+            if self._requests is not None:
+                delay = self._requests.reserve(1, now)
+            if self._tokens is not None and tokens:
+                delay = max(delay, self._tokens.reserve(tokens, now))
+            if timeout is not None and delay > timeout:
+                self._give_back(tokens, now)
+                return None
+            self._stats.acquired += 1
+            if delay > 0:
+                self._stats.throttled += 1
+                self._stats.wait_seconds += delay
+            return delay
+
+    def _give_back(self, tokens: int, now: float) -> None:
+        if self._requests is not None:
+            self._requests.give_back(1, now)
+        if self._tokens is not None and tokens:
+            self._tokens.give_back(tokens, now)
+
+    def _cancel(self, tokens: int) -> None:
+        with self._lock:
+            self._give_back(tokens, time.monotonic())
+
+    def acquire(self, tokens: int = 0, *, timeout: float | None = None) -> bool:
+        """1 リクエスト分 (と tokens トークン) の枠が空くまでブロックする。
+
+        timeout 秒より長く待つ必要があるなら、待たずに予約もせず False を
+        返す (呼出元の時間予算に収まらない場合の打ち切り用)。
+        """
+        delay = self._reserve(tokens, timeout)
+        if delay is None:
+            return False
+        if delay > 0:
+            time.sleep(delay)
+        return True
+
+    async def aacquire(
+        self, tokens: int = 0, *, timeout: float | None = None,
+    ) -> bool:
+        """acquire() の非同期版。キャンセルされたら予約を返却する。"""
+        delay = self._reserve(tokens, timeout)
+        if delay is None:
+            return False
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self._cancel(tokens)
+                raise
+        return True
+
+    def reconcile(self, estimated: int, actual: int) -> None:
+        """見積りで予約したトークン数を実際の使用量で精算する。"""
+        if self._tokens is None or actual == estimated:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if actual < estimated:
+                self._tokens.give_back(estimated - actual, now)
+            else:
+                self._tokens.reserve(actual - estimated, now)
+
+    def stats(self) -> RateLimitStats:
+        """待機回数と待った秒数の集計 (スナップショット)。"""
+        with self._lock:
+            return replace(self._stats)
+
+
+def estimate_tokens(call: dict[str, Any]) -> int:
+    """LLM 呼出 1 回が消費するトークン数の見積り (TPM 制限の予約用)。
+
+    日本語のプロンプトは 1 文字 1 トークン弱なので文字数で多めに見積もり、
+    画像分と出力上限 (max_tokens) を足す。
+    """
+    return len(call["prompt"]) + _IMAGE_TOKEN_ESTIMATE + call.get("max_tokens", 0)
@@ -0,0 +1,115 @@
+"""サーバ / LLM 呼出のリトライ方針
+
+429 や 5xx、通信エラーのような一時的な失敗は、指数バックオフ (ジッタ付き)
+で待ってから再送する。サーバが Retry-After を返していればその秒数を待つ。
+
+再送してよいのは冪等な呼出 (GET / PUT / PATCH / DELETE と、副作用の無い
+ことが分かっている POST) だけ。仕訳作成やアップロードのような冪等でない
+POST は、サーバが処理していないことが確実な場合 (429、接続前の失敗) に
+限って再送する。
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from .exceptions import KakeiboAPIError, LLMAPIError
+
+# リクエストがサーバに届いていないことが確実な通信エラー
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+@dataclass
+class RetryStats:
+    """リトライの集計
+
+    retries: 再送した回数
+    backoff_seconds: 再送前に待った秒数の合計
+    gave_up: 一時的な失敗のままリトライ上限に達した回数
+    """
+
+    retries: int = 0
+    backoff_seconds: float = 0.0
+    gave_up: int = 0
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """リトライ方針
+
+    max_retries: 1 回の呼出あたりの再送回数の上限
+    backoff: 1 回目の再送前の待ち秒数 (以降は倍々、max_backoff で頭打ち)
+    jitter: True なら待ち秒数を 0〜計算値の一様乱数にする (full jitter)。
+        多数のクライアントが同時に再送してサーバに集中するのを避ける
+    retry_statuses: 一時的な失敗とみなす HTTP ステータス
+    max_retry_after: Retry-After がこれより長ければ待たずに諦める
+    """
+
+    max_retries: int = 3
+    backoff: float = 0.5
+    max_backoff: float = 20.0
+    jitter: bool = True
+    retry_statuses: frozenset[int] = field(
+        default_factory=lambda: frozenset({429, 500, 502, 503, 504}),
+    )
+    max_retry_after: float = 60.0
+
+    def is_retryable(
+        self,
+        *,
+        status: int | None = None,
+        exc: BaseException | None = None,
+        idempotent: bool = True,
+    ) -> bool:
+        """status (応答) または exc (例外) が再送してよい失敗なら True。"""
+        if exc is not None:
+            if isinstance(exc, httpx.TransportError):
+                return idempotent or isinstance(exc, _NOT_SENT_ERRORS)
+            if isinstance(exc, (KakeiboAPIError, LLMAPIError)):
+                status = exc.status_code
+            else:
+                return False
+        if status is None or status not in self.retry_statuses:
+            return False
+        # 冪等でない呼出は、処理されていないことが確実な 429 だけ再送する
+        return idempotent or status == 429
+
+    def delay(self, attempt: int, retry_after: float | None = None) -> float | None:
+        """attempt 回目 (0 始まり) の失敗後に待つ秒数。諦めるなら None。"""
+        if attempt >= self.max_retries:
+            return None
+        if retry_after is not None:
+            if retry_after > self.max_retry_after:
+                return None
+            return max(0.0, retry_after)
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return random.uniform(0, delay) if self.jitter else delay
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Retry-After ヘッダ (秒数 または HTTP-date) を待ち秒数にする。"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def retry_after_of(exc: BaseException) -> float | None:
+    """例外が持つ Retry-After 秒数 (LLMAPIError のみ)。"""
+    return exc.retry_after if isinstance(exc, LLMAPIError) else None
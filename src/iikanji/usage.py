@@ -0,0 +1,94 @@
+"""LLM のトークン使用量とコストの集計
+
+KakeiboClient は provider の応答の usage 欄 (llm.TokenUsage) をモデルごとに
+合算し、usage_stats() で返す。model_prices に単価表を渡すと推定コストも
+計算する。どの領収書やプロンプトの大きさがトークンを増やしているかは、
+AnalyzeResponse.usage (Round ごと) と AnalyzeTrace で 1 件ずつ追える。
+"""
+
+from __future__ import annotations
+
+import threading
+from collections.abc import Mapping
+from dataclasses import dataclass, replace
+
+from .llm import TokenUsage
+
+
+@dataclass(frozen=True)
+class ModelPrice:
+    """モデルの単価 (100 万トークンあたり、通貨は任意)
+
+    input_per_million: 入力トークンの単価
+    output_per_million: 出力トークンの単価
+    cached_input_per_million: キャッシュから読んだ入力トークンの単価。
+        None なら input_per_million と同じ
+    """
+
+    input_per_million: float
+    output_per_million: float
+    cached_input_per_million: float | None = None
+
+    def cost(self, usage: TokenUsage) -> float:
+        cached_price = (
+            self.input_per_million if self.cached_input_per_million is None
+            else self.cached_input_per_million
+        )
+        uncached = usage.input_tokens - usage.cached_input_tokens
+        return (
+            uncached * self.input_per_million
+            + usage.cached_input_tokens * cached_price
+            + usage.output_tokens * self.output_per_million
+        ) / 1_000_000
+
+
+@dataclass
+class UsageStats:
+    """モデル 1 つ分のトークン使用量の集計
+
+    calls: 使用量を受け取った (成功した) LLM 呼出の回数。投機的 Round 2 の
+        捨てた分や、応答の解析に失敗した呼出も含む
+    usage: 合計のトークン数
+    cost: model_prices から計算した推定コスト。単価が無ければ None
+    """
+
+    provider: str
+    model: str
+    calls: int = 0
+    usage: TokenUsage = TokenUsage()
+    cost: float | None = None
+
+
+class UsageTracker:
+    """provider・モデルごとのトークン使用量を合算する (スレッドセーフ)。"""
+
+    def __init__(self, prices: Mapping[str, ModelPrice] | None = None) -> None:
+        self._prices = dict(prices or {})
+        self._stats: dict[tuple[str, str], UsageStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, model: str, usage: TokenUsage) -> None:
+        price = self._prices.get(model)
+        with self._lock:
+            stats = self._stats.get((provider, model))
+            if stats is None:
+                stats = UsageStats(
+                    provider, model, cost=None if price is None else 0.0,
+                )
+                self._stats[(provider, model)] = stats
+            stats.calls += 1
+            stats.usage += usage
+            if price is not None:
+                stats.cost = (stats.cost or 0.0) + price.cost(usage)
+
+    def stats(self) -> dict[str, UsageStats]:
+        """"<provider>:<model>" → 集計 (スナップショット)。"""
+        with self._lock:
+            return {
+                f"{provider}:{model}": replace(stats)
+                for (provider, model), stats in self._stats.items()
+            }
+
+    def cost(self, model: str, usage: TokenUsage) -> float | None:
+        price = self._prices.get(model)
+        return None if price is None else price.cost(usage)
@@ -0,0 +1,272 @@
+"""テストで使う偽サーバ・偽 LLM とクライアントの組立
+
+httpx.MockTransport に渡すハンドラと、それを差したクライアントを作る関数を
+まとめる。辞書は呼出ごとに新しく作って返すので、テスト側で書き換えてよい。
+"""
+
+import copy
+import json
+import threading
+
+import httpx
+import pytest
+
+from iikanji import AnalyzeCheckpoint, AsyncKakeiboClient, KakeiboClient
+
+BASE_URL = "https://test.example.com"
+
+_SAMPLE_JOURNAL = {
+    "id": 42,
+    "date": "2026-02-15",
+    "entry_number": 7,
+    "description": "テスト仕訳",
+    "source": "api",
+    "lines": [
+        {"account_code": "7010", "debit": 1000, "credit": 0, "description": ""},
+        {"account_code": "1010", "debit": 0, "credit": 1000, "description": "メモ"},
+    ],
+}
+
+_SAMPLE_DRAFT = {
+    "id": 10,
+    "status": "analyzed",
+    "comment": "テスト",
+    "created_at": "2026-02-19T12:00:00",
+    "summary": {
+        "title": "食費",
+        "date": "2026-02-19",
+        "description": "スーパーで食材購入",
+        "amount": 3000,
+        "suggestion_count": 1,
+    },
+}
+
+_PROMPT_CONTEXT = {
+    "ok": True,
+    "round1_prompt": "DOC_PROMPT",
+    "compliance_prompt": "",
+    "compliance_check_enabled": False,
+    "round2_prompt_template_no_ledger": "R2NL __ACCOUNT_LIST_TEXT__",
+    "round2_prompt_template_with_ledger":
+        "R2WL __ACCOUNT_LIST_TEXT__ L __LEDGER_TEXT__",
+    "account_list_text": "5010 食費\n1010 現金",
+    "custom_prompt": "",
+    "default_model_by_provider": {
+        "openai": "gpt-4o",
+        "anthropic": "claude-sonnet-4-20250514",
+        "google": "gemini-2.0-flash",
+    },
+}
+
+
+def sample_journal(**overrides: object) -> dict:
+    """GET /api/v1/journals/{id} の journal 相当。overrides で項目を差し替える。"""
+    return {**copy.deepcopy(_SAMPLE_JOURNAL), **overrides}
+
+
+def sample_draft(**overrides: object) -> dict:
+    return {**copy.deepcopy(_SAMPLE_DRAFT), **overrides}
+
+
+def prompt_context() -> dict:
+    """GET /api/v1/ai/prompt-context の応答。Round 1 は DOC_PROMPT で始まる。"""
+    return copy.deepcopy(_PROMPT_CONTEXT)
+
+
+def paged_journal_handler(total: int, seen: list[dict]):
+    """total 件の仕訳をページ分割して返すハンドラ。受けたクエリを seen に積む。"""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        params = dict(request.url.params)
+        seen.append(params)
+        page = int(params["page"])
+        per_page = int(params["per_page"])
+        start = (page - 1) * per_page
+        ids = range(start + 1, min(start + per_page, total) + 1)
+        return httpx.Response(200, json={
+            "ok": True,
+            "journals": [sample_journal(id=i) for i in ids],
+            "total": total, "page": page, "per_page": per_page,
+        })
+
+    return handler
+
+
+def dated_journal_handler(dates: list[str], seen: list[dict]):
+    """dates[i] の日付を持つ仕訳 (id=i+1) を date_from/date_to で絞って返すハンドラ。"""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        params = dict(request.url.params)
+        seen.append(params)
+        lo = params.get("date_from", "0000-00-00")
+        hi = params.get("date_to", "9999-99-99")
+        rows = [
+            sample_journal(id=i + 1, date=d)
+            for i, d in enumerate(dates) if lo <= d <= hi
+        ]
+        page = int(params["page"])
+        per_page = int(params["per_page"])
+        return httpx.Response(200, json={
+            "ok": True,
+            "journals": rows[(page - 1) * per_page:page * per_page],
+            "total": len(rows), "page": page, "per_page": per_page,
+        })
+
+    return handler
+
+
+def llm_reply(request: httpx.Request) -> httpx.Response:
+    """OpenAI 互換の偽応答。Round 1 は台帳不要、Round 2 は食費 100 円の提案 1 件。"""
+    prompt = json.loads(request.content)["messages"][0]["content"][0]["text"]
+    if prompt.startswith("DOC_PROMPT"):
+        content = {"needs_ledger": False, "requested_accounts": []}
+    else:
+        content = {"suggestions": [{
+            "title": "食費", "lines": [
+                {"account_code": "5010", "debit_amount": 100, "credit_amount": 0},
+                {"account_code": "1010", "debit_amount": 0, "credit_amount": 100},
+            ],
+        }]}
+    return httpx.Response(200, json={
+        "choices": [{"message": {"content": json.dumps(content)}}],
+    })
+
+
+def scripted_llm(
+    round1: dict, calls: list[str], round1_gate: threading.Event | None = None,
+):
+    """Round 1 に round1 を返し、Round 2 はプロンプト先頭語を title にした提案を返すハンドラ。
+
+    呼ばれたプロンプトの先頭語を calls に積む。round1_gate を渡すと、
+    Round 2 が届くまで Round 1 の応答を止める。usage は毎回 100/20 トークン。
+    """
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        prompt = json.loads(request.content)["messages"][0]["content"][0]["text"]
+        calls.append(prompt.split()[0])
+        if prompt.startswith("DOC_PROMPT"):
+            if round1_gate is not None:
+                # 投機 Round 2 が送られるまで Round 1 を返さない
+                assert round1_gate.wait(5)
+            content = round1
+        else:
+            if round1_gate is not None:
+                round1_gate.set()
+            content = {"suggestions": [{"title": prompt.split()[0], "lines": [
+                {"account_code": "5010", "debit_amount": 1, "credit_amount": 0},
+            ]}]}
+        return httpx.Response(200, json={
+            "choices": [{"message": {"content": json.dumps(content)}}],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 20},
+        })
+
+    return handler
+
+
+def analyze_server(request: httpx.Request) -> httpx.Response:
+    """analyze() が叩くサーバ API の偽実装。アップロードは常に draft 1 になる。"""
+    path = request.url.path
+    if path == "/api/v1/ai/uploads":
+        return httpx.Response(201, json={"draft_id": 1})
+    if path == "/api/v1/ai/prompt-context":
+        return httpx.Response(200, json=prompt_context())
+    return httpx.Response(200, json={"ok": True})
+
+
+def make_client(server, llm=None, **kwargs) -> KakeiboClient:
+    """server (と llm) のハンドラを MockTransport で差した KakeiboClient。"""
+    if llm is not None:
+        kwargs.setdefault("openai_api_key", "sk-x")
+        kwargs.setdefault(
+            "llm_http_client", httpx.Client(transport=httpx.MockTransport(llm)),
+        )
+    return KakeiboClient(
+        BASE_URL, "ik_testkey",
+        http_client=httpx.Client(
+            transport=httpx.MockTransport(server), base_url=BASE_URL,
+        ),
+        **kwargs,
+    )
+
+
+def make_async_client(server, llm=None, **kwargs) -> AsyncKakeiboClient:
+    """server (と llm) のハンドラを MockTransport で差した AsyncKakeiboClient。"""
+    if llm is not None:
+        kwargs.setdefault("openai_api_key", "sk-x")
+        kwargs.setdefault(
+            "llm_http_client", httpx.AsyncClient(transport=httpx.MockTransport(llm)),
+        )
+    return AsyncKakeiboClient(
+        BASE_URL, "ik_testkey",
+        http_client=httpx.AsyncClient(
+            transport=httpx.MockTransport(server), base_url=BASE_URL,
+        ),
+        **kwargs,
+    )
+
+
+class Backend:
+    """サーバと LLM の呼出を記録し、指定回数だけ失敗させる。
+
+    アップロードは常に draft 7、prompt-context には etag を付けて返す。
+    calls にはパス末尾と "round1" / "round2" が呼ばれた順に積まれる。
+    """
+
+    def __init__(self, *, etag: str = '"v1"', needs_ledger: bool = False) -> None:
+        self.etag = etag
+        self.needs_ledger = needs_ledger
+        self.calls: list[str] = []
+        self.fail_round2 = 0
+        self.fail_save = 0
+
+    def server(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        self.calls.append(path.rsplit("/", 1)[-1])
+        if path == "/api/v1/ai/uploads":
+            return httpx.Response(201, json={"draft_id": 7})
+        if path == "/api/v1/ai/prompt-context":
+            return httpx.Response(
+                200, json=prompt_context(), headers={"ETag": self.etag},
+            )
+        if path == "/api/v1/ai/ledger-context":
+            return httpx.Response(200, json={"ledger_text": "LEDGER"})
+        if self.fail_save:
+            self.fail_save -= 1
+            return httpx.Response(500, json={"error": "db down"})
+        return httpx.Response(200, json={"ok": True})
+
+    def llm(self, request: httpx.Request) -> httpx.Response:
+        prompt = json.loads(request.content)["messages"][0]["content"][0]["text"]
+        if prompt.startswith("DOC_PROMPT"):
+            self.calls.append("round1")
+            content = {
+                "needs_ledger": self.needs_ledger,
+                "requested_accounts": ["食費"] if self.needs_ledger else [],
+            }
+            return httpx.Response(200, json={
+                "choices": [{"message": {"content": json.dumps(content)}}],
+            })
+        self.calls.append("round2")
+        if self.fail_round2:
+            self.fail_round2 -= 1
+            return httpx.Response(500, text="overloaded")
+        return llm_reply(request)
+
+    def client(self, **kwargs) -> KakeiboClient:
+        """キャッシュと再試行を切ったクライアント。呼出が calls にそのまま出る。"""
+        kwargs.setdefault("prompt_context_ttl", None)
+        kwargs.setdefault("retry_policy", None)
+        return make_client(self.server, self.llm, **kwargs)
+
+    def async_client(self, **kwargs) -> AsyncKakeiboClient:
+        kwargs.setdefault("retry_policy", None)
+        return make_async_client(self.server, self.llm, **kwargs)
+
+    def failed_analyze(self, exc_type: type[Exception]) -> AnalyzeCheckpoint:
+        """exc_type で失敗させた analyze() の最後のチェックポイントを返す。"""
+        checkpoints: list[AnalyzeCheckpoint] = []
+        with self.client() as client:
+            with pytest.raises(exc_type):
+                client.analyze(b"\xff\xd8", on_checkpoint=checkpoints.append)
+        assert checkpoints
+        return checkpoints[-1]
@@ -0,0 +1,532 @@
+"""AsyncKakeiboClient のユニットテスト"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from iikanji import (
+    AnalyzeResponse,
+    AsyncKakeiboClient,
+    AuthenticationError,
+    DraftListResponse,
+    JournalCreateRequest,
+    JournalCreateResponse,
+    JournalDetail,
+    JournalLine,
+    JournalListResponse,
+    KakeiboAPIError,
+    PendingSaveError,
+    RetryPolicy,
+)
+from iikanji import llm
+
+from .fakes import (
+    dated_journal_handler,
+    llm_reply,
+    make_async_client,
+    paged_journal_handler,
+    prompt_context,
+    sample_draft,
+    sample_journal,
+)
+
+
+def _static(status_code: int, body: dict):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(status_code, json=body)
+
+    return handler
+
+
+class TestJournals:
+    def test_create_journal(self) -> None:
+        captured: list[dict] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            captured.append(json.loads(request.content))
+            return httpx.Response(201, json={"ok": True, "id": 42, "entry_number": 7})
+
+        async def main() -> JournalCreateResponse:
+            async with make_async_client(handler) as client:
+                return await client.create_journal(
+                    date="2026-02-15",
+                    description="テスト仕訳",
+                    lines=[
+                        JournalLine(account_code="7010", debit=1000),
+                        JournalLine(account_code="1010", credit=1000),
+                    ],
+                )
+
+        result = asyncio.run(main())
+
+        assert result == JournalCreateResponse(id=42, entry_number=7)
+        assert captured[0]["lines"][0] == {"account_code": "7010", "debit": 1000}
+
+    def test_get_and_list(self) -> None:
+        journal = sample_journal()
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path == "/api/v1/journals/42":
+                return httpx.Response(200, json={"ok": True, "journal": journal})
+            assert request.url.params["date_from"] == "2026-01-01"
+            return httpx.Response(200, json={
+                "ok": True, "journals": [journal],
+                "total": 1, "page": 1, "per_page": 20,
+            })
+
+        async def main() -> tuple[JournalDetail, JournalListResponse]:
+            async with make_async_client(handler) as client:
+                return (
+                    await client.get_journal(42),
+                    await client.list_journals(date_from="2026-01-01"),
+                )
+
+        detail, listing = asyncio.run(main())
+
+        assert detail.id == 42
+        assert listing.total == 1
+        assert listing.journals[0] == detail
+
+    def test_auth_error(self) -> None:
+        async def main() -> None:
+            async with make_async_client(_static(401, {"error": "無効な API キーです。"})) as client:
+                await client.get_journal(1)
+
+        with pytest.raises(AuthenticationError):
+            asyncio.run(main())
+
+    def test_delete_not_found(self) -> None:
+        async def main() -> None:
+            async with make_async_client(_static(404, {"error": "見つかりません"})) as client:
+                await client.delete_journal(999)
+
+        with pytest.raises(KakeiboAPIError) as exc_info:
+            asyncio.run(main())
+
+        assert exc_info.value.status_code == 404
+
+
+class TestIterJournals:
+    def test_yields_all_pages_in_order(self) -> None:
+        seen: list[dict] = []
+
+        async def main() -> list[int]:
+            async with make_async_client(paged_journal_handler(250, seen)) as client:
+                return [j.id async for j in client.iter_journals(date_from="2026-01-01")]
+
+        assert asyncio.run(main()) == list(range(1, 251))
+        assert [p["page"] for p in seen] == ["1", "2", "3"]
+        assert all(p["per_page"] == "100" for p in seen)
+
+    def test_early_exit_cancels_prefetch(self) -> None:
+        seen: list[dict] = []
+
+        async def main() -> int:
+            async with make_async_client(paged_journal_handler(1000, seen)) as client:
+                it = client.iter_journals(per_page=10)
+                first = await it.__anext__()
+                await it.aclose()
+                return first.id
+
+        assert asyncio.run(main()) == 1
+        assert len(seen) <= 2
+
+
+class TestListAllJournals:
+    def test_fetches_all_pages_in_order(self) -> None:
+        seen: list[dict] = []
+        inner = paged_journal_handler(450, seen)
+        failed: list[str] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            page = request.url.params["page"]
+            if page == "4" and not failed:
+                failed.append(page)
+                raise httpx.ConnectError("reset")
+            return inner(request)
+
+        async def main() -> list[int]:
+            async with make_async_client(handler) as client:
+                journals = await client.list_all_journals(max_workers=2)
+                return [j.id for j in journals]
+
+        assert asyncio.run(main()) == list(range(1, 451))
+        assert failed == ["4"]
+
+
+class TestListAllJournalsSharded:
+    def test_week_windows(self) -> None:
+        dates = [f"2026-01-{d:02d}" for d in range(1, 32) for _ in range(3)]
+        seen: list[dict] = []
+
+        async def main() -> list[int]:
+            async with make_async_client(dated_journal_handler(dates, seen)) as client:
+                journals = await client.list_all_journals(
+                    date_from="2026-01-01", date_to="2026-01-31",
+                    shard_by="week", shard_max_total=10, per_page=5,
+                )
+                return [j.id for j in journals]
+
+        assert asyncio.run(main()) == list(range(1, len(dates) + 1))
+        # 週あたり 21 件 > 10 なので日単位に分割される
+        assert any(p["date_from"] == p["date_to"] for p in seen)
+
+
+class TestCreateJournals:
+    def test_results_in_input_order(self) -> None:
+        in_flight = 0
+        peak = 0
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.001)
+            in_flight -= 1
+            i = int(json.loads(request.content)["description"])
+            if i % 5 == 0:
+                return httpx.Response(400, json={"error": "NG"})
+            return httpx.Response(201, json={"ok": True, "id": i, "entry_number": i})
+
+        requests = [
+            JournalCreateRequest(
+                date="2026-02-15", description=str(i),
+                lines=[JournalLine(account_code="7010", debit=1),
+                       JournalLine(account_code="1010", credit=1)],
+            )
+            for i in range(1, 21)
+        ]
+
+        async def main() -> list:
+            async with make_async_client(handler) as client:
+                return await client.create_journals(requests, concurrency=3)
+
+        results = asyncio.run(main())
+
+        assert peak <= 3
+        for i, r in enumerate(results, start=1):
+            if i % 5 == 0:
+                assert isinstance(r, KakeiboAPIError)
+            else:
+                assert r.id == i
+
+
+    def test_non_json_error_body_recorded_per_item(self) -> None:
+        async def handler(request: httpx.Request) -> httpx.Response:
+            if json.loads(request.content)["description"] == "2":
+                return httpx.Response(502, text="<html>Bad Gateway</html>")
+            return httpx.Response(201, json={"ok": True, "id": 1, "entry_number": 1})
+
+        requests = [
+            JournalCreateRequest(
+                date="2026-02-15", description=str(i),
+                lines=[JournalLine(account_code="7010", debit=1),
+                       JournalLine(account_code="1010", credit=1)],
+            )
+            for i in range(4)
+        ]
+
+        async def main() -> list:
+            async with make_async_client(handler) as client:
+                return await client.create_journals(requests)
+
+        results = asyncio.run(main())
+
+        assert isinstance(results[2], ValueError)
+        assert [r.id for i, r in enumerate(results) if i != 2] == [1, 1, 1]
+
+class TestDrafts:
+    def test_delete_drafts(self) -> None:
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path.endswith("/2"):
+                return httpx.Response(400, json={"error": "NG"})
+            return httpx.Response(200, json={"ok": True})
+
+        async def main():
+            async with make_async_client(handler) as client:
+                return await client.delete_drafts([1, 2, 3], concurrency=2)
+
+        result = asyncio.run(main())
+
+        assert result.deleted == [1, 3]
+        assert list(result.rejected) == [2]
+
+    def test_list_get_delete(self) -> None:
+        draft = sample_draft()
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.method == "DELETE":
+                return httpx.Response(200, json={"ok": True})
+            if request.url.path == "/api/v1/ai/drafts/10":
+                return httpx.Response(200, json={"ok": True, "draft": draft})
+            return httpx.Response(200, json={
+                "ok": True, "drafts": [draft],
+                "total": 1, "page": 1, "per_page": 50,
+            })
+
+        async def main():
+            async with make_async_client(handler) as client:
+                listing = await client.list_drafts(status="all")
+                detail = await client.get_draft(10)
+                await client.delete_draft(10)
+                return listing, detail
+
+        listing, detail = asyncio.run(main())
+
+        assert isinstance(listing, DraftListResponse)
+        assert listing.drafts[0].id == 10
+        assert detail.summary is not None
+        assert detail.summary.amount == 3000
+
+
+class TestAsyncAnalyze:
+    def test_success_full_flow(self) -> None:
+        server_paths: list[str] = []
+
+        def server_handler(request: httpx.Request) -> httpx.Response:
+            server_paths.append(request.url.path)
+            path = request.url.path
+            if path == "/api/v1/ai/uploads":
+                return httpx.Response(201, json={"ok": True, "draft_id": 42})
+            if path == "/api/v1/ai/prompt-context":
+                return httpx.Response(200, json=prompt_context())
+            if path == "/api/v1/ai/ledger-context":
+                return httpx.Response(200, json={"ledger_text": "LEDGER_DATA"})
+            if path == "/api/v1/ai/drafts/42/suggestions":
+                return httpx.Response(200, json={"ok": True})
+            return httpx.Response(404)
+
+        llm_responses = [
+            {"needs_ledger": True, "requested_accounts": ["食費"]},
+            {"suggestions": [{
+                "title": "食費", "lines": [
+                    {"account_code": "5010", "debit_amount": 500, "credit_amount": 0},
+                    {"account_code": "1010", "debit_amount": 0, "credit_amount": 500},
+                ],
+            }]},
+        ]
+        prompts: list[str] = []
+
+        def openai_handler(request: httpx.Request) -> httpx.Response:
+            body = json.loads(request.content)
+            prompts.append(body["messages"][0]["content"][0]["text"])
+            return httpx.Response(200, json={
+                "choices": [{"message": {"content": json.dumps(llm_responses.pop(0))}}],
+            })
+
+        async def main() -> AnalyzeResponse:
+            async with make_async_client(server_handler, openai_handler) as client:
+                return await client.analyze(b"\xff\xd8")
+
+        result = asyncio.run(main())
+
+        assert result.draft_id == 42
+        assert result.suggestions[0]["lines"][0]["account_code"] == "5010"
+        assert set(server_paths[:3]) == {
+            "/api/v1/ai/uploads",
+            "/api/v1/ai/prompt-context",
+            "/api/v1/ai/ledger-context",
+        }
+        assert server_paths.index("/api/v1/ai/prompt-context") < server_paths.index(
+            "/api/v1/ai/ledger-context",
+        )
+        assert server_paths[3:] == ["/api/v1/ai/drafts/42/suggestions"]
+        assert "LEDGER_DATA" in prompts[1]
+
+    def test_upload_overlaps_and_failure_cancels_round2(self) -> None:
+        events: list[str] = []
+
+        async def server_handler(request: httpx.Request) -> httpx.Response:
+            path = request.url.path
+            if path == "/api/v1/ai/uploads":
+                await asyncio.sleep(0.02)
+                events.append("upload")
+                return httpx.Response(413, json={"error": "too large"})
+            events.append(path)
+            return httpx.Response(200, json=prompt_context())
+
+        async def llm_handler(request: httpx.Request) -> httpx.Response:
+            events.append("llm")
+            await asyncio.sleep(0.05)
+            return llm_reply(request)
+
+        async def main() -> None:
+            async with make_async_client(server_handler, llm_handler) as client:
+                await client.analyze(b"\xff\xd8")
+
+        with pytest.raises(KakeiboAPIError, match="too large"):
+            asyncio.run(main())
+
+        assert events == ["/api/v1/ai/prompt-context", "llm", "upload"]
+
+    def test_speculative_round2_cancelled_on_miss(self) -> None:
+        async def server_handler(request: httpx.Request) -> httpx.Response:
+            path = request.url.path
+            if path == "/api/v1/ai/uploads":
+                return httpx.Response(201, json={"draft_id": 1})
+            if path == "/api/v1/ai/prompt-context":
+                return httpx.Response(200, json=prompt_context())
+            return httpx.Response(200, json={"ok": True})
+
+        prompts: list[str] = []
+
+        async def llm_handler(request: httpx.Request) -> httpx.Response:
+            prompt = json.loads(request.content)["messages"][0]["content"][0]["text"]
+            prompts.append(prompt.split()[0])
+            if prompt.startswith("R2NL"):
+                await asyncio.sleep(5)
+            elif prompt.startswith("DOC"):
+                await asyncio.sleep(0.01)
+            content = {"needs_ledger": True} if prompt.startswith("DOC") else {
+                "suggestions": [{"lines": [
+                    {"account_code": "5010", "debit_amount": 1, "credit_amount": 0},
+                ]}],
+            }
+            return httpx.Response(200, json={
+                "choices": [{"message": {"content": json.dumps(content)}}],
+            })
+
+        async def main() -> AsyncKakeiboClient:
+            async with make_async_client(
+                server_handler, llm_handler,
+                speculative_round2=True,
+            ) as client:
+                await client.analyze(b"\xff\xd8")
+            return client
+
+        stats = asyncio.run(main()).speculation_stats()
+
+        assert sorted(prompts) == ["DOC_PROMPT", "R2NL", "R2WL"]
+        assert (stats.started, stats.misses, stats.cancelled) == (1, 1, 1)
+        assert stats.wasted_tokens == 0
+
+    def test_write_behind_retries_and_reports_on_aclose(self) -> None:
+        patch_statuses = {1: [503, 200], 2: [400]}
+        next_draft = iter([1, 2])
+
+        async def server_handler(request: httpx.Request) -> httpx.Response:
+            path = request.url.path
+            if path == "/api/v1/ai/uploads":
+                return httpx.Response(201, json={"draft_id": next(next_draft)})
+            if path == "/api/v1/ai/prompt-context":
+                return httpx.Response(200, json=prompt_context())
+            draft_id = int(path.split("/")[-2])
+            return httpx.Response(patch_statuses[draft_id].pop(0), json={"error": "x"})
+
+        async def main() -> list:
+            async with make_async_client(
+                server_handler, llm_reply,
+                write_behind=True,
+                retry_policy=RetryPolicy(backoff=0),
+            ) as client:
+                return [await client.analyze(b"\xff\xd8") for _ in range(2)]
+
+        with pytest.raises(PendingSaveError) as exc_info:
+            asyncio.run(main())
+
+        assert list(exc_info.value.errors) == [2]
+        assert patch_statuses == {1: [], 2: []}
+
+    def test_requires_api_key(self) -> None:
+        async def main() -> None:
+            async with make_async_client(_static(200, {})) as client:
+                await client.analyze(b"\xff\xd8", provider="google")
+
+        with pytest.raises(ValueError, match="google_api_key"):
+            asyncio.run(main())
+
+
+class TestAsyncAnalyzeMany:
+    def test_yields_each_result(self) -> None:
+        next_draft = iter(range(1, 100))
+
+        def server_handler(request: httpx.Request) -> httpx.Response:
+            path = request.url.path
+            if path == "/api/v1/ai/uploads":
+                return httpx.Response(201, json={"draft_id": next(next_draft)})
+            if path == "/api/v1/ai/prompt-context":
+                return httpx.Response(200, json=prompt_context())
+            if path.endswith("/suggestions"):
+                return httpx.Response(200, json={"ok": True})
+            return httpx.Response(404)
+
+        llm_calls = 0
+
+        def llm_handler(request: httpx.Request) -> httpx.Response:
+            nonlocal llm_calls
+            llm_calls += 1
+            if llm_calls == 1:
+                return httpx.Response(500, text="overloaded")
+            return llm_reply(request)
+
+        async def main() -> list:
+            async with make_async_client(
+                server_handler, llm_handler,
+                retry_policy=None,
+            ) as client:
+                return [item async for item in client.analyze_many(
+                    [b"a", b"b", b"c"], concurrency=2, llm_concurrency=1,
+                )]
+
+        items = asyncio.run(main())
+
+        assert sorted(item.index for item in items) == [0, 1, 2]
+        assert sum(not item.ok for item in items) == 1
+        assert all(item.response.suggestions for item in items if item.ok)
+
+
+class TestLLMConnectionPool:
+    def test_pooled_clients_closed_by_aclose(self) -> None:
+        async def main() -> httpx.AsyncClient:
+            async with AsyncKakeiboClient("https://test.example.com", "ik_testkey") as client:
+                pooled = client._llm_client("openai")
+                assert client._llm_client("openai") is pooled
+            return pooled
+
+        assert asyncio.run(main()).is_closed
+
+
+class TestAsyncHandlers:
+    def test_handlers_match_sync_request_body(self) -> None:
+        """同期/非同期ハンドラが同一のリクエストを送る。"""
+        bodies: list[tuple[str, dict]] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            bodies.append((str(request.url), json.loads(request.content)))
+            return httpx.Response(200, json={
+                "content": [{"text": '{"ok": 1}'}],
+            })
+
+        kwargs = dict(
+            api_key="sk-ant", model="m", image_bytes=b"\x00\x01",
+            mime_type="image/png", prompt="P", max_tokens=10,
+        )
+        sync_result = llm.call_anthropic_image(
+            **kwargs, http_client=httpx.Client(transport=httpx.MockTransport(handler)),
+        )
+
+        async def main() -> dict:
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as c:
+                return await llm.acall_image_llm(
+                    provider="anthropic", **kwargs, http_client=c,
+                )
+
+        async_result = asyncio.run(main())
+
+        assert sync_result == async_result == {"ok": 1}
+        assert bodies[0] == bodies[1]
+
+    def test_error_status_raises(self) -> None:
+        async def main() -> None:
+            async with httpx.AsyncClient(transport=httpx.MockTransport(
+                lambda r: httpx.Response(500, text="boom"),
+            )) as c:
+                await llm.acall_google_image(
+                    api_key="k", model="gemini", image_bytes=b"", mime_type="image/jpeg",
+                    prompt="p", http_client=c,
+                )
+
+        with pytest.raises(RuntimeError, match="Google API error: HTTP 500"):
+            asyncio.run(main())
@@ -0,0 +1,262 @@
+"""サーキットブレーカのユニットテスト"""
+
+import asyncio
+import json
+import threading
+import time
+
+import httpx
+import pytest
+
+from iikanji import (
+    CircuitBreakerPolicy,
+    CircuitOpenError,
+    JournalCreateRequest,
+    JournalLine,
+    KakeiboAPIError,
+    KakeiboClient,
+    LLMAPIError,
+)
+from iikanji.circuit import CircuitBreaker
+
+from .fakes import analyze_server, llm_reply, make_async_client, make_client
+
+
+def _fail(breaker: CircuitBreaker, exc: Exception) -> None:
+    with pytest.raises(type(exc)):
+        with breaker.guard():
+            raise exc
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures(self) -> None:
+        breaker = CircuitBreaker("x", CircuitBreakerPolicy(failure_threshold=3))
+
+        for _ in range(2):
+            _fail(breaker, httpx.ReadTimeout("t"))
+        with breaker.guard():
+            pass  # 成功で連続回数はリセット
+        for _ in range(3):
+            _fail(breaker, LLMAPIError("openai", 503, "down"))
+
+        with pytest.raises(CircuitOpenError) as exc_info:
+            with breaker.guard():
+                pytest.fail("open 中は呼ばれない")
+
+        assert exc_info.value.name == "x"
+        assert 0 < exc_info.value.retry_after <= 30
+        state = breaker.state()
+        assert (state.state, state.opened, state.rejected) == ("open", 1, 1)
+
+    def test_client_errors_do_not_count(self) -> None:
+        breaker = CircuitBreaker("x", CircuitBreakerPolicy(failure_threshold=1))
+
+        _fail(breaker, KakeiboAPIError(404, "not found"))
+        _fail(breaker, ValueError("bad json"))
+
+        assert breaker.state().state == "closed"
+
+    def test_slow_calls_count_as_failures(self) -> None:
+        breaker = CircuitBreaker("x", CircuitBreakerPolicy(
+            failure_threshold=2, slow_call_seconds=0.01,
+        ))
+
+        for _ in range(2):
+            with breaker.guard():
+                time.sleep(0.02)
+
+        assert breaker.state().state == "open"
+
+    def test_half_open_probe(self) -> None:
+        breaker = CircuitBreaker("x", CircuitBreakerPolicy(
+            failure_threshold=1, reset_timeout=0.02,
+        ))
+        _fail(breaker, httpx.ConnectError("c"))
+        time.sleep(0.03)
+        assert breaker.state().state == "half_open"
+
+        # 試行が失敗すれば再び開く
+        _fail(breaker, httpx.ConnectError("c"))
+        assert breaker.state().state == "open"
+
+        time.sleep(0.03)
+        with breaker.guard() as outcome:
+            outcome.failed = False
+        state = breaker.state()
+        assert (state.state, state.consecutive_failures, state.opened) == ("closed", 0, 2)
+
+    def test_half_open_admits_limited_probes(self) -> None:
+        breaker = CircuitBreaker("x", CircuitBreakerPolicy(
+            failure_threshold=1, reset_timeout=0.01, half_open_max_calls=1,
+        ))
+        _fail(breaker, httpx.ConnectError("c"))
+        time.sleep(0.02)
+        probing = threading.Event()
+        release = threading.Event()
+
+        def probe() -> None:
+            with breaker.guard():
+                probing.set()
+                release.wait(5)
+
+        t = threading.Thread(target=probe)
+        t.start()
+        probing.wait(5)
+        with pytest.raises(CircuitOpenError):
+            with breaker.guard():
+                pass
+        release.set()
+        t.join()
+
+        assert breaker.state().state == "closed"
+
+
+def _client(server, llm=None, **kwargs) -> KakeiboClient:
+    # 再試行を切って、失敗がそのままブレーカに数えられるようにする
+    return make_client(server, llm, retry_policy=None, **kwargs)
+
+
+class TestClientCircuitBreaker:
+    def test_server_endpoint_fails_fast(self) -> None:
+        calls: list[str] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request.url.path)
+            if request.url.path.startswith("/api/v1/journals/"):
+                return httpx.Response(503, json={"error": "maintenance"})
+            return httpx.Response(200, json={
+                "ok": True, "drafts": [], "total": 0, "page": 1, "per_page": 50,
+            })
+
+        policy = CircuitBreakerPolicy(failure_threshold=2)
+        with _client(handler, circuit_breaker=policy) as client:
+            for journal_id in (1, 2):
+                with pytest.raises(KakeiboAPIError):
+                    client.get_journal(journal_id)
+            with pytest.raises(CircuitOpenError):
+                client.get_journal(3)
+            client.list_drafts()  # 別エンドポイントは影響を受けない
+            states = client.circuit_states()
+
+        assert calls == ["/api/v1/journals/1", "/api/v1/journals/2", "/api/v1/ai/drafts"]
+        assert states["server:GET /api/v1/journals/{id}"].state == "open"
+        assert states["server:GET /api/v1/ai/drafts"].state == "closed"
+
+    def test_llm_provider_fails_fast(self) -> None:
+        llm_calls = 0
+
+        def llm_handler(request: httpx.Request) -> httpx.Response:
+            nonlocal llm_calls
+            llm_calls += 1
+            return httpx.Response(502, text="bad gateway")
+
+        with _client(
+            analyze_server, llm_handler,
+            circuit_breaker=CircuitBreakerPolicy(failure_threshold=2),
+        ) as client:
+            for _ in range(2):
+                with pytest.raises(LLMAPIError):
+                    client.analyze(b"\xff\xd8")
+            with pytest.raises(CircuitOpenError):
+                client.analyze(b"\xff\xd8")
+            state = client.circuit_states()["llm:openai"]
+
+        assert llm_calls == 2
+        assert (state.state, state.rejected) == ("open", 1)
+
+    @staticmethod
+    def _flaky_after_first(request: httpx.Request) -> httpx.Response:
+        # 最初の 1 件だけ成功し、以降はサーバが落ちている
+        if request.method == "POST":
+            if json.loads(request.content)["description"] == "明細0":
+                return httpx.Response(201, json={"ok": True, "id": 1, "entry_number": 1})
+        elif request.url.path.endswith("/1"):
+            return httpx.Response(200, json={"ok": True})
+        return httpx.Response(503, json={"error": "maintenance"})
+
+    def test_bulk_create_reports_open_circuit_per_item(self) -> None:
+        requests = [
+            JournalCreateRequest(
+                date="2026-02-15", description=f"明細{i}",
+                lines=[JournalLine("7010", debit=100), JournalLine("1010", credit=100)],
+            )
+            for i in range(5)
+        ]
+        policy = CircuitBreakerPolicy(failure_threshold=2)
+        with _client(self._flaky_after_first, circuit_breaker=policy) as client:
+            results = client.create_journals(requests, concurrency=1)
+
+        assert results[0].id == 1
+        assert [type(r) for r in results[1:]] == [
+            KakeiboAPIError, KakeiboAPIError, CircuitOpenError, CircuitOpenError,
+        ]
+
+    def test_bulk_delete_reports_open_circuit_as_error(self) -> None:
+        policy = CircuitBreakerPolicy(failure_threshold=2)
+        with _client(self._flaky_after_first, circuit_breaker=policy) as client:
+            result = client.delete_journals([1, 2, 3, 4, 5], concurrency=1)
+
+        assert result.deleted == [1]
+        assert list(result.rejected) == [2, 3]
+        assert list(result.errors) == [4, 5]
+        assert all(isinstance(e, CircuitOpenError) for e in result.errors.values())
+
+    @staticmethod
+    def _slow_but_healthy(handler):
+        # 1 秒あれば応答する呼出先。それより短いタイムアウトでは ReadTimeout になる
+        def slow(request: httpx.Request) -> httpx.Response:
+            if request.extensions["timeout"]["read"] < 1.0:
+                raise httpx.ReadTimeout("timed out", request=request)
+            return handler(request)
+        return slow
+
+    def test_deadline_capped_timeout_is_not_a_failure(self) -> None:
+        with _client(
+            analyze_server, self._slow_but_healthy(llm_reply),
+            circuit_breaker=CircuitBreakerPolicy(failure_threshold=1),
+        ) as client:
+            with pytest.raises(httpx.ReadTimeout):
+                client.analyze(b"\xff\xd8", timeout_budget=0.5)
+            state = client.circuit_states()["llm:openai"]
+            result = client.analyze(b"\xff\xd8")
+
+        assert (state.state, state.consecutive_failures) == ("closed", 0)
+        assert result.suggestions
+
+    def test_disabled_by_default(self) -> None:
+        with _client(lambda r: httpx.Response(503, json={"error": "x"})) as client:
+            for _ in range(10):
+                with pytest.raises(KakeiboAPIError):
+                    client.get_journal(1)
+
+            assert client.circuit_states() == {}
+
+    def test_async_client(self) -> None:
+        async def main() -> None:
+            async with make_async_client(
+                lambda r: httpx.Response(500, json={"error": "x"}),
+                retry_policy=None,
+                circuit_breaker=CircuitBreakerPolicy(failure_threshold=1),
+            ) as client:
+                with pytest.raises(KakeiboAPIError):
+                    await client.delete_journal(1)
+                with pytest.raises(CircuitOpenError):
+                    await client.delete_journal(2)
+
+        asyncio.run(main())
+
+    def test_async_deadline_capped_timeout_is_not_a_failure(self) -> None:
+        async def main() -> dict:
+            async with make_async_client(
+                self._slow_but_healthy(analyze_server), llm_reply,
+                retry_policy=None,
+                circuit_breaker=CircuitBreakerPolicy(failure_threshold=1),
+            ) as client:
+                with pytest.raises(httpx.ReadTimeout):
+                    await client.analyze(b"\xff\xd8", timeout_budget=0.5)
+                return client.circuit_states()
+
+        states = asyncio.run(main())
+
+        assert all(s.state == "closed" for s in states.values())
+        assert states["server:GET /api/v1/ai/prompt-context"].consecutive_failures == 0
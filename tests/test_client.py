@@ -1,6 +1,8 @@
 """KakeiboClient のユニットテスト"""
 
 import json
+import threading
+import time
 
 import httpx
 import pytest
@@ -8,15 +10,32 @@ import pytest
 from iikanji import (
     AnalyzeResponse,
     AuthenticationError,
+    BulkDeleteResult,
+    BulkProgress,
     DraftDetail,
     DraftListItem,
     DraftListResponse,
+    JournalCreateRequest,
     JournalCreateResponse,
     JournalDetail,
     JournalLine,
     JournalListResponse,
     KakeiboAPIError,
     KakeiboClient,
+    LLMAPIError,
+    PendingSaveError,
+    RetryPolicy,
+)
+from iikanji import llm
+from iikanji.cache import PromptContext
+
+from .fakes import (
+    analyze_server,
+    dated_journal_handler,
+    llm_reply,
+    make_client,
+    paged_journal_handler,
+    scripted_llm,
 )
 
 
@@ -239,6 +258,116 @@ class TestCreateJournal:
         assert captured[0]["date"] == "2026-03-01"
 
 
+class TestCreateJournals:
+    @staticmethod
+    def _requests(n: int) -> list[JournalCreateRequest]:
+        return [
+            JournalCreateRequest(
+                date="2026-02-15",
+                description=f"明細{i}",
+                lines=[
+                    JournalLine(account_code="7010", debit=100 + i),
+                    JournalLine(account_code="1010", credit=100 + i),
+                ],
+            )
+            for i in range(n)
+        ]
+
+    def test_results_in_input_order_and_errors_isolated(self) -> None:
+        def handler(request: httpx.Request) -> httpx.Response:
+            body = json.loads(request.content)
+            i = int(body["description"].removeprefix("明細"))
+            if i == 3:
+                return httpx.Response(400, json={"error": "貸借が一致しません。"})
+            return httpx.Response(201, json={"ok": True, "id": 1000 + i, "entry_number": i})
+
+        http_client = httpx.Client(
+            transport=httpx.MockTransport(handler),
+            base_url="https://test.example.com",
+        )
+        updates: list[BulkProgress] = []
+
+        with KakeiboClient("https://test.example.com", "ik_testkey", http_client=http_client) as client:
+            results = client.create_journals(
+                self._requests(10), concurrency=4, progress=updates.append,
+            )
+
+        assert len(results) == 10
+        assert isinstance(results[3], KakeiboAPIError)
+        assert results[3].status_code == 400
+        assert [r.id for i, r in enumerate(results) if i != 3] == [
+            1000 + i for i in range(10) if i != 3
+        ]
+        assert [u.done for u in updates] == list(range(1, 11))
+        assert updates[-1].failed == 1
+        assert updates[-1].total == 10
+        assert updates[-1].rate >= 0
+
+    def test_transport_error_recorded_per_item(self) -> None:
+        def handler(request: httpx.Request) -> httpx.Response:
+            if json.loads(request.content)["description"] == "明細1":
+                raise httpx.ConnectError("reset")
+            return httpx.Response(201, json={"ok": True, "id": 1, "entry_number": 1})
+
+        http_client = httpx.Client(
+            transport=httpx.MockTransport(handler),
+            base_url="https://test.example.com",
+        )
+
+        with KakeiboClient(
+            "https://test.example.com", "ik_testkey",
+            http_client=http_client, retry_policy=None,
+        ) as client:
+            results = client.create_journals(self._requests(3))
+
+        assert isinstance(results[0], JournalCreateResponse)
+        assert isinstance(results[1], httpx.ConnectError)
+        assert isinstance(results[2], JournalCreateResponse)
+
+    def test_non_json_error_body_recorded_per_item(self) -> None:
+        # プロキシの 502 は HTML を返す。送信済みの行の結果を失わないこと
+        def handler(request: httpx.Request) -> httpx.Response:
+            if json.loads(request.content)["description"] == "明細2":
+                return httpx.Response(
+                    502, text="<html>Bad Gateway</html>",
+                    headers={"Content-Type": "text/html"},
+                )
+            return httpx.Response(201, json={"ok": True, "id": 1, "entry_number": 1})
+
+        http_client = httpx.Client(
+            transport=httpx.MockTransport(handler),
+            base_url="https://test.example.com",
+        )
+        updates: list[BulkProgress] = []
+
+        with KakeiboClient(
+            "https://test.example.com", "ik_testkey", http_client=http_client,
+        ) as client:
+            results = client.create_journals(
+                self._requests(6), progress=updates.append,
+            )
+
+        assert isinstance(results[2], ValueError)
+        assert all(
+            isinstance(r, JournalCreateResponse)
+            for i, r in enumerate(results) if i != 2
+        )
+        assert updates[-1].done == 6
+        assert updates[-1].failed == 1
+
+    def test_auth_error_aborts(self) -> None:
+        client = _make_client(401, {"error": "無効な API キーです。"})
+
+        with client, pytest.raises(AuthenticationError):
+            client.create_journals(self._requests(5))
+
+    def test_empty(self) -> None:
+        client = _make_client(201, {"ok": True, "id": 1, "entry_number": 1})
+
+        with client:
+            assert client.create_journals([]) == []
+
+
 class TestGetJournal:
     def test_success(self) -> None:
         client = _make_client(200, {"ok": True, "journal": SAMPLE_JOURNAL})
@@ -363,6 +492,233 @@ class TestDeleteJournal:
         assert captured_methods[0] == "DELETE"
 
 
+class TestIterJournals:
+    def test_yields_all_pages_in_order(self) -> None:
+        seen: list[dict] = []
+        http_client = httpx.Client(
+            transport=httpx.MockTransport(paged_journal_handler(250, seen)),
+            base_url="https://test.example.com",
+        )
+
+        with KakeiboClient("https://test.example.com", "ik_testkey", http_client=http_client) as client:
+            ids = [j.id for j in client.iter_journals(date_from="2026-01-01", date_to="2026-12-31")]
+
+        assert ids == list(range(1, 251))
+        assert [p["page"] for p in seen] == ["1", "2", "3"]
+        assert all(p["per_page"] == "100" for p in seen)
+        assert seen[0]["date_from"] == "2026-01-01"
+
+    def test_empty(self) -> None:
+        seen: list[dict] = []
+        http_client = httpx.Client(
+            transport=httpx.MockTransport(paged_journal_handler(0, seen)),
+            base_url="https://test.example.com",
+        )
+
+        with KakeiboClient("https://test.example.com", "ik_testkey", http_client=http_client) as client:
+            assert list(client.iter_journals()) == []
+
+        assert len(seen) == 1
+
+    def test_prefetches_at_most_one_page_ahead(self) -> None:
+        seen: list[dict] = []
+        http_client = httpx.Client(
+            transport=httpx.MockTransport(paged_journal_handler(1000, seen)),
+            base_url="https://test.example.com",
+        )
+
+        with KakeiboClient("https://test.example.com", "ik_testkey", http_client=http_client) as client:
+            it = client.iter_journals(per_page=10)
+            first = next(it)
+            it.close()
+
+        assert first.id == 1
+        # 処理中のページ 1 と先読みのページ 2 のみ
+        assert len(seen) <= 2
+
+    def test_error_propagates(self) -> None:
+        client = _make_client(401, {"error": "無効な API キーです。"})
+
+        with client, pytest.raises(AuthenticationError):
+            list(client.iter_journals())
+
+
+class TestListAllJournals:
+    def test_fetches_all_pages_in_order(self) -> None:
+        seen: list[dict] = []
+        http_client = httpx.Client(
+            transport=httpx.MockTransport(paged_journal_handler(1050, seen)),
+            base_url="https://test.example.com",
+        )
+
+        with KakeiboClient("https://test.example.com", "ik_testkey", http_client=http_client) as client:
+            journals = client.list_all_journals(date_from="2026-01-01", max_workers=3)
+
+        assert [j.id for j in journals] == list(range(1, 1051))
+        assert sorted(int(p["page"]) for p in seen) == list(range(1, 12))
+        assert seen[0]["page"] == "1"
+
+    def test_single_page(self) -> None:
+        seen: list[dict] = []
+        http_client = httpx.Client(
+            transport=httpx.MockTransport(paged_journal_handler(3, seen)),
+            base_url="https://test.example.com",
+        )
+
+        with KakeiboClient("https://test.example.com", "ik_testkey", http_client=http_client) as client:
+            journals = client.list_all_journals()
+
+        assert len(journals) == 3
+        assert len(seen) == 1
+
+    def test_retries_failed_page_only(self) -> None:
+        seen: list[dict] = []
+        inner = paged_journal_handler(300, seen)
+        failures = {"3": 1}
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            page = request.url.params["page"]
+            if failures.get(page):
+                failures[page] -= 1
+                return httpx.Response(503, json={"error": "busy"})
+            return inner(request)
+
+        http_client = httpx.Client(
+            transport=httpx.MockTransport(handler),
+            base_url="https://test.example.com",
+        )
+
+        with KakeiboClient(
+            "https://test.example.com", "ik_testkey",
+            http_client=http_client, retry_policy=RetryPolicy(backoff=0),
+        ) as client:
+            journals = client.list_all_journals()
+            stats = client.retry_stats()["server"]
+
+        assert [j.id for j in journals] == list(range(1, 301))
+        assert sorted(int(p["page"]) for p in seen) == [1, 2, 3]
+        assert stats.retries == 1
+
+    def test_non_retryable_error_raises(self) -> None:
+        seen: list[dict] = []
+        inner = paged_journal_handler(300, seen)
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.params["page"] == "2":
+                return httpx.Response(403, json={"error": "forbidden"})
+            return inner(request)
+
+        http_client = httpx.Client(
+            transport=httpx.MockTransport(handler),
+            base_url="https://test.example.com",
+        )
+
+        with KakeiboClient("https://test.example.com", "ik_testkey", http_client=http_client) as client:
+            with pytest.raises(KakeiboAPIError) as exc_info:
+                client.list_all_journals()
+
+        assert exc_info.value.status_code == 403
+
+
+class TestListAllJournalsSharded:
+    def test_month_windows_split_dense_month(self) -> None:
+        # 1月は 1日あたり 2 件 (62 件)、2-3 月は月初に 1 件ずつ
+        dates = [f"2026-01-{d:02d}" for d in range(1, 32) for _ in range(2)]
+        dates += ["2026-02-01", "2026-03-01"]
+        seen: list[dict] = []
+        http_client = httpx.Client(
+            transport=httpx.MockTransport(dated_journal_handler(dates, seen)),
+            base_url="https://test.example.com",
+        )
+
+        with KakeiboClient("https://test.example.com", "ik_testkey", http_client=http_client) as client:
+            journals = client.list_all_journals(
+                date_from="2026-01-01", date_to="2026-03-31",
+                shard_by="month", shard_max_total=20, per_page=10,
+            )
+
+        assert [j.id for j in journals] == list(range(1, len(dates) + 1))
+        windows = {(p["date_from"], p["date_to"]) for p in seen}
+        assert ("2026-02-01", "2026-02-28") in windows
+        # 1月は週単位に分割され、各ウィンドウは浅いページ読みで済む
+        assert ("2026-01-05", "2026-01-11") in windows
+        assert max(int(p["page"]) for p in seen) <= 2
+
+    def test_day_window_paginates_when_still_dense(self) -> None:
+        dates = ["2026-05-01"] * 25
+        seen: list[dict] = []
+        http_client = httpx.Client(
+            transport=httpx.MockTransport(dated_journal_handler(dates, seen)),
+            base_url="https://test.example.com",
+        )
+
+        with KakeiboClient("https://test.example.com", "ik_testkey", http_client=http_client) as client:
+            journals = client.list_all_journals(
+                date_from="2026-05-01", date_to="2026-05-01",
+                shard_by="day", shard_max_total=5, per_page=10,
+            )
+
+        assert [j.id for j in journals] == list(range(1, 26))
+        assert sorted(int(p["page"]) for p in seen) == [1, 2, 3]
+
+    def test_requires_date_range(self) -> None:
+        client = _make_client(200, {})
+
+        with client, pytest.raises(ValueError, match="date_from"):
+            client.list_all_journals(date_from="2026-01-01", shard_by="week")
+
+    def test_unknown_unit(self) -> None:
+        client = _make_client(200, {})
+
+        with client, pytest.raises(ValueError, match="shard_by"):
+            client.list_all_journals(
+                date_from="2026-01-01", date_to="2026-01-31", shard_by="year",
+            )
+
+
+class TestDeleteJournals:
+    def test_outcomes_are_classified(self) -> None:
+        def handler(request: httpx.Request) -> httpx.Response:
+            journal_id = int(request.url.path.rsplit("/", 1)[1])
+            if journal_id == 2:
+                return httpx.Response(400, json={"error": "確定済みのため変更できません。"})
+            if journal_id == 3:
+                return httpx.Response(404, json={"error": "仕訳が見つかりません。"})
+            if journal_id == 4:
+                raise httpx.ReadTimeout("timeout")
+            return httpx.Response(200, json={"ok": True})
+
+        http_client = httpx.Client(
+            transport=httpx.MockTransport(handler),
+            base_url="https://test.example.com",
+        )
+        updates: list[BulkProgress] = []
+
+        with KakeiboClient(
+            "https://test.example.com", "ik_testkey",
+            http_client=http_client, retry_policy=None,
+        ) as client:
+            result = client.delete_journals([5, 1, 2, 3, 4, 6], concurrency=3, progress=updates.append)
+
+        assert isinstance(result, BulkDeleteResult)
+        assert result.deleted == [5, 1, 6]
+        assert result.not_found == [3]
+        assert list(result.rejected) == [2]
+        assert result.rejected[2].status_code == 400
+        assert isinstance(result.errors[4], httpx.ReadTimeout)
+        assert not result.ok
+        assert updates[-1].done == 6
+
+    def test_all_deleted(self) -> None:
+        client = _make_client(200, {"ok": True})
+
+        with client:
+            result = client.delete_journals(range(1, 21))
+
+        assert result.deleted == list(range(1, 21))
+        assert result.ok
+
+
 # --- AI 証憑仕訳 ---
 
 
@@ -526,13 +882,13 @@ class TestAnalyze:
         assert result.suggestions[0]["title"] == "食費"
         assert result.suggestions[0]["lines"][0]["account_code"] == "5010"
 
-        # サーバ呼出順: uploads → prompt-context → PATCH suggestions
+        # uploads と prompt-context は並行 (順不同)、PATCH suggestions が最後
         server_paths = [r.url.path for r in server_calls]
-        assert server_paths == [
-            "/api/v1/ai/uploads",
+        assert sorted(server_paths[:2]) == [
             "/api/v1/ai/prompt-context",
-            "/api/v1/ai/drafts/42/suggestions",
+            "/api/v1/ai/uploads",
         ]
+        assert server_paths[2:] == ["/api/v1/ai/drafts/42/suggestions"]
         # PATCH ボディに provider/model 含む
         patch_body = json.loads(server_calls[2].content)
         assert patch_body["provider"] == "openai"
@@ -785,6 +1141,612 @@ class TestAnalyze:
         assert seen_models == ["gpt-4-vision-preview", "gpt-4-vision-preview"]
 
 
+class TestAnalyzeOverlap:
+    """アップロードは prompt-context / LLM と並行し、保存の直前で合流する。"""
+
+    def _client(self, server_handler, llm_handler) -> KakeiboClient:
+        return KakeiboClient(
+            "https://test.example.com", "ik_testkey",
+            openai_api_key="sk-x",
+            http_client=httpx.Client(
+                transport=httpx.MockTransport(server_handler),
+                base_url="https://test.example.com",
+            ),
+            llm_http_client=httpx.Client(transport=httpx.MockTransport(llm_handler)),
+            retry_policy=None,
+        )
+
+    @staticmethod
+    def _server(on_upload):
+        def handler(request: httpx.Request) -> httpx.Response:
+            path = request.url.path
+            if path == "/api/v1/ai/uploads":
+                return on_upload()
+            if path == "/api/v1/ai/prompt-context":
+                return httpx.Response(200, json=TestAnalyze._PROMPT_CTX)
+            return httpx.Response(200, json={"ok": True})
+        return handler
+
+    def test_upload_runs_during_llm_rounds(self) -> None:
+        round1_started = threading.Event()
+
+        def on_upload() -> httpx.Response:
+            # Round 1 が始まるまでアップロードを終わらせない
+            assert round1_started.wait(5)
+            return httpx.Response(201, json={"draft_id": 9})
+
+        def llm_handler(request: httpx.Request) -> httpx.Response:
+            round1_started.set()
+            return llm_reply(request)
+
+        with self._client(self._server(on_upload), llm_handler) as client:
+            result = client.analyze(b"\xff\xd8")
+
+        assert result.draft_id == 9
+
+    def test_upload_failure_stops_before_round2(self) -> None:
+        upload_failed = threading.Event()
+        llm_calls: list[httpx.Request] = []
+
+        def on_upload() -> httpx.Response:
+            upload_failed.set()
+            return httpx.Response(413, json={"error": "too large"})
+
+        def llm_handler(request: httpx.Request) -> httpx.Response:
+            llm_calls.append(request)
+            assert upload_failed.wait(5)
+            time.sleep(0.01)
+            return llm_reply(request)
+
+        with self._client(self._server(on_upload), llm_handler) as client:
+            with pytest.raises(KakeiboAPIError, match="too large"):
+                client.analyze(b"\xff\xd8")
+
+        assert len(llm_calls) == 1
+
+    def test_llm_failure_waits_for_upload(self) -> None:
+        upload_finished = threading.Event()
+
+        def on_upload() -> httpx.Response:
+            time.sleep(0.05)
+            upload_finished.set()
+            return httpx.Response(201, json={"draft_id": 9})
+
+        def llm_handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(500, text="boom")
+
+        with self._client(self._server(on_upload), llm_handler) as client:
+            with pytest.raises(RuntimeError, match="OpenAI API error"):
+                client.analyze(b"\xff\xd8")
+            assert upload_finished.is_set()
+
+
+class TestSpeculativeRound2:
+    @staticmethod
+    def _client(llm_handler) -> KakeiboClient:
+        def server_handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path == "/api/v1/ai/ledger-context":
+                return httpx.Response(200, json={"ledger_text": "LEDGER"})
+            return analyze_server(request)
+
+        return make_client(server_handler, llm_handler, speculative_round2=True)
+
+    def _analyze(self, llm_handler) -> tuple[AnalyzeResponse, KakeiboClient]:
+        with self._client(llm_handler) as client:
+            return client.analyze(b"\xff\xd8"), client
+
+    def test_hit_uses_speculative_result(self) -> None:
+        calls: list[str] = []
+        handler = scripted_llm(
+            {"needs_ledger": False}, calls, round1_gate=threading.Event(),
+        )
+
+        result, client = self._analyze(handler)
+
+        assert result.suggestions[0]["title"] == "R2NL"
+        assert sorted(calls) == ["DOC_PROMPT", "R2NL"]
+        stats = client.speculation_stats()
+        assert (stats.started, stats.hits, stats.misses) == (1, 1, 0)
+        assert stats.hit_rate == 1.0
+        assert stats.wasted_tokens == 0
+
+    def test_miss_reruns_with_ledger_and_counts_waste(self) -> None:
+        calls: list[str] = []
+        handler = scripted_llm(
+            {"needs_ledger": True, "requested_accounts": ["食費"]}, calls,
+        )
+
+        result, client = self._analyze(handler)
+
+        assert result.suggestions[0]["title"] == "R2WL"
+        assert sorted(calls) == ["DOC_PROMPT", "R2NL", "R2WL"]
+        stats = client.speculation_stats()
+        assert (stats.hits, stats.misses, stats.cancelled) == (0, 1, 0)
+        assert stats.hit_rate == 0.0
+        assert stats.wasted_tokens == 120
+
+    def test_miss_does_not_wait_for_discarded_call(self) -> None:
+        calls: list[str] = []
+        inner = scripted_llm(
+            {"needs_ledger": True, "requested_accounts": ["食費"]}, calls,
+        )
+
+        release = threading.Event()
+        finished: list[str] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if b"R2NL" in request.content:
+                # 捨てられる投機呼出は、analyze() が返るまで終わらない
+                assert release.wait(5)
+                finished.append("R2NL")
+            return inner(request)
+
+        with self._client(handler) as client:
+            result = client.analyze(b"\xff\xd8")
+            assert finished == []
+            release.set()
+
+        assert result.suggestions[0]["title"] == "R2WL"
+        assert finished == ["R2NL"]
+        assert not any(p.speculative for p in result.trace.phases)
+        # close() が完了を待つので、捨てた分のトークンは集計済み
+        assert client.speculation_stats().wasted_tokens == 120
+
+    def test_round1_failure_still_counts_speculative_tokens(self) -> None:
+        inner = scripted_llm({}, [], round1_gate=threading.Event())
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            response = inner(request)
+            if b"DOC_PROMPT" in request.content:
+                return httpx.Response(400, text="bad request")
+            return response
+
+        with make_client(analyze_server, handler, speculative_round2=True) as client:
+            with pytest.raises(LLMAPIError):
+                client.analyze(b"\xff\xd8")
+
+        # 判定前に捨てた投機は hits / misses に入らず、消費分だけ数える
+        stats = client.speculation_stats()
+        assert (stats.started, stats.hits, stats.misses) == (1, 0, 0)
+        assert stats.wasted_tokens == 120
+
+    def test_disabled_by_default(self) -> None:
+        client = KakeiboClient("https://test.example.com", "ik_testkey")
+
+        assert client.speculation_stats().started == 0
+        client.close()
+
+
+class TestTokenUsage:
+    @pytest.mark.parametrize(("provider", "body", "expected"), [
+        ("openai", {"usage": {"prompt_tokens": 10, "completion_tokens": 5}}, (10, 5)),
+        ("anthropic", {"usage": {"input_tokens": 7, "output_tokens": 3}}, (7, 3)),
+        ("google", {"usageMetadata": {"promptTokenCount": 4, "candidatesTokenCount": 2}}, (4, 2)),
+        ("openai", {}, (0, 0)),
+    ])
+    def test_parse_usage(self, provider: str, body: dict, expected: tuple) -> None:
+        usage = llm.parse_usage(provider, httpx.Response(200, json=body))
+
+        assert (usage.input_tokens, usage.output_tokens) == expected
+        assert usage.total == sum(expected)
+
+    def test_on_usage_reported_even_if_content_unparseable(self) -> None:
+        seen: list[llm.TokenUsage] = []
+        http_client = httpx.Client(transport=httpx.MockTransport(
+            lambda r: httpx.Response(200, json={
+                "choices": [{"message": {"content": "not json"}}],
+                "usage": {"prompt_tokens": 9, "completion_tokens": 1},
+            }),
+        ))
+
+        with pytest.raises(ValueError):
+            llm.call_image_llm(
+                provider="openai", api_key="k", model="m", image_bytes=b"x",
+                mime_type="image/jpeg", prompt="p", http_client=http_client,
+                on_usage=seen.append,
+            )
+
+        assert seen == [llm.TokenUsage(9, 1)]
+
+
+class TestWriteBehind:
+    def _client(self, on_patch, **kwargs) -> KakeiboClient:
+        next_draft = iter(range(1, 100))
+
+        def server_handler(request: httpx.Request) -> httpx.Response:
+            path = request.url.path
+            if path == "/api/v1/ai/uploads":
+                return httpx.Response(201, json={"draft_id": next(next_draft)})
+            if path == "/api/v1/ai/prompt-context":
+                return httpx.Response(200, json=TestAnalyze._PROMPT_CTX)
+            return on_patch(request)
+
+        return KakeiboClient(
+            "https://test.example.com", "ik_testkey",
+            openai_api_key="sk-x",
+            http_client=httpx.Client(
+                transport=httpx.MockTransport(server_handler),
+                base_url="https://test.example.com",
+            ),
+            llm_http_client=httpx.Client(
+                transport=httpx.MockTransport(llm_reply),
+            ),
+            write_behind=True,
+            **kwargs,
+        )
+
+    def test_returns_before_save_completes(self) -> None:
+        release = threading.Event()
+        saved: list[str] = []
+
+        def on_patch(request: httpx.Request) -> httpx.Response:
+            assert release.wait(5)
+            saved.append(request.url.path)
+            return httpx.Response(200, json={"ok": True})
+
+        with self._client(on_patch) as client:
+            result = client.analyze(b"\xff\xd8")
+            assert result.suggestions[0]["title"] == "食費"
+            assert saved == []
+            release.set()
+            client.flush()
+            assert saved == ["/api/v1/ai/drafts/1/suggestions"]
+
+    def test_retries_transient_errors(self) -> None:
+        statuses = [503, 429, 200]
+
+        def on_patch(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(statuses.pop(0), json={"error": "busy"})
+
+        with self._client(on_patch, retry_policy=RetryPolicy(backoff=0)) as client:
+            client.analyze(b"\xff\xd8")
+
+        assert statuses == []
+
+    def test_failures_surface_on_flush(self) -> None:
+        calls: list[httpx.Request] = []
+
+        def on_patch(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            return httpx.Response(400, json={"error": "locked"})
+
+        client = self._client(on_patch)
+        client.analyze(b"\xff\xd8")
+        client.analyze(b"\xff\xd8")
+
+        with pytest.raises(PendingSaveError) as exc_info:
+            client.flush()
+
+        assert sorted(exc_info.value.errors) == [1, 2]
+        assert all(e.status_code == 400 for e in exc_info.value.errors.values())
+        assert len(calls) == 2
+        client.flush()
+        client.close()
+
+    def test_close_raises_pending_failures(self) -> None:
+        with pytest.raises(PendingSaveError, match="draft_id: 1"):
+            with self._client(lambda r: httpx.Response(400, json={"error": "x"})) as client:
+                client.analyze(b"\xff\xd8")
+
+
+class TestAnalyzeMany:
+    def test_yields_each_result_and_isolates_failures(self) -> None:
+        lock = threading.Lock()
+        next_draft = iter(range(100, 200))
+        llm_in_flight = 0
+        llm_peak = 0
+
+        def server_handler(request: httpx.Request) -> httpx.Response:
+            path = request.url.path
+            if path == "/api/v1/ai/uploads":
+                if b"BROKEN" in request.content:
+                    return httpx.Response(413, json={"error": "too large"})
+                with lock:
+                    return httpx.Response(201, json={"draft_id": next(next_draft)})
+            if path == "/api/v1/ai/prompt-context":
+                return httpx.Response(200, json=TestAnalyze._PROMPT_CTX)
+            if path.endswith("/suggestions"):
+                return httpx.Response(200, json={"ok": True})
+            return httpx.Response(404)
+
+        def llm_handler(request: httpx.Request) -> httpx.Response:
+            nonlocal llm_in_flight, llm_peak
+            with lock:
+                llm_in_flight += 1
+                llm_peak = max(llm_peak, llm_in_flight)
+            time.sleep(0.01)
+            with lock:
+                llm_in_flight -= 1
+            return llm_reply(request)
+
+        images = [b"IMG%d" % i for i in range(6)]
+        images[2] = b"BROKEN"
+
+        with KakeiboClient(
+            "https://test.example.com", "ik_testkey",
+            openai_api_key="sk-x",
+            http_client=httpx.Client(
+                transport=httpx.MockTransport(server_handler),
+                base_url="https://test.example.com",
+            ),
+            llm_http_client=httpx.Client(transport=httpx.MockTransport(llm_handler)),
+        ) as client:
+            items = list(client.analyze_many(
+                images, concurrency=4, llm_concurrency=2, server_concurrency=2,
+            ))
+
+        assert sorted(item.index for item in items) == list(range(6))
+        failed = [item for item in items if not item.ok]
+        assert [item.index for item in failed] == [2]
+        assert isinstance(failed[0].error, KakeiboAPIError)
+        draft_ids = {item.response.draft_id for item in items if item.ok}
+        assert len(draft_ids) == 5
+        assert llm_peak <= 2
+
+    def test_missing_key_fails_before_any_request(self) -> None:
+        calls: list[httpx.Request] = []
+        http_client = httpx.Client(
+            transport=httpx.MockTransport(lambda r: calls.append(r) or httpx.Response(500)),
+            base_url="https://test.example.com",
+        )
+
+        with KakeiboClient("https://test.example.com", "ik_testkey", http_client=http_client) as client:
+            with pytest.raises(ValueError, match="anthropic_api_key"):
+                next(client.analyze_many([b"a"], provider="anthropic"))
+
+        assert calls == []
+
+
+class TestPreparedImage:
+    def test_image_encoded_once_per_analysis(self, monkeypatch) -> None:
+        encoded: list[bytes] = []
+        real_b64encode = llm.base64.b64encode
+
+        def counting_b64encode(data: bytes) -> bytes:
+            encoded.append(data)
+            return real_b64encode(data)
+
+        monkeypatch.setattr(llm.base64, "b64encode", counting_b64encode)
+        image_urls: list[str] = []
+
+        def llm_handler(request: httpx.Request) -> httpx.Response:
+            content = json.loads(request.content)["messages"][0]["content"]
+            image_urls.append(content[1]["image_url"]["url"])
+            return llm_reply(request)
+
+        def server_handler(request: httpx.Request) -> httpx.Response:
+            path = request.url.path
+            if path == "/api/v1/ai/uploads":
+                return httpx.Response(201, json={"draft_id": 1})
+            if path == "/api/v1/ai/prompt-context":
+                return httpx.Response(200, json=TestAnalyze._PROMPT_CTX)
+            return httpx.Response(200, json={"ok": True})
+
+        with KakeiboClient(
+            "https://test.example.com", "ik_testkey",
+            openai_api_key="sk-x",
+            http_client=httpx.Client(
+                transport=httpx.MockTransport(server_handler),
+                base_url="https://test.example.com",
+            ),
+            llm_http_client=httpx.Client(transport=httpx.MockTransport(llm_handler)),
+        ) as client:
+            client.analyze(b"\xff\xd8\xff\xe0", mime_type="image/png")
+
+        assert encoded == [b"\xff\xd8\xff\xe0"]
+        assert image_urls == ["data:image/png;base64,/9j/4A=="] * 2
+
+    @pytest.mark.parametrize("build", [
+        llm.build_openai_request,
+        llm.build_anthropic_request,
+        llm.build_google_request,
+    ])
+    def test_content_embeds_image(self, build) -> None:
+        image = llm.PreparedImage.from_bytes(b"\x00\x01\x02")
+        req = build(api_key="k", model="m", image_bytes=image,
+                    mime_type="image/jpeg", prompt="領収書 \"x\"")
+
+        body = json.loads(req.content())
+        expected = json.loads(json.dumps(req.body).replace(llm._IMAGE_SLOT, "AAEC"))
+        assert body == expected
+        assert req.image is image
+
+
+class TestPromptContextCache:
+    def _run(self, analyses: int, *, etag: str | None = None, **client_kwargs) -> list[httpx.Request]:
+        calls: list[httpx.Request] = []
+        next_draft = iter(range(1, 100))
+
+        def server_handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            path = request.url.path
+            if path == "/api/v1/ai/uploads":
+                return httpx.Response(201, json={"draft_id": next(next_draft)})
+            if path == "/api/v1/ai/prompt-context":
+                if etag and request.headers.get("If-None-Match") == etag:
+                    return httpx.Response(304)
+                headers = {"ETag": etag} if etag else {}
+                return httpx.Response(200, json=TestAnalyze._PROMPT_CTX, headers=headers)
+            if path.endswith("/suggestions"):
+                return httpx.Response(200, json={"ok": True})
+            return httpx.Response(404)
+
+        with KakeiboClient(
+            "https://test.example.com", "ik_testkey",
+            openai_api_key="sk-x",
+            http_client=httpx.Client(
+                transport=httpx.MockTransport(server_handler),
+                base_url="https://test.example.com",
+            ),
+            llm_http_client=httpx.Client(
+                transport=httpx.MockTransport(llm_reply),
+            ),
+            **client_kwargs,
+        ) as client:
+            for _ in range(analyses):
+                result = client.analyze(b"\xff\xd8")
+                assert result.suggestions[0]["lines"][0]["account_code"] == "5010"
+            self.client = client
+        return [r for r in calls if r.url.path == "/api/v1/ai/prompt-context"]
+
+    def test_second_analyze_uses_cache(self) -> None:
+        ctx_calls = self._run(3)
+
+        assert len(ctx_calls) == 1
+        assert self.client._prompt_cache.stats.hits == 2
+
+    def test_expired_entry_revalidated_with_etag(self) -> None:
+        ctx_calls = self._run(3, etag='"v1"', prompt_context_ttl=0)
+
+        assert len(ctx_calls) == 3
+        assert "If-None-Match" not in ctx_calls[0].headers
+        assert ctx_calls[1].headers["If-None-Match"] == '"v1"'
+        assert self.client._prompt_cache.stats.revalidated == 2
+
+    def test_cache_stats_is_snapshot(self) -> None:
+        self._run(1)
+        stats = self.client.cache_stats()["prompt_context"]
+
+        self.client._prompt_cache.lookup()
+
+        assert (stats.hits, stats.misses) == (0, 1)
+        assert self.client.cache_stats()["prompt_context"].hits == 1
+
+    def test_disabled(self) -> None:
+        ctx_calls = self._run(2, etag='"v1"', prompt_context_ttl=None)
+
+        assert len(ctx_calls) == 2
+        assert all("If-None-Match" not in r.headers for r in ctx_calls)
+
+    def test_invalidate(self) -> None:
+        client = KakeiboClient("https://test.example.com", "ik_testkey")
+        cache = client._prompt_cache
+        cache.store(PromptContext.from_data({"account_list_text": "5010 食費\n\n現金"}))
+
+        assert cache.lookup()[0].account_codes == frozenset({"5010"})
+        client.invalidate_prompt_context()
+        assert cache.lookup() == (None, False)
+        client.close()
+
+
+class TestLedgerCache:
+    def _client(self, ledger_calls: list[dict]) -> KakeiboClient:
+        next_draft = iter(range(1, 100))
+
+        def server_handler(request: httpx.Request) -> httpx.Response:
+            path = request.url.path
+            if path == "/api/v1/ai/uploads":
+                return httpx.Response(201, json={"draft_id": next(next_draft)})
+            if path == "/api/v1/ai/prompt-context":
+                return httpx.Response(200, json=TestAnalyze._PROMPT_CTX)
+            if path == "/api/v1/ai/ledger-context":
+                ledger_calls.append(json.loads(request.content))
+                return httpx.Response(200, json={"ledger_text": f"LEDGER{len(ledger_calls)}"})
+            if path.endswith("/suggestions"):
+                return httpx.Response(200, json={"ok": True})
+            if path == "/api/v1/journals":
+                return httpx.Response(201, json={"ok": True, "id": 1, "entry_number": 1})
+            if request.method == "DELETE":
+                return httpx.Response(200, json={"ok": True})
+            return httpx.Response(404)
+
+        self.round2_prompts: list[str] = []
+
+        def llm_handler(request: httpx.Request) -> httpx.Response:
+            prompt = json.loads(request.content)["messages"][0]["content"][0]["text"]
+            if prompt.startswith("DOC_PROMPT"):
+                content = {"needs_ledger": True, "requested_accounts": [" 食費", "食費"]}
+                return httpx.Response(200, json={
+                    "choices": [{"message": {"content": json.dumps(content)}}],
+                })
+            self.round2_prompts.append(prompt)
+            return llm_reply(request)
+
+        return KakeiboClient(
+            "https://test.example.com", "ik_testkey",
+            openai_api_key="sk-x",
+            http_client=httpx.Client(
+                transport=httpx.MockTransport(server_handler),
+                base_url="https://test.example.com",
+            ),
+            llm_http_client=httpx.Client(transport=httpx.MockTransport(llm_handler)),
+        )
+
+    def test_repeat_accounts_hit_cache(self) -> None:
+        ledger_calls: list[dict] = []
+
+        with self._client(ledger_calls) as client:
+            for _ in range(3):
+                client.analyze(b"\xff\xd8")
+            stats = client.cache_stats()["ledger"]
+
+        assert len(ledger_calls) == 1
+        assert all("LEDGER1" in p for p in self.round2_prompts)
+        assert (stats.hits, stats.misses) == (2, 1)
+
+    def test_create_journal_on_cached_account_invalidates(self) -> None:
+        ledger_calls: list[dict] = []
+
+        with self._client(ledger_calls) as client:
+            client.analyze(b"\xff\xd8")
+            # 食費 (5010) に触れない仕訳ではキャッシュは残る
+            client.create_journal(
+                date="2026-02-15", description="x",
+                lines=[JournalLine(account_code="7010", debit=1), JournalLine(account_code="1020", credit=1)],
+            )
+            client.analyze(b"\xff\xd8")
+            client.create_journal(
+                date="2026-02-15", description="x",
+                lines=[JournalLine(account_code="5010", debit=1), JournalLine(account_code="1010", credit=1)],
+            )
+            client.analyze(b"\xff\xd8")
+
+        assert len(ledger_calls) == 2
+        assert "LEDGER2" in self.round2_prompts[2]
+
+    def test_delete_journal_invalidates_all(self) -> None:
+        ledger_calls: list[dict] = []
+
+        with self._client(ledger_calls) as client:
+            client.analyze(b"\xff\xd8")
+            client.delete_journal(1)
+            client.analyze(b"\xff\xd8")
+
+        assert len(ledger_calls) == 2
+
+    def test_disabled(self) -> None:
+        client = KakeiboClient("https://test.example.com", "ik_testkey", ledger_cache_ttl=None)
+
+        assert "ledger" not in client.cache_stats()
+        client.close()
+
+
+class TestLLMConnectionPool:
+    def test_one_pooled_client_per_provider(self) -> None:
+        limits = httpx.Limits(max_connections=3, max_keepalive_connections=2)
+        client = KakeiboClient("https://test.example.com", "ik_testkey", llm_pool_limits=limits)
+
+        openai_client = client._llm_client("openai")
+        assert client._llm_client("openai") is openai_client
+        assert client._llm_client("google") is not openai_client
+        assert openai_client._transport._pool._max_connections == 3
+
+        client.close()
+
+        assert openai_client.is_closed
+        assert client._llm_clients == {}
+
+    def test_injected_client_is_used_and_not_closed(self) -> None:
+        injected = httpx.Client()
+        client = KakeiboClient("https://test.example.com", "ik_testkey", llm_http_client=injected)
+
+        assert client._llm_client("anthropic") is injected
+        client.close()
+
+        assert not injected.is_closed
+        injected.close()
+
+
 class TestListDrafts:
     def test_success(self) -> None:
         body = {"ok": True, "drafts": [SAMPLE_DRAFT], "total": 1, "page": 1, "per_page": 50}
@@ -859,3 +1821,54 @@ class TestDeleteDraft:
             client.delete_draft(999)
 
         assert exc_info.value.status_code == 404
+
+
+class TestIterDrafts:
+    def test_yields_all_pages(self) -> None:
+        seen: list[dict] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            params = dict(request.url.params)
+            seen.append(params)
+            page = int(params["page"])
+            drafts = [{**SAMPLE_DRAFT, "id": page * 1000 + i} for i in range(100 if page == 1 else 5)]
+            return httpx.Response(200, json={
+                "ok": True, "drafts": drafts, "total": 105, "page": page, "per_page": 100,
+            })
+
+        http_client = httpx.Client(
+            transport=httpx.MockTransport(handler),
+            base_url="https://test.example.com",
+        )
+
+        with KakeiboClient("https://test.example.com", "ik_testkey", http_client=http_client) as client:
+            items = list(client.iter_drafts(status="all"))
+
+        assert len(items) == 105
+        assert all(isinstance(d, DraftListItem) for d in items)
+        assert [p["page"] for p in seen] == ["1", "2"]
+        assert seen[0]["status"] == "all"
+
+
+class TestDeleteDrafts:
+    def test_not_found_counts_as_ok(self) -> None:
+        methods: list[str] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            methods.append(request.method)
+            if request.url.path.endswith("/11"):
+                return httpx.Response(404, json={"error": "下書きが見つかりません。"})
+            return httpx.Response(200, json={"ok": True})
+
+        http_client = httpx.Client(
+            transport=httpx.MockTransport(handler),
+            base_url="https://test.example.com",
+        )
+
+        with KakeiboClient("https://test.example.com", "ik_testkey", http_client=http_client) as client:
+            result = client.delete_drafts([10, 11, 12])
+
+        assert methods == ["DELETE"] * 3
+        assert result.deleted == [10, 12]
+        assert result.not_found == [11]
+        assert result.ok
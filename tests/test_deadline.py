@@ -0,0 +1,192 @@
+"""analyze() の時間予算 (timeout_budget) のテスト"""
+
+import asyncio
+import base64
+import time
+
+import httpx
+import pytest
+
+from iikanji import (
+    DeadlineExceededError,
+    KakeiboAPIError,
+    RateLimiter,
+)
+
+from .fakes import analyze_server, llm_reply, make_async_client, make_client
+
+
+class TestTimeoutBudget:
+    def test_call_timeouts_capped_to_remaining_budget(self) -> None:
+        timeouts: dict[str, float] = {}
+
+        def server_handler(request: httpx.Request) -> httpx.Response:
+            timeouts[request.url.path] = request.extensions["timeout"]["read"]
+            return analyze_server(request)
+
+        def llm_handler(request: httpx.Request) -> httpx.Response:
+            timeouts.setdefault("llm", request.extensions["timeout"]["read"])
+            return llm_reply(request)
+
+        with make_client(server_handler, llm_handler) as client:
+            client.analyze(b"\xff\xd8", timeout_budget=5)
+
+        assert set(timeouts) == {
+            "/api/v1/ai/uploads", "/api/v1/ai/prompt-context",
+            "/api/v1/ai/drafts/1/suggestions", "llm",
+        }
+        assert all(0 < t <= 5 for t in timeouts.values())
+
+    def test_without_budget_uses_default_timeouts(self) -> None:
+        timeouts: list[float] = []
+
+        def llm_handler(request: httpx.Request) -> httpx.Response:
+            timeouts.append(request.extensions["timeout"]["read"])
+            return llm_reply(request)
+
+        with make_client(analyze_server, llm_handler) as client:
+            client.analyze(b"\xff\xd8")
+
+        assert timeouts == [60.0, 60.0]
+
+    def test_timeout_reports_phase(self) -> None:
+        def llm_handler(request: httpx.Request) -> httpx.Response:
+            time.sleep(request.extensions["timeout"]["read"])
+            raise httpx.ReadTimeout("timed out", request=request)
+
+        with make_client(analyze_server, llm_handler) as client:
+            with pytest.raises(DeadlineExceededError) as exc_info:
+                client.analyze(b"\xff\xd8", timeout_budget=0.2)
+
+        assert exc_info.value.phase == "round1"
+        assert exc_info.value.budget == 0.2
+        assert isinstance(exc_info.value, TimeoutError)
+        assert isinstance(exc_info.value.__cause__, httpx.ReadTimeout)
+
+    def test_budget_spent_before_next_phase(self) -> None:
+        def llm_handler(request: httpx.Request) -> httpx.Response:
+            time.sleep(0.15)
+            return llm_reply(request)
+
+        saved: list[str] = []
+
+        def server_handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path.endswith("/suggestions"):
+                saved.append(request.url.path)
+            return analyze_server(request)
+
+        with make_client(server_handler, llm_handler) as client:
+            with pytest.raises(DeadlineExceededError) as exc_info:
+                client.analyze(b"\xff\xd8", timeout_budget=0.1)
+
+        assert exc_info.value.phase == "round2"
+        assert saved == []
+
+    def test_retry_skipped_when_wait_exceeds_budget(self) -> None:
+        def server_handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path == "/api/v1/ai/prompt-context":
+                return httpx.Response(
+                    503, headers={"Retry-After": "5"}, json={"error": "busy"},
+                )
+            return analyze_server(request)
+
+        with make_client(server_handler, llm_reply) as client:
+            with pytest.raises(KakeiboAPIError) as exc_info:
+                client.analyze(b"\xff\xd8", timeout_budget=2)
+            stats = client.retry_stats()["server"]
+
+        assert exc_info.value.status_code == 503
+        assert (stats.retries, stats.gave_up, stats.backoff_seconds) == (0, 1, 0)
+
+    def test_analyze_many_budget_per_image(self) -> None:
+        def llm_handler(request: httpx.Request) -> httpx.Response:
+            if base64.b64encode(b"\xff\xd8 SLOW") in request.content:
+                time.sleep(0.2)
+            return llm_reply(request)
+
+        with make_client(analyze_server, llm_handler) as client:
+            items = sorted(
+                client.analyze_many(
+                    [b"\xff\xd8 fast", b"\xff\xd8 SLOW"], timeout_budget=0.1,
+                ),
+                key=lambda item: item.index,
+            )
+
+        assert items[0].error is None
+        assert isinstance(items[1].error, DeadlineExceededError)
+
+    def test_server_rate_limit_wait_beyond_budget_fails_fast(self) -> None:
+        limiter = RateLimiter(requests_per_minute=6)  # 10 秒に 1 件
+        limiter.acquire()
+
+        with make_client(analyze_server, llm_reply, server_rate_limit=limiter) as client:
+            with pytest.raises(DeadlineExceededError) as exc_info:
+                client.analyze(b"\xff\xd8", timeout_budget=1.0)
+
+        assert exc_info.value.phase in {"upload", "prompt_context"}
+        # 待たずに、予約もせずに打ち切る
+        assert (limiter.stats().acquired, limiter.stats().throttled) == (1, 0)
+
+    def test_llm_rate_limit_wait_beyond_budget_fails_fast(self) -> None:
+        limiter = RateLimiter(requests_per_minute=6)
+        limiter.acquire()
+
+        with make_client(analyze_server, llm_reply, llm_rate_limits={"openai": limiter}) as client:
+            with pytest.raises(DeadlineExceededError) as exc_info:
+                client.analyze(b"\xff\xd8", timeout_budget=1.0)
+
+        assert exc_info.value.phase == "round1"
+        assert (limiter.stats().acquired, limiter.stats().throttled) == (1, 0)
+
+    def test_analyze_many_gate_wait_counts_against_budget(self) -> None:
+        def llm_handler(request: httpx.Request) -> httpx.Response:
+            time.sleep(0.5)
+            return llm_reply(request)
+
+        with make_client(analyze_server, llm_handler) as client:
+            first = next(iter(client.analyze_many(
+                [b"\xff\xd8 a", b"\xff\xd8 b"],
+                concurrency=2, llm_concurrency=1, timeout_budget=0.2,
+            )))
+
+        # LLM の枠を待つ側が、枠を持つ側の完了 (0.5 秒後) より先に打ち切られる
+        assert isinstance(first.error, DeadlineExceededError)
+        assert first.error.phase == "round1"
+        assert first.error.__cause__ is None
+
+    def test_rejects_non_positive_budget(self) -> None:
+        with make_client(analyze_server, llm_reply) as client:
+            with pytest.raises(ValueError, match="timeout_budget"):
+                client.analyze(b"\xff\xd8", timeout_budget=0)
+
+
+class TestAsyncTimeoutBudget:
+    def test_timeout_reports_phase(self) -> None:
+        async def llm_handler(request: httpx.Request) -> httpx.Response:
+            await asyncio.sleep(0.15)
+            return llm_reply(request)
+
+        async def main() -> None:
+            async with make_async_client(analyze_server, llm_handler) as client:
+                await client.analyze(b"\xff\xd8", timeout_budget=0.1)
+
+        with pytest.raises(DeadlineExceededError) as exc_info:
+            asyncio.run(main())
+
+        assert exc_info.value.phase == "round2"
+
+    def test_rate_limit_wait_beyond_budget_fails_fast(self) -> None:
+        limiter = RateLimiter(requests_per_minute=6)
+        limiter.acquire()
+
+        async def main() -> None:
+            async with make_async_client(
+                analyze_server, llm_reply, llm_rate_limits={"openai": limiter},
+            ) as client:
+                await client.analyze(b"\xff\xd8", timeout_budget=1.0)
+
+        with pytest.raises(DeadlineExceededError) as exc_info:
+            asyncio.run(main())
+
+        assert exc_info.value.phase == "round1"
+        assert (limiter.stats().acquired, limiter.stats().throttled) == (1, 0)
@@ -0,0 +1,200 @@
+"""画像前処理のユニットテスト"""
+
+import asyncio
+import io
+import json
+
+import httpx
+import pytest
+
+from iikanji import AsyncKakeiboClient, ImageOptions, KakeiboClient
+from iikanji.image import preprocess_image
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _jpeg(size: tuple[int, int], *, orientation: int | None = None) -> bytes:
+    # 圧縮が効きにくいようノイズ画像にする
+    img = Image.effect_noise(size, 64).convert("RGB")
+    out = io.BytesIO()
+    exif = Image.Exif()
+    if orientation is not None:
+        exif[0x0112] = orientation
+    img.save(out, format="JPEG", quality=95, exif=exif)
+    return out.getvalue()
+
+
+def _open(data: bytes) -> "Image.Image":
+    return Image.open(io.BytesIO(data))
+
+
+class TestPreprocessImage:
+    def test_downscales_to_max_dimension(self) -> None:
+        original = _jpeg((1600, 1200))
+
+        result = preprocess_image(original, "image/jpeg", ImageOptions(max_dimension=800))
+
+        assert _open(result.data).size == (800, 600)
+        assert result.mime_type == "image/jpeg"
+        assert result.original_size == len(original)
+        assert result.bytes_saved == len(original) - len(result.data) > 0
+
+    def test_applies_exif_orientation(self) -> None:
+        original = _jpeg((300, 100), orientation=6)
+
+        result = preprocess_image(original, "image/jpeg", ImageOptions())
+
+        img = _open(result.data)
+        assert img.size == (100, 300)
+        assert img.getexif().get(0x0112) is None
+
+    def test_transparent_png_to_jpeg_and_webp(self) -> None:
+        img = Image.new("RGBA", (3000, 100), (255, 0, 0, 0))
+        out = io.BytesIO()
+        img.save(out, format="PNG")
+
+        jpeg = preprocess_image(out.getvalue(), "image/png", ImageOptions(max_dimension=1500))
+        webp = preprocess_image(
+            out.getvalue(), "image/png", ImageOptions(max_dimension=1500, format="WEBP"),
+        )
+
+        assert _open(jpeg.data).mode == "RGB"
+        assert (jpeg.mime_type, jpeg.extension) == ("image/jpeg", ".jpg")
+        assert _open(webp.data).mode == "RGBA"
+        assert (webp.mime_type, webp.extension) == ("image/webp", ".webp")
+
+    def test_small_image_kept_when_recompression_does_not_help(self) -> None:
+        original = _jpeg((200, 100))
+
+        result = preprocess_image(original, "image/jpeg", ImageOptions(quality=100))
+
+        assert result.data is original
+        assert result.bytes_saved == 0
+
+    def test_unreadable_data_passed_through(self) -> None:
+        result = preprocess_image(b"%PDF-1.4", "application/pdf", ImageOptions())
+
+        assert result.data == b"%PDF-1.4"
+        assert result.mime_type == "application/pdf"
+        assert result.extension is None
+
+    @pytest.mark.parametrize("kwargs", [
+        {"format": "GIF"}, {"quality": 0}, {"max_dimension": 0},
+    ])
+    def test_invalid_options(self, kwargs: dict) -> None:
+        with pytest.raises(ValueError):
+            ImageOptions(**kwargs)
+
+
+class TestAnalyzeWithImageOptions:
+    _OPTIONS = ImageOptions(max_dimension=400, format="WEBP")
+
+    @staticmethod
+    def _handlers(uploads: list[httpx.Request], llm_bodies: list[dict]):
+        next_draft = iter(range(1, 100))
+
+        def server_handler(request: httpx.Request) -> httpx.Response:
+            path = request.url.path
+            if path == "/api/v1/ai/uploads":
+                uploads.append(request)
+                return httpx.Response(201, json={"draft_id": next(next_draft)})
+            if path == "/api/v1/ai/prompt-context":
+                return httpx.Response(200, json={
+                    "round1_prompt": "DOC_PROMPT",
+                    "round2_prompt_template_no_ledger": "R2 __ACCOUNT_LIST_TEXT__",
+                    "account_list_text": "5010 食費\n1010 現金",
+                    "default_model_by_provider": {"openai": "gpt-4o"},
+                })
+            return httpx.Response(200, json={"ok": True})
+
+        def llm_handler(request: httpx.Request) -> httpx.Response:
+            body = json.loads(request.content)
+            llm_bodies.append(body)
+            prompt = body["messages"][0]["content"][0]["text"]
+            content = {"needs_ledger": False} if prompt == "DOC_PROMPT" else {
+                "suggestions": [{"lines": [
+                    {"account_code": "5010", "debit_amount": 1, "credit_amount": 0},
+                ]}],
+            }
+            return httpx.Response(200, json={
+                "choices": [{"message": {"content": json.dumps(content)}}],
+            })
+
+        return server_handler, llm_handler
+
+    def _client(self, uploads: list[httpx.Request], llm_bodies: list[dict]) -> KakeiboClient:
+        server_handler, llm_handler = self._handlers(uploads, llm_bodies)
+        return KakeiboClient(
+            "https://test.example.com", "ik_testkey",
+            openai_api_key="sk-x",
+            http_client=httpx.Client(
+                transport=httpx.MockTransport(server_handler),
+                base_url="https://test.example.com",
+            ),
+            llm_http_client=httpx.Client(transport=httpx.MockTransport(llm_handler)),
+            image_options=self._OPTIONS,
+        )
+
+    def test_upload_and_llm_use_processed_image(self, tmp_path) -> None:
+        path = tmp_path / "scan.JPG"
+        path.write_bytes(_jpeg((1200, 900)))
+        uploads: list[httpx.Request] = []
+        llm_bodies: list[dict] = []
+
+        with self._client(uploads, llm_bodies) as client:
+            result = client.analyze(path)
+
+        assert result.bytes_saved > 0
+        upload = uploads[0].content
+        assert b'filename="scan.webp"' in upload
+        assert b"Content-Type: image/webp" in upload
+        url = llm_bodies[0]["messages"][0]["content"][1]["image_url"]["url"]
+        assert url.startswith("data:image/webp;base64,")
+
+    def test_pdf_upload_keeps_filename_and_mime_type(self, tmp_path) -> None:
+        path = tmp_path / "receipt.pdf"
+        path.write_bytes(b"%PDF-1.4 receipt")
+        uploads: list[httpx.Request] = []
+
+        with self._client(uploads, []) as client:
+            result = client.analyze(path, mime_type="application/pdf")
+
+        assert result.bytes_saved == 0
+        upload = uploads[0].content
+        assert b'filename="receipt.pdf"' in upload
+        assert b"Content-Type: application/pdf" in upload
+        assert b"%PDF-1.4 receipt" in upload
+
+    def test_analyze_many_on_process_pool(self) -> None:
+        uploads: list[httpx.Request] = []
+
+        with self._client(uploads, []) as client:
+            items = list(client.analyze_many(
+                [_jpeg((1000, 500)), _jpeg((500, 1000))], preprocess_workers=2,
+            ))
+
+        assert all(item.ok and item.response.bytes_saved > 0 for item in items)
+        assert all(b"image/webp" in r.content for r in uploads)
+
+    def test_async_analyze(self) -> None:
+        uploads: list[httpx.Request] = []
+        server_handler, llm_handler = self._handlers(uploads, [])
+
+        async def main() -> int:
+            async with AsyncKakeiboClient(
+                "https://test.example.com", "ik_testkey",
+                openai_api_key="sk-x",
+                http_client=httpx.AsyncClient(
+                    transport=httpx.MockTransport(server_handler),
+                    base_url="https://test.example.com",
+                ),
+                llm_http_client=httpx.AsyncClient(
+                    transport=httpx.MockTransport(llm_handler),
+                ),
+                image_options=self._OPTIONS,
+            ) as client:
+                result = await client.analyze(_jpeg((800, 800)))
+            return result.bytes_saved
+
+        assert asyncio.run(main()) > 0
+        assert b'filename="image.webp"' in uploads[0].content
@@ -0,0 +1,136 @@
+"""メトリクス (InMemoryMetrics / metrics=) のテスト"""
+
+import asyncio
+import math
+
+import httpx
+import pytest
+
+from iikanji import (
+    InMemoryMetrics,
+    JournalLine,
+    RetryPolicy,
+)
+
+from .fakes import Backend, make_client
+
+
+class TestInMemoryMetrics:
+    def test_histogram_and_counters(self) -> None:
+        metrics = InMemoryMetrics(buckets=(0.1, 1.0))
+        for seconds in (0.05, 0.1, 0.5, 3.0):
+            metrics.observe(
+                "server", "GET /api/v1/journals", status="200",
+                seconds=seconds, request_bytes=10, response_bytes=100,
+            )
+        metrics.observe(
+            "server", "GET /api/v1/journals", status="503", seconds=0.2,
+        )
+
+        stats = metrics.snapshot()["server:GET /api/v1/journals"]
+        assert stats.bucket_counts == [2, 2, 1]
+        assert stats.count == 5
+        assert stats.sum_seconds == pytest.approx(3.85)
+        assert stats.statuses == {"200": 4, "503": 1}
+        assert (stats.request_bytes, stats.response_bytes) == (40, 400)
+
+    def test_quantile_interpolates_within_bucket(self) -> None:
+        metrics = InMemoryMetrics(buckets=(1.0, 2.0))
+        for _ in range(10):
+            metrics.observe("llm", "openai", status="200", seconds=1.5)
+
+        stats = metrics.snapshot()["llm:openai"]
+        assert stats.quantile(0.5) == pytest.approx(1.5)
+        assert stats.quantile(0.99) == pytest.approx(1.99)
+
+        metrics.observe("llm", "google", status="200", seconds=9.0)
+        assert metrics.snapshot()["llm:google"].quantile(0.99) == 2.0
+        metrics.reset()
+        assert metrics.snapshot() == {}
+
+    def test_quantile_of_empty_is_nan(self) -> None:
+        metrics = InMemoryMetrics()
+        metrics.observe("llm", "openai", status="200", seconds=0.1)
+        stats = metrics.snapshot()["llm:openai"]
+        stats.count = 0
+        assert math.isnan(stats.quantile(0.5))
+        with pytest.raises(ValueError):
+            stats.quantile(1.5)
+
+    def test_rejects_unsorted_buckets(self) -> None:
+        with pytest.raises(ValueError):
+            InMemoryMetrics(buckets=(1.0, 0.5))
+
+    def test_render_prometheus(self) -> None:
+        metrics = InMemoryMetrics(buckets=(0.5,))
+        metrics.observe(
+            "server", 'POST /api/v1/"x"', status="201", seconds=0.2,
+            request_bytes=7, response_bytes=3,
+        )
+        metrics.observe("server", 'POST /api/v1/"x"', status="201", seconds=2)
+
+        text = metrics.render_prometheus()
+        labels = 'kind="server",endpoint="POST /api/v1/\\"x\\""'
+        assert "# TYPE iikanji_request_duration_seconds histogram" in text
+        assert f'iikanji_request_duration_seconds_bucket{{{labels},le="0.5"}} 1\n' in text
+        assert f'iikanji_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2\n' in text
+        assert f"iikanji_request_duration_seconds_count{{{labels}}} 2\n" in text
+        assert f'iikanji_requests_total{{{labels},status="201"}} 2\n' in text
+        assert f"iikanji_request_bytes_total{{{labels}}} 7\n" in text
+        assert f"iikanji_response_bytes_total{{{labels}}} 3\n" in text
+
+
+class TestClientMetrics:
+    def test_analyze_records_each_endpoint(self) -> None:
+        backend = Backend()
+        backend.fail_save = 1
+        metrics = InMemoryMetrics()
+        with backend.client(
+            retry_policy=RetryPolicy(backoff=0, jitter=False), metrics=metrics,
+        ) as client:
+            client.analyze(b"\xff\xd8")
+
+        stats = metrics.snapshot()
+        assert sorted(stats) == [
+            "llm:openai",
+            "server:GET /api/v1/ai/prompt-context",
+            "server:PATCH /api/v1/ai/drafts/{id}/suggestions",
+            "server:POST /api/v1/ai/uploads",
+        ]
+        # リトライは試行ごとに記録する
+        save = stats["server:PATCH /api/v1/ai/drafts/{id}/suggestions"]
+        assert save.statuses == {"500": 1, "200": 1}
+        upload = stats["server:POST /api/v1/ai/uploads"]
+        assert upload.request_bytes > 0
+        assert upload.response_bytes == len(b'{"draft_id":7}')
+        llm_stats = stats["llm:openai"]
+        assert llm_stats.statuses == {"200": 2}
+        assert llm_stats.request_bytes > 0
+
+    def test_transport_errors_are_counted(self) -> None:
+        def handler(request: httpx.Request) -> httpx.Response:
+            raise httpx.ConnectError("refused")
+
+        metrics = InMemoryMetrics()
+        client = make_client(handler, retry_policy=None, metrics=metrics)
+        with pytest.raises(httpx.ConnectError):
+            client.create_journal(
+                date="2026-02-15", description="x",
+                lines=[JournalLine("7010", debit=1), JournalLine("1010", credit=1)],
+            )
+
+        stats = metrics.snapshot()["server:POST /api/v1/journals"]
+        assert stats.statuses == {"error": 1}
+
+    def test_async_client_records_metrics(self) -> None:
+        backend = Backend()
+        metrics = InMemoryMetrics()
+
+        async def run() -> None:
+            async with backend.async_client(metrics=metrics) as client:
+                await client.analyze(b"\xff\xd8")
+
+        asyncio.run(run())
+        stats = metrics.snapshot()
+        assert stats["llm:openai"].count == 2
+        assert stats["server:POST /api/v1/ai/uploads"].statuses == {"201": 1}
@@ -0,0 +1,224 @@
+"""レートリミッタのユニットテスト"""
+
+import asyncio
+import json
+import threading
+
+import httpx
+import pytest
+
+from iikanji import RateLimiter, ratelimit
+from iikanji.ratelimit import estimate_tokens
+
+from .fakes import (
+    analyze_server,
+    llm_reply,
+    make_async_client,
+    make_client,
+    sample_journal,
+)
+
+
+class _FakeClock:
+    """ratelimit モジュールの time の代わり。sleep は待たずに記録する。
+
+    advance=True なら sleep した分だけ monotonic() を進める。
+    """
+
+    def __init__(self, *, advance: bool = True) -> None:
+        self.now = 1000.0
+        self.advance = advance
+        self.sleeps: list[float] = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        if self.advance:
+            self.now += seconds
+
+
+def _fake_clock(monkeypatch, *, advance: bool = True) -> _FakeClock:
+    clock = _FakeClock(advance=advance)
+    monkeypatch.setattr(ratelimit, "time", clock)
+    return clock
+
+
+class TestRateLimiter:
+    def test_requests_are_spaced(self, monkeypatch) -> None:
+        clock = _fake_clock(monkeypatch)
+        limiter = RateLimiter(requests_per_minute=1200, burst_seconds=0.01)  # 50ms 間隔
+
+        for _ in range(4):
+            limiter.acquire()
+
+        # 1 件目はバケツの残量で即通過、残り 3 件が 50ms ずつ待つ
+        assert clock.sleeps == pytest.approx([0.05, 0.05, 0.05])
+        stats = limiter.stats()
+        assert (stats.acquired, stats.throttled) == (4, 3)
+        assert stats.wait_seconds == pytest.approx(0.15)
+
+    def test_burst_passes_without_waiting(self) -> None:
+        limiter = RateLimiter(requests_per_minute=600)  # 1 秒分 = 10 件
+
+        for _ in range(10):
+            limiter.acquire()
+        assert limiter.stats().throttled == 0
+
+        limiter.acquire()
+        assert limiter.stats().throttled == 1
+
+    def test_tokens_reserved_and_reconciled(self, monkeypatch) -> None:
+        clock = _fake_clock(monkeypatch)
+        limiter = RateLimiter(tokens_per_minute=6000)  # 100 tokens/s, 容量 6000
+
+        limiter.acquire(6000)
+        limiter.reconcile(6000, 0)  # 実際は消費しなかった → 全額返却
+        limiter.acquire(6000)
+
+        assert clock.sleeps == []
+        assert limiter.stats().throttled == 0
+
+    @pytest.mark.parametrize("tokens_per_minute", [30_000, 200_000])
+    def test_idle_limiter_admits_one_analyze_call(
+        self, tokens_per_minute: int, monkeypatch,
+    ) -> None:
+        clock = _fake_clock(monkeypatch)
+        limiter = RateLimiter(tokens_per_minute=tokens_per_minute)
+        # 勘定科目一覧と元帳を含む Round 2 のプロンプト相当 (約 1 万トークン)
+        tokens = estimate_tokens({"prompt": "あ" * 6000, "max_tokens": 2000})
+
+        limiter.acquire(tokens)
+
+        assert clock.sleeps == []
+        assert limiter.stats().throttled == 0
+
+    def test_call_larger_than_window_waits_only_for_full_bucket(self) -> None:
+        limiter = RateLimiter(tokens_per_minute=600)  # 10 tokens/s
+
+        limiter.acquire(1000)  # 空いていれば 1 分分を超えても通す
+        assert limiter.stats().throttled == 0
+
+        async def next_call() -> None:
+            waiting = asyncio.ensure_future(limiter.aacquire(1))
+            await asyncio.sleep(0.01)
+            waiting.cancel()
+
+        asyncio.run(next_call())
+        # 超過分 (400 トークン) の負債は後続が待つ
+        assert limiter.stats().wait_seconds == pytest.approx(40, abs=0.5)
+
+    def test_threads_share_limit(self, monkeypatch) -> None:
+        # 時刻を止めておけば、どの順に予約しても待ち時間は 20ms ずつ伸びる
+        clock = _fake_clock(monkeypatch, advance=False)
+        limiter = RateLimiter(requests_per_minute=3000, burst_seconds=0.01)  # 20ms 間隔
+
+        threads = [threading.Thread(target=limiter.acquire) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert sorted(clock.sleeps) == pytest.approx([0.02, 0.04, 0.06, 0.08, 0.10])
+
+    def test_async_cancel_gives_back_reservation(self, monkeypatch) -> None:
+        clock = _fake_clock(monkeypatch)
+        limiter = RateLimiter(requests_per_minute=60)  # 1 req/s
+
+        async def main() -> None:
+            await limiter.aacquire()
+            waiting = asyncio.ensure_future(limiter.aacquire())
+            await asyncio.sleep(0.01)
+            waiting.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiting
+
+        asyncio.run(main())
+        # 返却されたので次の待ちは 1 秒 (取消分を含む 2 秒ではない)
+        assert limiter.acquire(timeout=1.0)
+        assert clock.sleeps == [1.0]
+
+    @pytest.mark.parametrize("kwargs", [
+        {"requests_per_minute": 0},
+        {"tokens_per_minute": -1},
+        {"requests_per_minute": 10, "burst_seconds": 0},
+    ])
+    def test_rejects_invalid_limits(self, kwargs: dict) -> None:
+        with pytest.raises(ValueError):
+            RateLimiter(**kwargs)
+
+    def test_estimate_tokens(self) -> None:
+        assert estimate_tokens({"prompt": "あ" * 100, "max_tokens": 500}) == 2200
+
+
+def _server_handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path.startswith("/api/v1/journals/"):
+        return httpx.Response(200, json={"ok": True, "journal": sample_journal(id=1)})
+    return analyze_server(request)
+
+
+class TestClientRateLimits:
+    def test_server_limit_shared_between_clients(self) -> None:
+        limiter = RateLimiter(requests_per_minute=1200, burst_seconds=0.01)
+
+        with make_client(_server_handler, server_rate_limit=limiter) as a, \
+                make_client(_server_handler, server_rate_limit=limiter) as b:
+            for _ in range(2):
+                a.get_journal(1)
+                b.get_journal(1)
+
+        stats = limiter.stats()
+        assert (stats.acquired, stats.throttled) == (4, 3)
+
+    def test_llm_limit_per_provider_with_usage_reconciled(self) -> None:
+        openai_limit = RateLimiter(requests_per_minute=6000, tokens_per_minute=10**7)
+        anthropic_limit = RateLimiter(requests_per_minute=1)
+        reconciled: list[tuple[int, int]] = []
+        original = openai_limit.reconcile
+
+        def spy(estimated: int, actual: int) -> None:
+            reconciled.append((estimated, actual))
+            original(estimated, actual)
+
+        openai_limit.reconcile = spy  # type: ignore[method-assign]
+
+        def llm_handler(request: httpx.Request) -> httpx.Response:
+            resp = llm_reply(request)
+            body = json.loads(resp.content)
+            body["usage"] = {"prompt_tokens": 120, "completion_tokens": 30}
+            return httpx.Response(200, json=body)
+
+        with make_client(
+            _server_handler, llm_handler,
+            llm_rate_limits={"openai": openai_limit, "anthropic": anthropic_limit},
+        ) as client:
+            client.analyze(b"\xff\xd8")
+
+        assert openai_limit.stats().acquired == 2
+        assert anthropic_limit.stats().acquired == 0
+        assert [actual for _, actual in reconciled] == [150, 150]
+        assert all(estimated > 150 for estimated, _ in reconciled)
+
+    def test_unknown_provider_rejected(self) -> None:
+        with pytest.raises(ValueError, match="unsupported provider"):
+            make_client(
+                _server_handler,
+                llm_rate_limits={"mistral": RateLimiter(requests_per_minute=1)},
+            )
+
+    def test_async_client_awaits_limit(self, monkeypatch) -> None:
+        _fake_clock(monkeypatch, advance=False)
+        limiter = RateLimiter(requests_per_minute=1200, burst_seconds=0.01)
+
+        async def main() -> None:
+            async with make_async_client(
+                _server_handler, server_rate_limit=limiter,
+            ) as client:
+                await asyncio.gather(*(client.get_journal(1) for _ in range(3)))
+
+        asyncio.run(main())
+
+        stats = limiter.stats()
+        assert (stats.acquired, stats.throttled) == (3, 2)
+        assert stats.wait_seconds == pytest.approx(0.15)
@@ -0,0 +1,119 @@
+"""チェックポイントからの analyze() 再開 (resume_analyze) のテスト"""
+
+import asyncio
+import json
+
+import pytest
+
+from iikanji import (
+    AnalyzeCheckpoint,
+    KakeiboAPIError,
+    LLMAPIError,
+)
+
+from .fakes import Backend
+
+
+class TestResumeAnalyze:
+    def test_resume_after_round2_failure(self) -> None:
+        backend = Backend(needs_ledger=True)
+        backend.fail_round2 = 1
+        checkpoint = backend.failed_analyze(LLMAPIError)
+
+        assert checkpoint.next_phase == "round2"
+        assert checkpoint.draft_id == 7
+        assert checkpoint.analysis is not None
+        assert checkpoint.ledger_text == "LEDGER"
+        assert checkpoint.model == "gpt-4o"
+
+        backend.calls.clear()
+        with backend.client() as client:
+            result = client.resume_analyze(checkpoint, b"\xff\xd8")
+
+        # アップロード・Round 1・元帳取得は繰り返さない
+        assert backend.calls == ["prompt-context", "round2", "suggestions"]
+        assert result.draft_id == 7
+        assert result.suggestions
+        assert checkpoint.next_phase == "done"
+
+    def test_resume_after_save_failure_needs_no_image(self) -> None:
+        backend = Backend()
+        backend.fail_save = 1
+        checkpoint = backend.failed_analyze(KakeiboAPIError)
+
+        assert checkpoint.next_phase == "save"
+
+        backend.calls.clear()
+        with backend.client() as client:
+            result = client.resume_analyze(checkpoint)
+
+        assert backend.calls == ["suggestions"]
+        assert result.suggestions == checkpoint.suggestions
+
+    def test_prompt_context_change_discards_llm_results(self) -> None:
+        backend = Backend()
+        backend.fail_round2 = 1
+        checkpoint = backend.failed_analyze(LLMAPIError)
+
+        backend.etag = '"v2"'
+        backend.calls.clear()
+        with backend.client() as client:
+            client.resume_analyze(checkpoint, b"\xff\xd8")
+
+        assert backend.calls == ["prompt-context", "round1", "round2", "suggestions"]
+        assert checkpoint.prompt_context_etag == '"v2"'
+
+    def test_image_required_for_llm_phases(self) -> None:
+        backend = Backend()
+        backend.fail_round2 = 1
+        checkpoint = backend.failed_analyze(LLMAPIError)
+
+        with backend.client() as client:
+            with pytest.raises(ValueError, match="round2"):
+                client.resume_analyze(checkpoint)
+
+    def test_checkpoint_round_trips_through_json(self) -> None:
+        backend = Backend(needs_ledger=True)
+        backend.fail_round2 = 1
+        checkpoint = backend.failed_analyze(LLMAPIError)
+
+        restored = AnalyzeCheckpoint.from_dict(
+            json.loads(json.dumps(checkpoint.to_dict())),
+        )
+
+        assert restored == checkpoint
+        assert restored.next_phase == "round2"
+
+    def test_analyze_many_failed_item_carries_checkpoint(self) -> None:
+        backend = Backend()
+        backend.fail_round2 = 1
+        with backend.client() as client:
+            [item] = client.analyze_many([b"\xff\xd8"])
+            assert isinstance(item.error, LLMAPIError)
+            assert item.checkpoint is not None
+            assert item.checkpoint.draft_id == 7
+
+            result = client.resume_analyze(item.checkpoint, b"\xff\xd8")
+
+        assert result.draft_id == 7
+        assert backend.calls.count("uploads") == 1
+        assert backend.calls.count("round1") == 1
+
+
+class TestAsyncResumeAnalyze:
+    def test_resume_after_round2_failure(self) -> None:
+        backend = Backend()
+        backend.fail_round2 = 1
+
+        async def main() -> list[str]:
+            async with backend.async_client() as client:
+                checkpoints: list[AnalyzeCheckpoint] = []
+                with pytest.raises(LLMAPIError):
+                    await client.analyze(b"\xff\xd8", on_checkpoint=checkpoints.append)
+                backend.calls.clear()
+                result = await client.resume_analyze(checkpoints[-1], b"\xff\xd8")
+                assert result.draft_id == 7
+                return backend.calls
+
+        # prompt-context はキャッシュから使うので送信しない
+        assert asyncio.run(main()) == ["round2", "suggestions"]
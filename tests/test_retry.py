@@ -0,0 +1,191 @@
+"""リトライ方針のユニットテスト"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+from iikanji import (
+    JournalLine,
+    KakeiboAPIError,
+    LLMAPIError,
+    RetryPolicy,
+)
+from iikanji.retry import parse_retry_after
+
+from .fakes import analyze_server, llm_reply, make_async_client, make_client
+
+_NO_WAIT = RetryPolicy(backoff=0, jitter=False)
+
+
+class TestRetryPolicy:
+    @pytest.mark.parametrize(("kwargs", "expected"), [
+        ({"status": 503}, True),
+        ({"status": 429}, True),
+        ({"status": 400}, False),
+        ({"status": 503, "idempotent": False}, False),
+        ({"status": 429, "idempotent": False}, True),
+        ({"exc": httpx.ReadTimeout("t")}, True),
+        ({"exc": httpx.ReadTimeout("t"), "idempotent": False}, False),
+        ({"exc": httpx.ConnectError("c"), "idempotent": False}, True),
+        ({"exc": LLMAPIError("openai", 502, "bad gateway")}, True),
+        ({"exc": LLMAPIError("openai", 401, "unauthorized")}, False),
+        ({"exc": KakeiboAPIError(500, "boom")}, True),
+        ({"exc": ValueError("x")}, False),
+    ])
+    def test_is_retryable(self, kwargs: dict, expected: bool) -> None:
+        assert RetryPolicy().is_retryable(**kwargs) is expected
+
+    def test_exponential_backoff_capped(self) -> None:
+        policy = RetryPolicy(max_retries=5, backoff=1, max_backoff=3, jitter=False)
+
+        assert [policy.delay(n) for n in range(6)] == [1, 2, 3, 3, 3, None]
+
+    def test_jitter_stays_within_bound(self) -> None:
+        policy = RetryPolicy(backoff=2)
+
+        assert all(0 <= policy.delay(1) <= 4 for _ in range(50))
+
+    def test_retry_after(self) -> None:
+        policy = RetryPolicy(max_retry_after=10)
+
+        assert policy.delay(0, retry_after=7) == 7
+        assert policy.delay(0, retry_after=11) is None
+
+    def test_parse_retry_after(self) -> None:
+        later = datetime.now(timezone.utc) + timedelta(seconds=30)
+
+        assert parse_retry_after("12") == 12
+        assert 25 < parse_retry_after(format_datetime(later, usegmt=True)) <= 30
+        assert parse_retry_after("soon") is None
+        assert parse_retry_after(None) is None
+
+
+class TestServerRetry:
+    def test_get_retried_with_retry_after(self) -> None:
+        statuses = [503, 200]
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            status = statuses.pop(0)
+            if status == 503:
+                return httpx.Response(503, headers={"Retry-After": "0"})
+            return httpx.Response(200, json={"ok": True, "drafts": [], "total": 0,
+                                             "page": 1, "per_page": 50})
+
+        with make_client(handler, retry_policy=RetryPolicy(backoff=10)) as client:
+            client.list_drafts()
+            stats = client.retry_stats()["server"]
+
+        assert statuses == []
+        assert (stats.retries, stats.backoff_seconds, stats.gave_up) == (1, 0, 0)
+
+    def test_post_not_retried_on_5xx_but_on_429(self) -> None:
+        statuses = [429, 503]
+        calls = 0
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal calls
+            calls += 1
+            return httpx.Response(statuses.pop(0), json={"error": "busy"})
+
+        with make_client(handler, retry_policy=_NO_WAIT) as client:
+            with pytest.raises(KakeiboAPIError) as exc_info:
+                client.create_journal(
+                    date="2026-02-15", description="x",
+                    lines=[JournalLine("5010", debit=1), JournalLine("1010", credit=1)],
+                )
+
+        assert exc_info.value.status_code == 503
+        assert calls == 2
+
+    def test_gives_up_after_max_retries(self) -> None:
+        calls: list[httpx.Request] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            raise httpx.ReadTimeout("timeout")
+
+        with make_client(handler, retry_policy=RetryPolicy(max_retries=2, backoff=0)) as client:
+            with pytest.raises(httpx.ReadTimeout):
+                client.get_journal(1)
+            stats = client.retry_stats()["server"]
+
+        assert len(calls) == 3
+        assert (stats.retries, stats.gave_up) == (2, 1)
+
+    def test_disabled(self) -> None:
+        calls: list[httpx.Request] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            return httpx.Response(503, json={"error": "busy"})
+
+        with make_client(handler, retry_policy=None) as client:
+            with pytest.raises(KakeiboAPIError):
+                client.get_journal(1)
+
+        assert len(calls) == 1
+
+
+class TestLLMRetry:
+    def test_round_retried_with_retry_after(self) -> None:
+        llm_statuses = [429]
+
+        def llm_handler(request: httpx.Request) -> httpx.Response:
+            if llm_statuses:
+                return httpx.Response(
+                    llm_statuses.pop(0), headers={"Retry-After": "0.01"},
+                    text="rate limited",
+                )
+            return llm_reply(request)
+
+        with make_client(analyze_server, llm_handler) as client:
+            result = client.analyze(b"\xff\xd8")
+            stats = client.retry_stats()
+
+        assert result.suggestions
+        assert stats["llm"].retries == 1
+        assert stats["llm"].backoff_seconds == pytest.approx(0.01)
+        assert stats["server"].retries == 0
+
+    def test_provider_error_type(self) -> None:
+        http_client = httpx.Client(transport=httpx.MockTransport(
+            lambda r: httpx.Response(529, headers={"Retry-After": "3"}, text="overloaded"),
+        ))
+
+        from iikanji import llm
+
+        with pytest.raises(LLMAPIError) as exc_info:
+            llm.call_anthropic_image(
+                api_key="k", model="m", image_bytes=b"x", mime_type="image/png",
+                prompt="p", http_client=http_client,
+            )
+
+        assert isinstance(exc_info.value, RuntimeError)
+        assert (exc_info.value.provider, exc_info.value.status_code) == ("anthropic", 529)
+        assert exc_info.value.retry_after == 3
+
+
+class TestAsyncRetry:
+    def test_get_retried(self) -> None:
+        statuses = [502, 200]
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            status = statuses.pop(0)
+            body = {"ok": True, "journal": {
+                "id": 1, "date": "2026-02-15", "entry_number": 1,
+                "description": "", "source": "api", "lines": [],
+            }}
+            return httpx.Response(status, json=body if status == 200 else {"error": "x"})
+
+        async def main() -> dict:
+            async with make_async_client(handler, retry_policy=_NO_WAIT) as client:
+                await client.get_journal(1)
+                return client.retry_stats()
+
+        stats = asyncio.run(main())
+
+        assert statuses == []
+        assert stats["server"].retries == 1
@@ -0,0 +1,101 @@
+"""analyze() のフェーズ別計測 (AnalyzeTrace / on_trace) のテスト"""
+
+import asyncio
+
+import pytest
+
+from iikanji import AnalyzeTrace, LLMAPIError
+
+from .fakes import Backend
+
+
+class TestAnalyzeTrace:
+    def test_trace_records_each_phase(self) -> None:
+        backend = Backend(needs_ledger=True)
+        traces: list[AnalyzeTrace] = []
+        with backend.client(on_trace=traces.append) as client:
+            result = client.analyze(b"\xff\xd8" * 100)
+
+        trace = result.trace
+        assert traces == [trace]
+        assert trace.provider == "openai"
+        assert trace.model == "gpt-4o"
+        assert trace.draft_id == 7
+        assert trace.needs_ledger is True
+        assert trace.error is None
+        assert sorted(p.name for p in trace.phases) == [
+            "ledger", "prompt_context", "round1", "round2", "save", "upload",
+        ]
+        assert trace.total_seconds >= trace.phase_seconds()["round1"]
+
+        phases = {p.name: p for p in trace.phases}
+        upload = phases["upload"]
+        assert upload.status_code == 201
+        assert upload.request_bytes > 200
+        assert upload.response_bytes == len(b'{"draft_id":7}')
+        assert phases["prompt_context"].request_bytes == 0
+        assert phases["prompt_context"].response_bytes > 0
+        round1 = phases["round1"]
+        assert round1.prompt_chars > 0
+        assert round1.request_bytes > round1.prompt_chars
+        assert round1.status_code is None
+        assert phases["round2"].prompt_chars > 0
+
+    def test_cache_hits_are_marked(self) -> None:
+        backend = Backend(needs_ledger=True)
+        traces: list[AnalyzeTrace] = []
+        with backend.client(
+            prompt_context_ttl=300.0, on_trace=traces.append,
+        ) as client:
+            client.analyze(b"\xff\xd8")
+            client.analyze(b"\xff\xd8")
+
+        cached = {p.name for p in traces[1].phases if p.cached}
+        assert cached == {"prompt_context", "ledger"}
+        assert not any(p.cached for p in traces[0].phases)
+
+    def test_failure_is_traced(self) -> None:
+        backend = Backend()
+        backend.fail_round2 = 1
+        traces: list[AnalyzeTrace] = []
+        with backend.client(on_trace=traces.append) as client:
+            with pytest.raises(LLMAPIError):
+                client.analyze(b"\xff\xd8")
+
+        (trace,) = traces
+        assert trace.error == "LLMAPIError"
+        assert trace.needs_ledger is False
+        round2 = [p for p in trace.phases if p.name == "round2"]
+        assert [p.error for p in round2] == ["LLMAPIError"]
+        assert "save" not in trace.phase_seconds()
+
+    def test_resume_traces_only_executed_phases(self) -> None:
+        backend = Backend()
+        backend.fail_save = 1
+        checkpoint = backend.failed_analyze(Exception)
+
+        traces: list[AnalyzeTrace] = []
+        with backend.client(on_trace=traces.append) as client:
+            result = client.resume_analyze(checkpoint)
+
+        assert [p.name for p in result.trace.phases] == ["save"]
+        assert result.trace.needs_ledger is False
+
+
+class TestAsyncAnalyzeTrace:
+    def test_trace_records_each_phase(self) -> None:
+        backend = Backend()
+        traces: list[AnalyzeTrace] = []
+
+        async def run() -> AnalyzeTrace:
+            async with backend.async_client(on_trace=traces.append) as client:
+                result = await client.analyze(b"\xff\xd8")
+            return result.trace
+
+        trace = asyncio.run(run())
+        assert traces == [trace]
+        assert trace.needs_ledger is False
+        assert sorted(trace.phase_seconds()) == [
+            "prompt_context", "round1", "round2", "save", "upload",
+        ]
+        assert all(p.error is None for p in trace.phases)
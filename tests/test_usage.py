@@ -0,0 +1,122 @@
+"""トークン使用量とコスト集計 (usage_stats / model_prices) のテスト"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from iikanji import ModelPrice, TokenUsage
+from iikanji import llm
+
+from .fakes import analyze_server, make_async_client, make_client, scripted_llm
+
+_PRICES = {"gpt-4o": ModelPrice(2.5, 10.0, cached_input_per_million=1.25)}
+
+
+class TestParseUsage:
+    @pytest.mark.parametrize(("provider", "body", "expected"), [
+        ("openai", {"usage": {
+            "prompt_tokens": 100, "completion_tokens": 5,
+            "prompt_tokens_details": {"cached_tokens": 60},
+        }}, TokenUsage(100, 5, 60)),
+        # Anthropic の input_tokens はキャッシュ分を含まないので足し込む
+        ("anthropic", {"usage": {
+            "input_tokens": 10, "output_tokens": 3,
+            "cache_read_input_tokens": 80, "cache_creation_input_tokens": 5,
+        }}, TokenUsage(95, 3, 80)),
+        ("google", {"usageMetadata": {
+            "promptTokenCount": 40, "candidatesTokenCount": 2,
+            "thoughtsTokenCount": 7, "cachedContentTokenCount": 30,
+        }}, TokenUsage(40, 9, 30)),
+    ])
+    def test_cached_tokens(
+        self, provider: str, body: dict, expected: TokenUsage,
+    ) -> None:
+        assert llm.parse_usage(provider, httpx.Response(200, json=body)) == expected
+
+    def test_usage_adds_up(self) -> None:
+        total = TokenUsage(1, 2, 1) + TokenUsage(10, 20, 5)
+        assert total == TokenUsage(11, 22, 6)
+        assert total.total == 33
+
+
+class TestModelPrice:
+    def test_cost_uses_cached_price(self) -> None:
+        price = ModelPrice(2.0, 8.0, cached_input_per_million=0.5)
+        cost = price.cost(TokenUsage(1_000_000, 500_000, 400_000))
+        assert cost == pytest.approx(0.6 * 2.0 + 0.4 * 0.5 + 0.5 * 8.0)
+
+    def test_cached_price_defaults_to_input_price(self) -> None:
+        price = ModelPrice(2.0, 8.0)
+        assert price.cost(TokenUsage(1_000_000, 0, 1_000_000)) == pytest.approx(2.0)
+
+
+class TestClientUsage:
+    def test_usage_per_round_and_totals(self) -> None:
+        calls: list[str] = []
+        handler = scripted_llm(
+            {"needs_ledger": True, "requested_accounts": ["食費"]}, calls,
+        )
+        with make_client(analyze_server, handler, model_prices=_PRICES) as client:
+            result = client.analyze(b"\xff\xd8")
+            client.analyze(b"\xff\xd8")
+
+        assert result.usage == {
+            "round1": TokenUsage(100, 20), "round2": TokenUsage(100, 20),
+        }
+        assert result.cost == pytest.approx((200 * 2.5 + 40 * 10.0) / 1e6)
+        phases = {p.name: p for p in result.trace.phases}
+        assert phases["round1"].usage == TokenUsage(100, 20)
+        assert phases["upload"].usage is None
+
+        stats = client.usage_stats()["openai:gpt-4o"]
+        assert stats.calls == 4
+        assert stats.usage == TokenUsage(400, 80)
+        assert stats.cost == pytest.approx(2 * result.cost)
+
+    def test_cost_is_none_without_price(self) -> None:
+        handler = scripted_llm(
+            {"needs_ledger": False}, [],
+        )
+        with make_client(analyze_server, handler) as client:
+            result = client.analyze(b"\xff\xd8")
+
+        assert result.cost is None
+        assert client.usage_stats()["openai:gpt-4o"].cost is None
+
+    def test_speculative_round2_usage(self) -> None:
+        calls: list[str] = []
+        handler = scripted_llm(
+            {"needs_ledger": True, "requested_accounts": ["食費"]}, calls,
+        )
+        with make_client(analyze_server, handler, speculative_round2=True) as client:
+            result = client.analyze(b"\xff\xd8")
+
+        # 捨てた投機分は Round 別の usage に入らないが、合計には含める
+        assert set(result.usage) == {"round1", "round2"}
+        assert client.usage_stats()["openai:gpt-4o"].calls == 3
+
+    def test_speculative_hit_counts_as_round2(self) -> None:
+        handler = scripted_llm(
+            {"needs_ledger": False}, [],
+        )
+        with make_client(analyze_server, handler, speculative_round2=True) as client:
+            result = client.analyze(b"\xff\xd8")
+
+        assert result.usage["round2"] == TokenUsage(100, 20)
+
+    def test_async_client(self) -> None:
+        handler = scripted_llm(
+            {"needs_ledger": False}, [],
+        )
+
+        async def run() -> tuple:
+            async with make_async_client(
+                analyze_server, handler, model_prices=_PRICES,
+            ) as client:
+                return await client.analyze(b"\xff\xd8"), client.usage_stats()
+
+        result, stats = asyncio.run(run())
+        assert set(result.usage) == {"round1", "round2"}
+        assert result.cost is not None
+        assert stats["openai:gpt-4o"].usage == TokenUsage(200, 40)